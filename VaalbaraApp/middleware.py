@@ -0,0 +1,137 @@
+"""
+Per-request instrumentation: number of SQL queries, SQL time, template render time and the
+slowest statements of every request. They are logged as one JSON line on the 'vaalbara.requests'
+logger, and sent to staff users (to everyone with DEBUG) as a Server-Timing header, visible in the
+browser's network panel.
+
+Requests over settings.SLOW_REQUEST_MS or settings.SLOW_REQUEST_QUERIES are logged as warnings,
+together with their SQL, so N+1 patterns hidden in model properties can be found in production.
+"""
+import contextvars
+import heapq
+import itertools
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import Template
+
+logger = logging.getLogger('vaalbara.requests')
+
+SLOWEST_STATEMENTS = 5
+# Statements kept per request for the slow request log
+CAPTURED_STATEMENTS = 300
+SQL_PREVIEW = 300
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    """Measurements of one request; also the execute_wrapper that counts its queries."""
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.rendering = False
+        self.statements = []
+        self.slowest = []
+        self._order = itertools.count()
+
+    def __call__(self, execute, sql, params, many, context):
+        began = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - began
+            self.queries += 1
+            self.sql_time += duration
+            if len(self.statements) < CAPTURED_STATEMENTS:
+                self.statements.append((duration, sql))
+            # Min-heap of the slowest statements; the counter breaks ties without comparing SQL
+            entry = (duration, next(self._order), sql)
+            if len(self.slowest) < SLOWEST_STATEMENTS:
+                heapq.heappush(self.slowest, entry)
+            else:
+                heapq.heappushpop(self.slowest, entry)
+
+
+_render = Template.render
+
+def _timed_render(self, context=None, request=None):
+    """Template.render() that adds its time to the current request (outermost render only)."""
+    stats = _current.get()
+    if stats is None or stats.rendering:
+        return _render(self, context, request)
+    stats.rendering = True
+    began = time.perf_counter()
+    try:
+        return _render(self, context, request)
+    finally:
+        stats.template_time += time.perf_counter() - began
+        stats.rendering = False
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+class QueryTimingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Django's template backend has no render hook outside of tests
+        if Template.render is not _timed_render:
+            Template.render = _timed_render
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        began = time.perf_counter()
+        try:
+            with ExitStack() as wrappers:
+                for connection in connections.all():
+                    wrappers.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - began
+
+        # Template time includes the queries run while rendering (lazy querysets, properties).
+        # Streaming responses (exports) run their queries after this point and are not counted.
+        # The header is only sent to staff (and in DEBUG): it tells any client how the database is doing.
+        user = getattr(request, 'user', None)
+        if settings.DEBUG or (user is not None and user.is_staff):
+            response['Server-Timing'] = (
+                f'db;dur={_ms(stats.sql_time)};desc="{stats.queries} queries", '
+                f'tpl;dur={_ms(stats.template_time)}, total;dur={_ms(total)}'
+            )
+        self._log(request, response, stats, total)
+        return response
+
+    @staticmethod
+    def _log(request, response, stats, total):
+        user = getattr(request, 'user', None)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'user': user.pk if user is not None and user.is_authenticated else None,
+            'total_ms': _ms(total),
+            'queries': stats.queries,
+            'sql_ms': _ms(stats.sql_time),
+            'template_ms': _ms(stats.template_time),
+            'slowest': [
+                {'ms': _ms(duration), 'sql': sql[:SQL_PREVIEW]}
+                for duration, _, sql in sorted(stats.slowest, reverse=True)
+            ],
+        }
+        slow = (total * 1000 >= getattr(settings, 'SLOW_REQUEST_MS', 500)
+                or stats.queries >= getattr(settings, 'SLOW_REQUEST_QUERIES', 50))
+        if slow:
+            record['slow'] = True
+            record['sql'] = [{'ms': _ms(duration), 'sql': sql} for duration, sql in stats.statements]
+            logger.warning(json.dumps(record, ensure_ascii=False))
+        else:
+            logger.info(json.dumps(record, ensure_ascii=False))
\ No newline at end of file
@@ -0,0 +1,100 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import BadRequest, ValidationError
+from django.db.models import Q
+
+
+class KeysetPage:
+    """
+    One page of a keyset (cursor) paginated queryset.
+    `next_url` is the query string of the following page, or None on the last page.
+    """
+    def __init__(self, object_list, next_cursor, request):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.next_url = None
+        if next_cursor is not None:
+            params = request.GET.copy()
+            params['cursor'] = next_cursor
+            self.next_url = f'?{params.urlencode()}'
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def encode_cursor(values):
+    # str() keeps microseconds; DjangoJSONEncoder would round datetimes to milliseconds
+    data = json.dumps(values, default=str).encode()
+    return base64.urlsafe_b64encode(data).decode()
+
+def decode_cursor(cursor, model, ordering):
+    """
+    Values of `ordering` in `cursor`, converted by their model fields so a tampered
+    cursor is a bad request rather than an error in the query.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError):
+        raise BadRequest('Invalid cursor.')
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise BadRequest('Invalid cursor.')
+    converted = []
+    for name, value in zip(ordering, values):
+        name = name.lstrip('-')
+        field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+        try:
+            value = field.to_python(value)
+            field.run_validators(value)
+        except (ValidationError, TypeError):
+            raise BadRequest('Invalid cursor.')
+        if value is None:
+            raise BadRequest('Invalid cursor.')
+        converted.append(value)
+    return converted
+
+def _after(ordering, values):
+    """
+    Q for the rows strictly after `values` in `ordering`, written as
+    `a <= x AND (a < x OR (a = x AND b > y))` so the leading column is a plain
+    range condition on the index.
+    """
+    condition = Q()
+    for position in reversed(range(len(ordering))):
+        field = ordering[position].lstrip('-')
+        lookup = 'lt' if ordering[position].startswith('-') else 'gt'
+        step = Q(**{f'{field}__{lookup}': values[position]})
+        if position < len(ordering) - 1:
+            step |= Q(**{field: values[position]}) & condition
+        condition = step
+
+    first = ordering[0].lstrip('-')
+    bound = 'lte' if ordering[0].startswith('-') else 'gte'
+    return Q(**{f'{first}__{bound}': values[0]}) & condition
+
+def paginate_keyset(request, queryset, ordering, per_page=50):
+    """
+    Keyset pagination: the page after `?cursor=` is read with a range condition
+    on `ordering` instead of an OFFSET, so every page costs the same.
+    `ordering` must end with a unique field (usually 'pk' or '-pk') and be backed by an index.
+    """
+    cursor = request.GET.get('cursor')
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = queryset.filter(_after(ordering, decode_cursor(cursor, queryset.model, ordering)))
+
+    object_list = list(queryset[:per_page + 1])
+    next_cursor = None
+    if len(object_list) > per_page:
+        object_list = object_list[:per_page]
+        last = object_list[-1]
+        next_cursor = encode_cursor([getattr(last, field.lstrip('-')) for field in ordering])
+    return KeysetPage(object_list, next_cursor, request)
\ No newline at end of file
@@ -2,11 +2,11 @@ from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 from ivm.models import Inventory, Transaction, Partner
-from ivm import my_functions
+from ivm import cache as ivm_cache
 
 @login_required(login_url='/users/login/')
 def dashboard(request):
-    inventories_summary = my_functions.get_all_inventories_summary()
+    inventories_summary = ivm_cache.inventories_summary()
     pending_transactions = Transaction.objects.exclude(transaction_status='Completed')
     return render(request, "dashboard.html", {
             'inventories_summary': inventories_summary,
@@ -9,4 +9,13 @@ pip install -r requirements.txt
 python manage.py collectstatic --no-input
 
 # Run migrations
-python manage.py migrate
\ No newline at end of file
+python manage.py migrate
+
+# Backfill the monthly rollups used by the dashboard
+python manage.py rebuild_rollups
+
+# Catch up the daily stock snapshots used by the trend charts
+python manage.py take_snapshots
+
+# Fill the aggregate cache read by the dashboard and inventory pages
+python manage.py warm_cache
\ No newline at end of file
@@ -1,10 +1,42 @@
 from django.contrib import admin
 from .models import *
 
+
+class ItemAdmin(admin.ModelAdmin):
+    # Kept by completions and verify_stock --fix; Item.save() never writes them
+    readonly_fields = ['stock_on_hand', 'stock_value', 'version']
+
+
+class InventoryPeriodSummaryAdmin(admin.ModelAdmin):
+    # Rollups are derived from completed transactions; fix them with the rebuild_rollups command
+    readonly_fields = ['inventory', 'year', 'month', 'transaction_type', 'revenue', 'cost', 'extra_cost',
+                       'line_count']
+
+    def has_add_permission(self, request):
+        return False
+
+
+class StockMovementAdmin(admin.ModelAdmin):
+    """The ledger is append-only: rows are only written by completions."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 # Register your models here.
 admin.site.register(Inventory)
-admin.site.register(Item)
+admin.site.register(Item, ItemAdmin)
 admin.site.register(Transaction)
 admin.site.register(TransactionItem)
 admin.site.register(ItemBatch)
-admin.site.register(Partner)
\ No newline at end of file
+admin.site.register(Partner)
+admin.site.register(InventoryPeriodSummary, InventoryPeriodSummaryAdmin)
+admin.site.register(StockMovement, StockMovementAdmin)
+admin.site.register(InventorySnapshot)
+admin.site.register(ItemSnapshot)
@@ -0,0 +1,75 @@
+"""
+Read-through cache for the inventory aggregates shown on the dashboard, the inventory list
+and the inventory pages.
+
+Cached values are never deleted. Their keys include a version token per inventory, plus one
+global token for the pages that cover all inventories. bump_inventory() replaces both tokens with
+new random ones once the surrounding transaction commits, so later reads miss and recompute. Stale
+entries simply expire.
+
+A bump is a single set(), not a read-modify-write like incr(): on the file-based default cache two
+concurrent bumps could both read N and write N+1, and values computed between them would be served
+as current.
+"""
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+TIMEOUT = 60 * 60 * 24
+GLOBAL = 'all'
+
+
+def _version_key(scope):
+    return f'ivm:version:{scope}'
+
+def _new_version():
+    return uuid4().hex
+
+def version(scope=GLOBAL):
+    """Current version of an inventory (by id) or of the GLOBAL scope."""
+    # Random tokens: a new one never reuses the version of an evicted or concurrently replaced one
+    return cache.get_or_set(_version_key(scope), _new_version, timeout=None)
+
+def versions(scopes):
+    """{scope: version} of several scopes in one cache round trip."""
+    keys = {_version_key(scope): scope for scope in scopes}
+    found = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+    return {keys[key]: value for key, value in {**found, **missing}.items()}
+
+def _bump(scope):
+    cache.set(_version_key(scope), _new_version(), timeout=None)
+
+def bump_inventory(inventory_id):
+    """Invalidates the cached aggregates of an inventory and of all inventories, on commit."""
+    def bump():
+        _bump(inventory_id)
+        _bump(GLOBAL)
+    db_transaction.on_commit(bump)
+
+def get_or_compute(name, compute, scope=GLOBAL, timeout=TIMEOUT):
+    """Value of `compute()` cached under `name` and the current version of `scope`."""
+    return cache.get_or_set(f'ivm:{name}:{scope}:{version(scope)}', compute, timeout)
+
+
+def inventories_summary():
+    """my_functions.get_all_inventories_summary() of today, for the dashboard."""
+    from ivm import my_functions
+
+    # Monthly and yearly figures also roll over with the date
+    today = timezone.localdate()
+    return get_or_compute(f'summary:{today.isoformat()}', my_functions.get_all_inventories_summary)
+
+def inventory_list():
+    """Inventories annotated with_financials(), for list_inventories."""
+    from ivm.models import Inventory
+
+    return get_or_compute('inventory-list', lambda: list(Inventory.objects.with_financials()))
+
+def inventory_items(inventory):
+    """Active items of an inventory, for inventory_details."""
+    return get_or_compute('items', lambda: list(inventory.items.filter(is_active=True)), scope=inventory.pk)
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""
+CSV/XLSX exports of transactions, transaction lines, item stock and partners.
+
+Rows are read with QuerySet.iterator(chunk_size=CHUNK_SIZE) and written as they are read, so memory
+stays flat whatever the row count. CSV is streamed to the client in blocks of rows. XLSX is written
+row by row by openpyxl's write-only workbook into a temporary file, which is then streamed.
+"""
+import csv
+import io
+from decimal import Decimal
+
+from django.utils import timezone
+
+from ivm.models import Item, Partner, Transaction, TransactionItem
+
+CHUNK_SIZE = 2000
+CSV_ROWS_PER_BLOCK = 500
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+# A worksheet holds 1,048,576 rows, one of them the header
+XLSX_MAX_ROWS = 1048575
+
+
+def _local(value):
+    """Naive local datetime: readable in CSV, and the only kind openpyxl accepts."""
+    return timezone.localtime(value).replace(tzinfo=None, microsecond=0) if value else None
+
+
+class Export:
+    """
+    One exportable dataset: `columns` are (header, getter) pairs and `queryset(filter_form)`
+    returns the rows, filtered by a TransactionFilterForm.
+    """
+    def __init__(self, title, permission, columns, queryset):
+        self.title = title
+        self.permission = permission
+        self.headers = [header for header, _ in columns]
+        self.getters = [getter for _, getter in columns]
+        self.queryset = queryset
+
+    def rows(self, filter_form):
+        for obj in self.queryset(filter_form).iterator(chunk_size=CHUNK_SIZE):
+            yield [getter(obj) for getter in self.getters]
+
+
+def _transactions(filter_form):
+    queryset = Transaction.objects.select_related('inventory', 'partner', 'created_by')
+    return filter_form.filter(queryset).order_by('creation_date', 'pk')
+
+def _transaction_lines(filter_form):
+    queryset = TransactionItem.objects.select_related('transaction__inventory', 'transaction__partner', 'item')
+    return filter_form.filter(queryset, prefix='transaction__').order_by('transaction_id', 'pk')
+
+def _stock(filter_form):
+    # Only the inventory filter applies to items
+    queryset = Item.objects.select_related('inventory')
+    if filter_form.is_valid() and filter_form.cleaned_data['inventory']:
+        queryset = queryset.filter(inventory=filter_form.cleaned_data['inventory'])
+    return queryset.order_by('inventory_id', 'pk')
+
+def _partners(filter_form):
+    return Partner.objects.order_by('name', 'pk')
+
+
+EXPORTS = {
+    'transactions': Export('Giao dịch', 'ivm.view_transaction', [
+        ('Mã phiếu', lambda tx: tx.code),
+        ('Loại', lambda tx: tx.get_transaction_type_display()),
+        ('Trạng thái', lambda tx: tx.get_transaction_status_display()),
+        ('Kho', lambda tx: tx.inventory.inventory_name),
+        ('Đối tác', lambda tx: tx.partner.name),
+        ('Số hóa đơn', lambda tx: tx.partner_bill),
+        ('Chi phí khác', lambda tx: tx.extra_cost),
+        ('Ngày tạo', lambda tx: _local(tx.creation_date)),
+        ('Hạn hoàn thành', lambda tx: _local(tx.completion_deadline)),
+        ('Ngày hoàn thành', lambda tx: _local(tx.completion_date)),
+        ('Người tạo', lambda tx: tx.created_by.username),
+        ('Ghi chú', lambda tx: tx.notes),
+    ], _transactions),
+    'transaction-lines': Export('Chi tiết giao dịch', 'ivm.view_transaction', [
+        ('Mã phiếu', lambda line: line.transaction.code),
+        ('Loại', lambda line: line.transaction.get_transaction_type_display()),
+        ('Trạng thái', lambda line: line.transaction.get_transaction_status_display()),
+        ('Kho', lambda line: line.transaction.inventory.inventory_name),
+        ('Đối tác', lambda line: line.transaction.partner.name),
+        ('Ngày hoàn thành', lambda line: _local(line.transaction.completion_date)),
+        ('Mã hàng', lambda line: line.item_id),
+        ('Tên hàng', lambda line: line.item.item_name),
+        ('Đơn vị', lambda line: line.item.get_unit_display()),
+        ('Số lượng', lambda line: line.quantity),
+        ('Đơn giá', lambda line: line.unit_cost),
+        ('Chiết khấu (%)', lambda line: line.discount),
+        ('Giá trị', lambda line: line.value.quantize(Decimal('0.01'))),
+        ('Giá trị xuất kho', lambda line: line.report_value),
+        ('Ghi chú', lambda line: line.notes),
+    ], _transaction_lines),
+    'stock': Export('Tồn kho', 'ivm.view_item', [
+        ('Mã hàng', lambda item: item.item_id),
+        ('Kho', lambda item: item.inventory.inventory_name),
+        ('Tên hàng', lambda item: item.item_name),
+        ('Thương hiệu', lambda item: item.brand),
+        ('Quy cách', lambda item: item.packaging),
+        ('Phân loại', lambda item: item.category),
+        ('Đơn vị', lambda item: item.get_unit_display()),
+        ('Tồn kho', lambda item: item.stock_on_hand),
+        ('Giá trị tồn', lambda item: item.stock_value),
+        ('Đang dùng', lambda item: item.is_active),
+    ], _stock),
+    'partners': Export('Đối tác', 'ivm.view_partner', [
+        ('Tên', lambda partner: partner.name),
+        ('Mã số thuế', lambda partner: partner.tax_code),
+        ('Số điện thoại', lambda partner: partner.phone),
+        ('Email', lambda partner: partner.email),
+        ('Địa chỉ', lambda partner: partner.address),
+        ('Người liên hệ', lambda partner: partner.contact_person),
+    ], _partners),
+}
+
+
+def csv_blocks(export, filter_form):
+    """The CSV text of an export in blocks of CSV_ROWS_PER_BLOCK rows, for StreamingHttpResponse."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so that Excel reads the file as UTF-8
+    buffer.write('\ufeff')
+    writer.writerow(export.headers)
+    for count, row in enumerate(export.rows(filter_form), 1):
+        writer.writerow(row)
+        if count % CSV_ROWS_PER_BLOCK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def write_csv(export, filter_form, file):
+    """Write an export to a text file opened with newline=''."""
+    for block in csv_blocks(export, filter_form):
+        file.write(block)
+
+def write_xlsx(export, filter_form, file):
+    """
+    Write an export to a binary file as XLSX. Raises ValueError past XLSX_MAX_ROWS rows,
+    which only CSV can hold.
+    """
+    from openpyxl import Workbook
+
+    # Write-only: rows go straight to a temporary file instead of staying in memory as cells
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(export.title)
+    sheet.append(export.headers)
+    for count, row in enumerate(export.rows(filter_form), 1):
+        if count > XLSX_MAX_ROWS:
+            raise ValueError(f"More than {XLSX_MAX_ROWS} rows do not fit in an XLSX sheet, export as CSV.")
+        sheet.append(row)
+    workbook.save(file)
\ No newline at end of file
@@ -1,5 +1,12 @@
+from datetime import datetime, time, timedelta
+
 from django import forms
+from django.core.exceptions import ValidationError
+from django.db.models import Q
 from django.forms import inlineformset_factory
+from django.forms.models import ModelChoiceIteratorValue
+from django.utils.functional import cached_property
+from django.utils import timezone
 
 from .models import Transaction, TransactionItem, Item, Inventory, Partner
 
@@ -11,6 +18,14 @@ class ItemForm(forms.ModelForm):
         label='Kho lưu trữ',
         widget=forms.Select(attrs={'class': 'form-select'})
     )
+    sku = forms.CharField(
+        max_length=50,
+        required=False,
+        # NULL rather than '': items without a SKU must not conflict with each other
+        empty_value=None,
+        label='Mã hàng (SKU)',
+        widget=forms.TextInput(attrs={'class': 'form-textinput', 'placeholder': 'NV-10ML'})
+    )
     item_name = forms.CharField(
         max_length=250,
         label='Tên mặt hàng',
@@ -46,7 +61,7 @@ class ItemForm(forms.ModelForm):
 
     class Meta:
         model = Item
-        fields = ['inventory', 'item_name', 'brand', 'packaging', 'unit', 'category', 'description']
+        fields = ['inventory', 'sku', 'item_name', 'brand', 'packaging', 'unit', 'category', 'description']
 
 # ========= Partners ==========
 
@@ -142,11 +157,123 @@ class TransactionForm(forms.ModelForm):
             if missing:
                 raise forms.ValidationError(
                     "Vui lòng chọn đối tác có sẵn hoặc điền đầy đủ thông tin đối tác mới (Tên, MST, SĐT, Địa chỉ, Người liên hệ).")
+            # Partner.tax_code is unique
+            if Partner.objects.filter(tax_code=cleaned_data['new_partner_tax_code']).exists():
+                self.add_error('new_partner_tax_code', "Đã có đối tác với mã số thuế này, vui lòng chọn đối tác đó.")
 
         return cleaned_data
 
+class TransactionFilterForm(forms.Form):
+    """GET filters of the transactions list; every filter is backed by an index on Transaction."""
+    status = forms.ChoiceField(
+        choices=[('', 'Tất cả trạng thái')] + Transaction.STATUS_CHOICES,
+        required=False,
+        label='Trạng thái',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    type = forms.ChoiceField(
+        choices=[('', 'Tất cả loại')] + Transaction.TRANSACTION_TYPES,
+        required=False,
+        label='Loại giao dịch',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    inventory = forms.ModelChoiceField(
+        queryset=Inventory.objects.all(),
+        required=False,
+        empty_label='Tất cả kho',
+        label='Kho lưu trữ',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    date_from = forms.DateField(
+        required=False,
+        label='Từ ngày',
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-datetime'})
+    )
+    date_to = forms.DateField(
+        required=False,
+        label='Đến ngày',
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-datetime'})
+    )
+
+    def filter(self, queryset, prefix=''):
+        """
+        Apply the valid filters to `queryset`; invalid values are ignored.
+        `prefix` is the path to the transaction for querysets of related rows (e.g. 'transaction__').
+        """
+        if not self.is_valid():
+            return queryset
+        data = self.cleaned_data
+        if data['status']:
+            queryset = queryset.filter(**{f'{prefix}transaction_status': data['status']})
+        if data['type']:
+            queryset = queryset.filter(**{f'{prefix}transaction_type': data['type']})
+        if data['inventory']:
+            queryset = queryset.filter(**{f'{prefix}inventory': data['inventory']})
+        # Creation date range as plain bounds (not __date) so the index on creation_date is used
+        if data['date_from']:
+            queryset = queryset.filter(**{
+                f'{prefix}creation_date__gte': timezone.make_aware(datetime.combine(data['date_from'], time.min))})
+        if data['date_to']:
+            queryset = queryset.filter(**{
+                f'{prefix}creation_date__lt': timezone.make_aware(
+                    datetime.combine(data['date_to'] + timedelta(days=1), time.min))})
+        return queryset
+
 # ========= Transaction Items FormSet ==========
+class ItemSelect(forms.Select):
+    """Select whose options carry data-inventory, so transaction_form.js can hide other inventories' items."""
+    def create_option(self, name, value, label, selected, index, subindex=None, attrs=None):
+        option = super().create_option(name, value, label, selected, index, subindex, attrs)
+        if isinstance(value, ModelChoiceIteratorValue):
+            option['attrs']['data-inventory'] = value.instance.inventory_id
+        return option
+
+class SharedItemChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField over a list of items loaded once per formset.
+    Rendering and cleaning read the shared list instead of querying the database per row.
+    """
+    def __init__(self, items, **kwargs):
+        super().__init__(queryset=Item.objects.none(), **kwargs)
+        self.items = items
+        self.choices = [('', self.empty_label)] + [
+            (ModelChoiceIteratorValue(pk, item), str(item)) for pk, item in items.items()
+        ]
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return self.items[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice')
+
 class BaseTransactionItemFormSet(forms.BaseInlineFormSet):
+    def __init__(self, *args, inventory=None, **kwargs):
+        # Only this inventory's items are offered when given (None: every inventory, filtered client-side)
+        self.inventory = inventory
+        super().__init__(*args, **kwargs)
+
+    @cached_property
+    def item_choices(self):
+        """{item_id: Item} of the selectable items: active ones, plus those already on this transaction."""
+        selectable = Q(is_active=True)
+        if self.inventory is not None:
+            selectable &= Q(inventory=self.inventory)
+        if self.instance.pk is not None:
+            selectable |= Q(pk__in=TransactionItem.objects.filter(transaction=self.instance).values('item'))
+        items = Item.objects.filter(selectable).order_by('item_name', 'pk')
+        return {item.pk: item for item in items}
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        item_field = form.fields['item']
+        form.fields['item'] = SharedItemChoiceField(
+            self.item_choices,
+            label=item_field.label,
+            widget=ItemSelect(attrs=item_field.widget.attrs),
+        )
+
     def clean(self):
         super().clean()
         if any(self.errors):
@@ -154,12 +281,17 @@ class BaseTransactionItemFormSet(forms.BaseInlineFormSet):
 
         transaction_type = self.instance.transaction_type
         if transaction_type == 'Export':
-            for form in self.forms:
-                if form.cleaned_data and not form.cleaned_data.get('DELETE'):
-                    item = form.cleaned_data.get('item')
-                    qty = form.cleaned_data.get('quantity')
-                    if item and qty > item.total_stock:
-                        form.add_error('quantity', f"Only {item.total_stock} units available.")
+            forms_to_check = [
+                form for form in self.forms
+                if form.cleaned_data and not form.cleaned_data.get('DELETE')
+                and form.cleaned_data.get('item') and form.cleaned_data.get('quantity') is not None
+            ]
+            errors = Item.objects.check_stock(
+                (form.cleaned_data['item'], form.cleaned_data['quantity']) for form in forms_to_check
+            )
+            for form, error in zip(forms_to_check, errors):
+                if error:
+                    form.add_error('quantity', error)
 
 TransactionItemFormSet = inlineformset_factory(
     Transaction,
@@ -196,4 +328,41 @@ TransactionItemFormSet = inlineformset_factory(
         'discount': 'Chiếu khấu (%)',
         'notes': 'Ghi chú',
     }
-)
\ No newline at end of file
+)
+
+# ========= Imports ==========
+
+class ImportForm(forms.Form):
+    KINDS = [
+        ('items', 'Mặt hàng'),
+        ('partners', 'Đối tác'),
+        ('stock', 'Tồn đầu kỳ'),
+    ]
+
+    kind = forms.ChoiceField(
+        choices=KINDS,
+        label='Loại dữ liệu',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    inventory = forms.ModelChoiceField(
+        queryset=Inventory.objects.all(),
+        required=False,
+        label='Kho lưu trữ (mặt hàng, tồn đầu kỳ)',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    partner = forms.ModelChoiceField(
+        queryset=Partner.objects.all(),
+        required=False,
+        label='Đối tác (tồn đầu kỳ)',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    file = forms.FileField(label='Tệp CSV (UTF-8)')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        kind = cleaned_data.get('kind')
+        if kind in ('items', 'stock') and not cleaned_data.get('inventory'):
+            self.add_error('inventory', "Vui lòng chọn kho.")
+        if kind == 'stock' and not cleaned_data.get('partner'):
+            self.add_error('partner', "Vui lòng chọn đối tác cho phiếu nhập tồn đầu kỳ.")
+        return cleaned_data
\ No newline at end of file
@@ -0,0 +1,186 @@
+"""
+Bulk CSV imports of items, partners and opening stock balances.
+
+Files are read row by row and validated CHUNK_SIZE rows at a time. Each chunk of valid rows is
+written with a few bulk statements. Items are upserted on (inventory, sku) and partners on
+tax_code, with bulk_create(update_conflicts=True). An invalid row is reported with its line
+number and skipped; it never aborts the rest of the file.
+
+Opening balances become one Import transaction that is completed like any other. That
+transaction creates the batches in bulk, the stock movements and the period rollups.
+"""
+import csv
+from decimal import Decimal
+
+from django import forms
+from django.db import transaction as db_transaction
+from django.db.models import F
+
+from ivm.cache import bump_inventory
+from ivm.models import Item, Partner, Transaction, TransactionItem
+
+CHUNK_SIZE = 500
+OPENING_BALANCE_NOTE = "Tồn đầu kỳ (nhập từ tệp CSV)"
+
+ITEM_FIELDS = ['item_name', 'brand', 'packaging', 'unit', 'category', 'description']
+PARTNER_FIELDS = ['name', 'email', 'phone', 'address', 'contact_person']
+# The unit column accepts the code ('Box') or the label shown in the app ('Hộp')
+UNIT_CODES = {label.lower(): code for code, label in Item.UNIT_CHOICES if label}
+
+
+class ImportResult:
+    """Counts of an import, and the rejected rows as (line number, message)."""
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+        self.transaction = None
+
+    def error(self, line, message):
+        self.errors.append((line, message))
+
+
+# ========= Row validation ==========
+
+class ItemRow(forms.Form):
+    sku = forms.CharField(max_length=50)
+    item_name = forms.CharField(max_length=250)
+    brand = forms.CharField(max_length=100, required=False)
+    packaging = forms.CharField(max_length=100, required=False)
+    unit = forms.ChoiceField(choices=Item.UNIT_CHOICES)
+    category = forms.CharField(max_length=50)
+    description = forms.CharField(required=False)
+
+    def __init__(self, data):
+        unit = data.get('unit', '')
+        super().__init__({**data, 'unit': UNIT_CODES.get(unit.lower(), unit)})
+
+class PartnerRow(forms.Form):
+    tax_code = forms.CharField(max_length=200)
+    name = forms.CharField(max_length=200)
+    email = forms.EmailField(required=False)
+    phone = forms.CharField(max_length=20)
+    address = forms.CharField(max_length=200)
+    contact_person = forms.CharField(max_length=200, required=False)
+
+class StockRow(forms.Form):
+    sku = forms.CharField(max_length=50)
+    quantity = forms.DecimalField(max_digits=12, decimal_places=3, min_value=Decimal('0.001'))
+    unit_cost = forms.DecimalField(max_digits=12, decimal_places=2, min_value=0)
+    notes = forms.CharField(required=False)
+
+
+def _form_errors(form):
+    return '; '.join(f"{field}: {' '.join(errors)}" for field, errors in form.errors.items())
+
+def _valid_chunks(file, row_form, result, key, chunk_size):
+    """
+    Reads the CSV `file` (text) and yields chunks of (line number, cleaned data) of the valid rows.
+    Invalid rows, and rows repeating the `key` of an earlier row, go to result.errors.
+    """
+    reader = csv.DictReader(file)
+    # Header names are the field names, in any case
+    columns = {(name or '').strip().lower(): name for name in reader.fieldnames or []}
+    missing = [name for name, field in row_form.base_fields.items() if field.required and name not in columns]
+    if missing:
+        result.error(1, f"Missing column(s): {', '.join(missing)}.")
+        return
+
+    seen = {}
+    chunk = []
+    for row in reader:
+        line = reader.line_num
+        form = row_form({name: (row.get(column) or '').strip() for name, column in columns.items()})
+        if not form.is_valid():
+            result.error(line, _form_errors(form))
+        elif key and form.cleaned_data[key] in seen:
+            result.error(line, f"Same {key} as line {seen[form.cleaned_data[key]]}, skipped.")
+        else:
+            if key:
+                seen[form.cleaned_data[key]] = line
+            chunk.append((line, form.cleaned_data))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+# ========= Imports ==========
+
+def import_items(file, inventory, chunk_size=CHUNK_SIZE):
+    """Creates or updates the items of `inventory` listed in `file`, matched on sku."""
+    result = ImportResult()
+    for chunk in _valid_chunks(file, ItemRow, result, 'sku', chunk_size):
+        skus = [data['sku'] for _, data in chunk]
+        with db_transaction.atomic():
+            existing = set(Item.objects.filter(inventory=inventory, sku__in=skus).values_list('sku', flat=True))
+            Item.objects.bulk_create(
+                [Item(inventory=inventory, sku=data['sku'], **{field: data[field] for field in ITEM_FIELDS})
+                 for _, data in chunk],
+                update_conflicts=True, unique_fields=['inventory', 'sku'], update_fields=ITEM_FIELDS,
+            )
+            # bulk_create() skips Item.save(): the updated items need a new version for their cached rows
+            Item.objects.filter(inventory=inventory, sku__in=existing).update(version=F('version') + 1)
+        result.created += len(chunk) - len(existing)
+        result.updated += len(existing)
+    if result.created or result.updated:
+        bump_inventory(inventory.pk)
+    return result
+
+def import_partners(file, chunk_size=CHUNK_SIZE):
+    """Creates or updates the partners listed in `file`, matched on tax_code."""
+    result = ImportResult()
+    for chunk in _valid_chunks(file, PartnerRow, result, 'tax_code', chunk_size):
+        tax_codes = [data['tax_code'] for _, data in chunk]
+        with db_transaction.atomic():
+            existing = Partner.objects.filter(tax_code__in=tax_codes).count()
+            Partner.objects.bulk_create(
+                [Partner(**data) for _, data in chunk],
+                update_conflicts=True, unique_fields=['tax_code'], update_fields=PARTNER_FIELDS,
+            )
+        result.created += len(chunk) - existing
+        result.updated += existing
+    return result
+
+def import_opening_stock(file, inventory, partner, user, chunk_size=CHUNK_SIZE):
+    """
+    Imports the opening stock of `inventory` (items matched on sku) as one Import transaction
+    from `partner`, created and completed by `user`.
+    """
+    result = ImportResult()
+    lines = []
+    for chunk in _valid_chunks(file, StockRow, result, None, chunk_size):
+        item_ids = dict(Item.objects.filter(inventory=inventory, sku__in={data['sku'] for _, data in chunk})
+                        .values_list('sku', 'pk'))
+        for line, data in chunk:
+            if data['sku'] not in item_ids:
+                result.error(line, f"No item with sku '{data['sku']}' in {inventory.inventory_name}.")
+                continue
+            lines.append(TransactionItem(item_id=item_ids[data['sku']], quantity=data['quantity'],
+                                         unit_cost=data['unit_cost'], notes=data['notes']))
+    # Unknown skus are found after the chunk's validation errors
+    result.errors.sort()
+    if not lines:
+        return result
+
+    with db_transaction.atomic():
+        tx = Transaction.objects.create(
+            transaction_type='Import',
+            inventory=inventory,
+            partner=partner,
+            created_by=user,
+            authorized_by=user,
+            notes=OPENING_BALANCE_NOTE,
+            transaction_status='Authorized',
+        )
+        for t_item in lines:
+            t_item.transaction = tx
+        TransactionItem.objects.bulk_create(lines, batch_size=chunk_size)
+        # Completing creates the batches, stock movements and rollups, as for any import
+        tx.performed_by = user
+        tx.transaction_status = 'Completed'
+        tx.save()
+    result.created = len(lines)
+    result.transaction = tx
+    return result
\ No newline at end of file
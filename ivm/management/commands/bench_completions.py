@@ -0,0 +1,120 @@
+import multiprocessing
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+
+def _setup_worker():
+    import django
+
+    django.setup()
+
+def _complete(transaction_ids, start):
+    """
+    Worker: completes the transactions one by one from `start` (time.time()).
+    Returns ([latency], {error class: count}, time.time() at the end).
+    """
+    from ivm.models import Transaction
+
+    latencies, errors = [], {}
+    while time.time() < start:
+        time.sleep(0.001)
+    for transaction_id in transaction_ids:
+        began = time.perf_counter()
+        try:
+            tx = Transaction.objects.get(pk=transaction_id)
+            tx.transaction_status = 'Completed'
+            tx.save()
+        except Exception as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            continue
+        latencies.append(time.perf_counter() - began)
+    connections.close_all()
+    return latencies, errors, time.time()
+
+
+class Command(BaseCommand):
+    help = ("Completes many small exports of a shared set of items from several worker processes, "
+            "against the configured database (SQLite by default, PostgreSQL with DATABASE_URL), "
+            "and reports the completion throughput. The data it creates is deleted afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--transactions', type=int, default=400)
+        parser.add_argument('--items', type=int, default=20,
+                            help="Items shared by the exports; fewer items means more lock contention.")
+        parser.add_argument('--lines', type=int, default=3, help="Lines per export.")
+
+    def handle(self, *args, **options):
+        from django.contrib.auth import get_user_model
+
+        from ivm.models import Inventory, Item, Partner, Transaction, TransactionItem
+
+        stamp = int(time.time() * 1000)
+        user = get_user_model().objects.create(username=f'bench-completions-{stamp}')
+        partner = Partner.objects.create(name='Bench', phone='-', address='-', tax_code=f'bench-{stamp}')
+        inventory = Inventory.objects.create(inventory_name=f'bench-completions-{stamp}',
+                                             slug=f'bench-completions-{stamp}')
+        try:
+            items = Item.objects.bulk_create(
+                Item(inventory=inventory, item_name=f'Bench item {i}', unit='Piece', category='Bench')
+                for i in range(options['items'])
+            )
+            new_transaction = dict(inventory=inventory, partner=partner, created_by=user,
+                                   transaction_status='Authorized')
+            stock = Transaction.objects.create(transaction_type='Import', **new_transaction)
+            TransactionItem.objects.bulk_create(
+                TransactionItem(transaction=stock, item=item, quantity=Decimal(10 ** 6), unit_cost=Decimal(5))
+                for item in items
+            )
+            stock.transaction_status = 'Completed'
+            stock.save()
+
+            rng = random.Random(0)
+            exports = Transaction.objects.bulk_create(
+                Transaction(transaction_type='Export', **new_transaction) for _ in range(options['transactions'])
+            )
+            TransactionItem.objects.bulk_create(
+                TransactionItem(transaction=tx, item=item, quantity=Decimal(1), unit_cost=Decimal(8))
+                for tx in exports for item in rng.sample(items, min(options['lines'], len(items)))
+            )
+
+            transaction_ids = [tx.pk for tx in exports]
+            chunks = [transaction_ids[worker::options['workers']] for worker in range(options['workers'])]
+            # Workers open their own connections; none may be inherited
+            connections.close_all()
+            # Workers start together once every process is set up, so start-up is not timed
+            start = time.time() + 3 + 0.5 * options['workers']
+            with multiprocessing.get_context('spawn').Pool(options['workers'], initializer=_setup_worker) as pool:
+                results = pool.starmap(_complete, [(chunk, start) for chunk in chunks])
+            elapsed = max(end for _, _, end in results) - start
+
+            latencies = [latency for worker_latencies, _, _ in results for latency in worker_latencies]
+            errors = {}
+            for _, worker_errors, _ in results:
+                for name, count in worker_errors.items():
+                    errors[name] = errors.get(name, 0) + count
+            self._report(options, latencies, errors, elapsed)
+        finally:
+            # Lines PROTECT their items, so the transactions go before the inventory
+            Transaction.objects.filter(inventory=inventory).delete()
+            inventory.delete()
+            partner.delete()
+            user.delete()
+
+    def _report(self, options, latencies, errors, elapsed):
+        pool = connection.settings_dict.get('OPTIONS', {}).get('pool')
+        profile = connection.vendor
+        if pool:
+            profile += f" (pool of {pool.get('max_size', '?') if isinstance(pool, dict) else 'default size'})"
+        p95 = f"{statistics.quantiles(latencies, n=20)[-1] * 1000:.0f} ms" if len(latencies) > 1 else '-'
+        self.stdout.write(
+            f"{profile}: {len(latencies)} of {options['transactions']} exports completed by {options['workers']} "
+            f"worker(s) in {elapsed:.2f} s = {len(latencies) / elapsed:.1f}/s, p95 {p95}"
+        )
+        for name, count in sorted(errors.items()):
+            self.stderr.write(f"{count} failed with {name}")
\ No newline at end of file
@@ -0,0 +1,69 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction as db_transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ivm.models import Inventory, Item, ItemBatch, Partner, Transaction, TransactionItem
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ("Times the completion of an Export that consumes many small FIFO batches. "
+            "Runs inside a transaction that is rolled back, so no data is kept.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batches', type=int, default=1000, help="Number of batches to spread the stock over.")
+        parser.add_argument('--batch-quantity', type=Decimal, default=Decimal('1.5'))
+
+    def handle(self, *args, **options):
+        try:
+            with db_transaction.atomic():
+                self._run(options['batches'], options['batch_quantity'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, batch_count, batch_quantity):
+        now = timezone.now()
+        user = get_user_model().objects.create(username=f'bench-fifo-{now.timestamp()}')
+        partner = Partner.objects.create(name='Bench', phone='-', address='-', tax_code='-')
+        inventory = Inventory.objects.create(inventory_name=f'bench-fifo-{now.timestamp()}', slug=f'bench-fifo-{int(now.timestamp())}')
+        item = Item.objects.create(inventory=inventory, item_name='Bench item', unit='Piece', category='Bench')
+        source = Transaction.objects.create(transaction_type='Import', inventory=inventory, partner=partner,
+                                            created_by=user, transaction_status='Pending')
+
+        ItemBatch.objects.bulk_create(
+            ItemBatch(transaction=source, item=item, unit_cost=Decimal(100 + i % 7),
+                      quantity=batch_quantity, creation_date=now - timedelta(minutes=batch_count - i))
+            for i in range(batch_count)
+        )
+        stock = batch_quantity * batch_count
+        stock_value = sum(batch.value for batch in item.batches.all())
+        item.adjust_stock(stock, stock_value)
+
+        # Leave half a batch behind so the cut-off batch is updated, not deleted
+        export_quantity = stock - batch_quantity / 2
+        export = Transaction.objects.create(transaction_type='Export', inventory=inventory, partner=partner,
+                                            created_by=user, transaction_status='Authorized')
+        TransactionItem.objects.create(transaction=export, item=item, unit_cost=Decimal(200), quantity=export_quantity)
+
+        export.transaction_status = 'Completed'
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            export.save()
+            elapsed = time.perf_counter() - started
+
+        item.refresh_from_db()
+        self.stdout.write(
+            f"Export over {batch_count} batches: {elapsed * 1000:.1f} ms, {len(queries)} queries, "
+            f"report_value={export.transaction_items.get().report_value}, "
+            f"remaining stock={item.stock_on_hand} in {item.batches.count()} batch(es)"
+        )
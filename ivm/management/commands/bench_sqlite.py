@@ -0,0 +1,152 @@
+import multiprocessing
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Python's sqlite3 defaults, which Django used before DATABASES['default']['OPTIONS'] was set
+BASELINE = {'init_command': '', 'transaction_mode': None, 'timeout': 5}
+
+SCHEMA = [
+    "CREATE TABLE item (item_id INTEGER PRIMARY KEY, inventory_id INTEGER NOT NULL, is_active INTEGER NOT NULL,"
+    " stock_on_hand REAL NOT NULL, stock_value REAL NOT NULL, version INTEGER NOT NULL)",
+    "CREATE INDEX item_active ON item (inventory_id) WHERE is_active",
+    "CREATE TABLE movement (movement_id INTEGER PRIMARY KEY, item_id INTEGER NOT NULL, quantity REAL NOT NULL,"
+    " unit_cost REAL NOT NULL, timestamp REAL NOT NULL)",
+    "CREATE INDEX movement_item ON movement (item_id, timestamp)",
+]
+INVENTORIES = 10
+LINES_PER_WRITE = 5
+
+
+def _connect(path, options):
+    """A connection set up the way Django's SQLite backend does with `options`."""
+    conn = sqlite3.connect(path, timeout=options.get('timeout', 5), isolation_level=None)
+    for command in options.get('init_command', '').split(';'):
+        if command.strip():
+            conn.execute(command)
+    return conn
+
+def _read(conn, rng, items):
+    """An inventory page: its active items, and the recent movements of one of them."""
+    conn.execute("SELECT item_id, stock_on_hand, stock_value FROM item WHERE inventory_id = ? AND is_active",
+                 (rng.randrange(INVENTORIES),)).fetchall()
+    conn.execute("SELECT quantity, unit_cost FROM movement WHERE item_id = ? ORDER BY timestamp DESC LIMIT 20",
+                 (rng.randrange(items),)).fetchall()
+
+def _write(conn, rng, items, transaction_mode):
+    """The shape of Transaction.process_transaction(): read the lines' items, then move their stock."""
+    item_ids = rng.sample(range(items), LINES_PER_WRITE)
+    conn.execute(f"BEGIN {transaction_mode or ''}")
+    try:
+        conn.execute(f"SELECT item_id, stock_on_hand FROM item WHERE item_id IN ({','.join('?' * len(item_ids))})",
+                     item_ids).fetchall()
+        for item_id in item_ids:
+            conn.execute("UPDATE item SET stock_on_hand = stock_on_hand + 1, stock_value = stock_value + 10,"
+                         " version = version + 1 WHERE item_id = ?", (item_id,))
+            conn.execute("INSERT INTO movement (item_id, quantity, unit_cost, timestamp) VALUES (?, 1, 10, ?)",
+                         (item_id, time.time()))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+def _worker(role, path, options, items, start, stop, seed):
+    """Runs `role` operations from `start` to `stop` (time.time()). Returns (latencies, locked errors)."""
+    rng = random.Random(seed)
+    conn = _connect(path, options)
+    latencies, locked = [], 0
+    while time.time() < start:
+        time.sleep(0.001)
+    while time.time() < stop:
+        began = time.perf_counter()
+        try:
+            if role == 'read':
+                _read(conn, rng, items)
+            else:
+                _write(conn, rng, items, options.get('transaction_mode'))
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e) and 'busy' not in str(e):
+                raise
+            locked += 1
+            continue
+        latencies.append(time.perf_counter() - began)
+    conn.close()
+    return latencies, locked
+
+
+class Command(BaseCommand):
+    help = ("Concurrent read/write benchmark of SQLite, with Python's defaults and then with "
+            "DATABASES['default']['OPTIONS'] (pragmas, transaction mode, busy timeout). "
+            "Runs on temporary databases in worker processes, like gunicorn workers.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--items', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        database = settings.DATABASES['default']
+        if database['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError("The default database is not SQLite.")
+        configured = {**BASELINE, **database.get('OPTIONS', {})}
+
+        directory = Path(tempfile.mkdtemp(prefix='bench-sqlite-'))
+        try:
+            self.stdout.write(f"{options['readers']} reader(s), {options['writers']} writer(s), "
+                              f"{options['seconds']:g} s, {options['items']} items")
+            self.stdout.write(f"{'':<12}{'reads/s':>10}{'writes/s':>10}{'read p95':>11}{'write p95':>11}"
+                              f"{'locked':>8}")
+            for name, sqlite_options in (('defaults', BASELINE), ('configured', configured)):
+                path = str(directory / f'{name}.sqlite3')
+                self._create(path, sqlite_options, options['items'])
+                self._report(name, self._run(path, sqlite_options, options), options['seconds'])
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    @staticmethod
+    def _create(path, sqlite_options, items):
+        conn = _connect(path, sqlite_options)
+        for statement in SCHEMA:
+            conn.execute(statement)
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT INTO item (item_id, inventory_id, is_active, stock_on_hand, stock_value, version)"
+            " VALUES (?, ?, 1, 100, 1000, 0)",
+            ((item_id, item_id % INVENTORIES) for item_id in range(items)),
+        )
+        conn.execute("COMMIT")
+        conn.close()
+
+    @staticmethod
+    def _run(path, sqlite_options, options):
+        roles = ['read'] * options['readers'] + ['write'] * options['writers']
+        # Workers start together, once every process is up
+        start = time.time() + 1 + 0.1 * len(roles)
+        stop = start + options['seconds']
+        with multiprocessing.get_context('spawn').Pool(len(roles)) as pool:
+            results = pool.starmap(_worker, [
+                (role, path, sqlite_options, options['items'], start, stop, seed)
+                for seed, role in enumerate(roles)
+            ])
+        totals = {'read': ([], 0), 'write': ([], 0)}
+        for role, (latencies, locked) in zip(roles, results):
+            all_latencies, all_locked = totals[role]
+            totals[role] = (all_latencies + latencies, all_locked + locked)
+        return totals
+
+    def _report(self, name, totals, seconds):
+        def p95(latencies):
+            return f"{statistics.quantiles(latencies, n=20)[-1] * 1000:.1f} ms" if len(latencies) > 1 else '-'
+
+        reads, read_locked = totals['read']
+        writes, write_locked = totals['write']
+        self.stdout.write(f"{name:<12}{len(reads) / seconds:>10.0f}{len(writes) / seconds:>10.0f}"
+                          f"{p95(reads):>11}{p95(writes):>11}{read_locked + write_locked:>8}")
\ No newline at end of file
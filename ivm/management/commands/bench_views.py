@@ -0,0 +1,206 @@
+import json
+import logging
+import statistics
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction as db_transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+DUMMY_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+class Command(BaseCommand):
+    help = ("Times the main pages (through the test client) and the key model operations against the "
+            "current database, and prints p50/p95 latency, query count and peak memory as JSON. "
+            "Every run is rolled back, so the data is left as it was. Seed data with seed_demo_data first.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help="Timed runs per benchmark.")
+        parser.add_argument('--warmup', type=int, default=2, help="Untimed runs before the timed ones.")
+        parser.add_argument('--user', help="Username the pages are requested as (default: the first superuser).")
+        parser.add_argument('--inventory', help="Inventory slug (default: the one with the most items).")
+        parser.add_argument('--lines', type=int, default=10, help="Lines of the completed transactions.")
+        parser.add_argument('--no-cache', action='store_true',
+                            help="Use a dummy cache, so cached pages and aggregates are recomputed every time.")
+        parser.add_argument('--only', nargs='+', metavar='NAME', help="Run only these benchmarks.")
+        parser.add_argument('-o', '--output', help="Write the JSON to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        from ivm import my_functions
+        from ivm.models import Inventory, Transaction
+
+        if options['repeat'] < 2:
+            raise CommandError("--repeat must be at least 2.")
+        user = self._user(options['user'])
+        inventories = Inventory.objects.annotate(item_count=Count('items'))
+        if options['inventory']:
+            inventory = inventories.filter(slug=options['inventory']).first()
+        else:
+            inventory = inventories.order_by('-item_count', 'pk').first()
+        if inventory is None:
+            raise CommandError("No inventory to benchmark, run seed_demo_data first.")
+        # The open transaction with the most lines: its details page and printable slip
+        largest = (Transaction.objects.filter(inventory=inventory).exclude(transaction_status='Completed')
+                   .annotate(line_count=Count('transaction_items')).order_by('-line_count', 'pk').first())
+
+        self.options = options
+        views = {
+            'dashboard': reverse('dashboard'),
+            'list_inventories': reverse('ivm:inventory_manager'),
+            'inventory_details': reverse('ivm:inv_page', args=[inventory.slug]),
+            'stock_series': reverse('ivm:stock_series', args=[inventory.slug]),
+            'list_transactions': reverse('ivm:transactions'),
+            'list_partners': reverse('ivm:page_partners'),
+            'add_transaction': reverse('ivm:add_transaction'),
+            'export_transactions': reverse('ivm:export_data', args=['transactions']),
+            'tasks_list': reverse('tasks:tasks_list'),
+        }
+        if largest is not None:
+            views['transaction_details'] = reverse('ivm:transaction_detail', args=[largest.pk])
+            views['file_pdf_transaction'] = reverse('ivm:transaction_pdf', args=[largest.pk])
+        operations = {
+            'complete_import': lambda: self._completion('Import', inventory, user),
+            'complete_export': lambda: self._completion('Export', inventory, user),
+            'inventories_summary': lambda: my_functions.get_all_inventories_summary,
+            'inventory_financials': lambda: lambda: list(Inventory.objects.with_financials()),
+        }
+        if options['only']:
+            unknown = set(options['only']) - set(views) - set(operations)
+            if unknown:
+                raise CommandError(f"Unknown benchmark(s): {', '.join(sorted(unknown))}.")
+            views = {name: url for name, url in views.items() if name in options['only']}
+            operations = {name: setup for name, setup in operations.items() if name in options['only']}
+
+        client = Client()
+        # Logged in outside of the rolled back runs, so the session survives them
+        client.force_login(user)
+        results = []
+        hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        # One request log line per run (VaalbaraApp.middleware) would bury the report
+        request_log = logging.getLogger('vaalbara.requests')
+        request_log.disabled = True
+        with override_settings(ALLOWED_HOSTS=hosts, **({'CACHES': DUMMY_CACHE} if options['no_cache'] else {})):
+            try:
+                for name, url in views.items():
+                    results.append({'name': name, 'kind': 'view', 'url': url,
+                                    **self._measure(lambda: lambda: self._get(client, url))})
+                for name, setup in operations.items():
+                    results.append({'name': name, 'kind': 'operation', **self._measure(setup)})
+            finally:
+                client.logout()
+                request_log.disabled = False
+
+        report = {
+            'time': timezone.now().isoformat(timespec='seconds'),
+            'database': connection.vendor,
+            'cache': 'dummy' if options['no_cache'] else settings.CACHES['default']['BACKEND'],
+            'debug': settings.DEBUG,
+            'repeat': options['repeat'],
+            'inventory': inventory.slug,
+            'data': self._data_sizes(),
+            'results': results,
+        }
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+            for result in results:
+                self.stdout.write(f"{result['name']:<24}{result['p50_ms']:>9.1f} ms{result['p95_ms']:>9.1f} ms"
+                                  f"{result['queries']:>6} queries{result['peak_kib']:>9} KiB")
+        else:
+            self.stdout.write(output)
+
+    @staticmethod
+    def _user(username):
+        User = get_user_model()
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"No user '{username}'.")
+        user = User.objects.filter(is_superuser=True, is_active=True).order_by('pk').first()
+        if user is None:
+            raise CommandError("No superuser, create one or pass --user.")
+        return user
+
+    @staticmethod
+    def _get(client, url):
+        response = client.get(url)
+        if response.status_code >= 400:
+            raise CommandError(f"{url} returned {response.status_code}.")
+        # Streaming responses run their queries while the body is read. The client closes responses
+        # itself, without closing the connection (and so the transaction of the run) as requests do.
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response
+
+    def _measure(self, setup):
+        """
+        Runs `setup()` and times the operation it returns, --warmup + --repeat times, each in a
+        transaction that is rolled back. Memory is the tracemalloc peak of one more run: tracing
+        slows Python down, so it is kept out of the timed runs.
+        """
+        timings, queries = [], 0
+        for run in range(self.options['warmup'] + self.options['repeat'] + 1):
+            traced = run == self.options['warmup'] + self.options['repeat']
+            with db_transaction.atomic():
+                operation = setup()
+                if traced:
+                    tracemalloc.start()
+                    operation()
+                    _, peak = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+                else:
+                    with CaptureQueriesContext(connection) as captured:
+                        began = time.perf_counter()
+                        operation()
+                        elapsed = time.perf_counter() - began
+                    if run >= self.options['warmup']:
+                        timings.append(elapsed)
+                        queries = len(captured)
+                db_transaction.set_rollback(True)
+        return {
+            'p50_ms': round(statistics.median(timings) * 1000, 2),
+            'p95_ms': round(statistics.quantiles(timings, n=20)[-1] * 1000, 2),
+            'mean_ms': round(statistics.fmean(timings) * 1000, 2),
+            'queries': queries,
+            'peak_kib': peak // 1024,
+        }
+
+    def _completion(self, transaction_type, inventory, user):
+        """A new authorized transaction of --lines items; the operation completes it (process_transaction)."""
+        from ivm.models import Partner, Transaction, TransactionItem
+
+        items = inventory.items.order_by('pk')
+        if transaction_type == 'Export':
+            items = items.filter(stock_on_hand__gte=1).order_by('-stock_on_hand', 'pk')
+        items = list(items[:self.options['lines']])
+        partner = Partner.objects.order_by('pk').first()
+        if not items or partner is None:
+            raise CommandError(f"No partner or no items{' in stock' if transaction_type == 'Export' else ''} "
+                               f"in {inventory.slug} to complete an {transaction_type}.")
+        tx = Transaction.objects.create(transaction_type=transaction_type, inventory=inventory, partner=partner,
+                                        created_by=user, transaction_status='Authorized')
+        TransactionItem.objects.bulk_create(
+            TransactionItem(transaction=tx, item=item, quantity=Decimal(1), unit_cost=Decimal(1000)) for item in items
+        )
+        tx.transaction_status = 'Completed'
+        tx.performed_by = user
+        return tx.save
+
+    @staticmethod
+    def _data_sizes():
+        from ivm.models import Inventory, Item, ItemBatch, Partner, StockMovement, Transaction, TransactionItem
+
+        return {model._meta.label: model.objects.count()
+                for model in (Inventory, Item, ItemBatch, Partner, StockMovement, Transaction, TransactionItem)}
\ No newline at end of file
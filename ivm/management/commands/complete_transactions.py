@@ -0,0 +1,44 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from ivm.models import Transaction
+
+
+class Command(BaseCommand):
+    help = ("Completes many authorized transactions in chronological order in one atomic unit. "
+            "A transaction that fails is rolled back on its own and reported.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('transaction_ids', nargs='*', type=int)
+        parser.add_argument('--all-authorized', action='store_true',
+                            help="Complete every transaction currently in 'Authorized' status.")
+        parser.add_argument('--user', help="Username recorded as performed_by.")
+
+    def handle(self, *args, **options):
+        if options['all_authorized']:
+            transactions = Transaction.objects.filter(transaction_status='Authorized')
+        elif options['transaction_ids']:
+            transactions = Transaction.objects.filter(pk__in=options['transaction_ids'])
+        else:
+            raise CommandError("Pass transaction IDs or --all-authorized.")
+
+        performed_by = None
+        if options['user']:
+            try:
+                performed_by = get_user_model().objects.get(username=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist.")
+
+        missing = set(options['transaction_ids']) - set(transactions.values_list('pk', flat=True))
+        for transaction_id in sorted(missing):
+            self.stderr.write(f"{transaction_id}: does not exist")
+
+        results = transactions.complete(performed_by=performed_by)
+        for transaction_id, error in results.items():
+            if error:
+                self.stderr.write(f"{transaction_id}: {error}")
+            else:
+                self.stdout.write(f"{transaction_id}: completed")
+
+        completed = sum(error is None for error in results.values())
+        self.stdout.write(self.style.SUCCESS(f"Completed {completed} of {len(results)} transaction(s)."))
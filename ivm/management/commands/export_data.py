@@ -0,0 +1,52 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ivm.exports import EXPORTS, write_csv, write_xlsx
+from ivm.forms import TransactionFilterForm
+from ivm.models import Inventory
+
+
+class Command(BaseCommand):
+    help = ("Exports transactions, transaction lines, item stock or partners as CSV or XLSX, "
+            "with the filters of the transactions list. Rows are streamed, so memory stays flat.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=['csv', 'xlsx'], default='csv')
+        parser.add_argument('-o', '--output', help="Output file. Default: stdout (CSV only).")
+        parser.add_argument('--status', default='')
+        parser.add_argument('--type', default='')
+        parser.add_argument('--inventory', help="Inventory slug.")
+        parser.add_argument('--from', dest='date_from', default='', help="First creation day, YYYY-MM-DD.")
+        parser.add_argument('--to', dest='date_to', default='', help="Last creation day, YYYY-MM-DD.")
+
+    def handle(self, *args, **options):
+        export = EXPORTS[options['dataset']]
+        data = {key: options[key] for key in ('status', 'type', 'date_from', 'date_to')}
+        if options['inventory']:
+            inventory = Inventory.objects.filter(slug=options['inventory']).first()
+            if inventory is None:
+                raise CommandError(f"No inventory with slug '{options['inventory']}'.")
+            data['inventory'] = inventory.pk
+        # Same form as the list view, but invalid filters are an error here instead of being ignored
+        filter_form = TransactionFilterForm(data)
+        if not filter_form.is_valid():
+            raise CommandError(filter_form.errors.as_text())
+
+        output = options['output']
+        if options['format'] == 'xlsx':
+            if not output:
+                raise CommandError("XLSX needs --output.")
+            try:
+                with open(output, 'wb') as file:
+                    write_xlsx(export, filter_form, file)
+            except ValueError as e:
+                raise CommandError(str(e))
+        elif output:
+            with open(output, 'w', newline='', encoding='utf-8') as file:
+                write_csv(export, filter_form, file)
+        else:
+            write_csv(export, filter_form, sys.stdout)
+            return
+        self.stdout.write(self.style.SUCCESS(f"Exported {options['dataset']} to {output}."))
\ No newline at end of file
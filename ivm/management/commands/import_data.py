@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from ivm.imports import CHUNK_SIZE, import_items, import_opening_stock, import_partners
+from ivm.models import Inventory, Partner
+
+
+class Command(BaseCommand):
+    help = ("Imports items, partners or opening stock balances from a UTF-8 CSV file. "
+            "Invalid rows are reported and skipped; the rest of the file is imported.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['items', 'partners', 'stock'])
+        parser.add_argument('file')
+        parser.add_argument('--inventory', help="Inventory slug (items, stock).")
+        parser.add_argument('--partner', metavar='TAX_CODE', help="Partner of the opening balance transaction (stock).")
+        parser.add_argument('--user', help="Username creating the opening balance transaction (stock).")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        inventory = partner = user = None
+        if kind in ('items', 'stock'):
+            inventory = self._get(Inventory, 'inventory', slug=options['inventory'])
+        if kind == 'stock':
+            partner = self._get(Partner, 'partner', tax_code=options['partner'])
+            user = self._get(get_user_model(), 'user', username=options['user'])
+
+        with open(options['file'], encoding='utf-8-sig', newline='') as file:
+            if kind == 'items':
+                result = import_items(file, inventory, options['chunk_size'])
+            elif kind == 'partners':
+                result = import_partners(file, options['chunk_size'])
+            else:
+                result = import_opening_stock(file, inventory, partner, user, options['chunk_size'])
+
+        for line, message in result.errors:
+            self.stderr.write(f"Line {line}: {message}")
+        summary = f"{result.created} created, {result.updated} updated, {len(result.errors)} row(s) rejected."
+        if result.transaction:
+            summary += f" Opening balance: {result.transaction.code}."
+        self.stdout.write(self.style.SUCCESS(summary) if not result.errors else self.style.WARNING(summary))
+
+    @staticmethod
+    def _get(model, option, **lookup):
+        value = next(iter(lookup.values()))
+        if not value:
+            raise CommandError(f"--{option} is required.")
+        try:
+            return model.objects.get(**lookup)
+        except model.DoesNotExist:
+            raise CommandError(f"No {option} '{value}'.")
\ No newline at end of file
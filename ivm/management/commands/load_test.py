@@ -0,0 +1,413 @@
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import timedelta
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+
+from django.conf import settings
+from django.contrib.messages import constants
+from django.contrib.messages.storage.cookie import CookieStorage, MessageSerializer
+from django.core import signing
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.urls import reverse
+from django.utils import timezone
+
+LOCKED = 'database is locked'
+GROUP = 'Load test'
+# What the load test users need to read every page and author, authorize and complete transactions
+PERMISSIONS = ['view_inventory', 'view_item', 'view_partner', 'view_transaction', 'add_transaction',
+               'authorize_transaction', 'complete_transaction']
+WRITES = ['add', 'authorize', 'complete']
+# Export lines only use items with this much stock, so most completions have enough
+MIN_EXPORT_STOCK = 20
+
+
+class _NoRedirect(HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class _Session:
+    """One logged in browser: its cookies, the CSRF token, and the messages the server left for it."""
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.jar = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.jar), _NoRedirect)
+
+    def request(self, path, data=None, headers=None):
+        """(status, headers, body) of a GET, or of a POST of `data` with the CSRF token; redirects are not followed."""
+        if data is not None:
+            data = urlencode({**data, 'csrfmiddlewaretoken': self.cookie('csrftoken') or ''}, doseq=True).encode()
+        request = Request(self.base_url + path, data=data, headers=headers or {})
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                return response.status, response.headers, response.read().decode('utf-8', 'replace')
+        except HTTPError as e:
+            with e:
+                return e.code, e.headers, e.read().decode('utf-8', 'replace')
+
+    def cookie(self, name):
+        return next((cookie.value for cookie in self.jar if cookie.name == name), None)
+
+    def pop_messages(self):
+        """
+        django.contrib.messages the last responses stored in the cookie, which is then
+        dropped as if a page had shown them. Empty when the server uses another SECRET_KEY.
+        """
+        for cookie in list(self.jar):
+            if cookie.name == CookieStorage.cookie_name:
+                self.jar.clear(cookie.domain, cookie.path, cookie.name)
+                try:
+                    signer = signing.get_cookie_signer(salt=CookieStorage.key_salt)
+                    messages = signer.unsign_object(cookie.value.strip('"'), serializer=MessageSerializer)
+                except (signing.BadSignature, ValueError):
+                    return []
+                return messages or []
+        return []
+
+    def login(self, username, password):
+        path = reverse('users:login')
+        self.request(path)
+        status, headers, _ = self.request(path, {'username': username, 'password': password})
+        if status != 302:
+            raise CommandError(f"Login of {username} failed (HTTP {status}); seed users with --password.")
+
+
+class Command(BaseCommand):
+    help = ("Load test: starts gunicorn with VaalbaraApp.wsgi (or targets --url), logs concurrent clients in "
+            "as seeded users and replays a mix of page reads and transaction writes (add, authorize, complete). "
+            "Reports throughput, latency percentiles, error rates and 'database is locked' retries. "
+            "Run it on seed_demo_data data: the transactions it creates are kept, with notes 'load_test'. "
+            "The users are added to a 'Load test' group that can read and write transactions.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help="Target a running server instead of starting gunicorn.")
+        parser.add_argument('--bind', default='127.0.0.1:8765', help="Address of the started gunicorn.")
+        parser.add_argument('--workers', type=int, default=4, help="gunicorn worker processes.")
+        parser.add_argument('--threads', type=int, default=1, help="Threads per gunicorn worker.")
+        parser.add_argument('--clients', type=int, default=8, help="Concurrent simulated users.")
+        parser.add_argument('--duration', type=float, default=30, help="Seconds of load.")
+        parser.add_argument('--read', type=int, default=70, help="Weight of page reads in the mix.")
+        parser.add_argument('--add', type=int, default=15, help="Weight of add_transaction.")
+        parser.add_argument('--authorize', type=int, default=8, help="Weight of authorize_transaction.")
+        parser.add_argument('--complete', type=int, default=7, help="Weight of complete_transaction.")
+        parser.add_argument('--retries', type=int, default=3,
+                            help="Times a write that hit 'database is locked' is retried.")
+        parser.add_argument('--users', default='demo-user-', help="Username prefix of the simulated users.")
+        parser.add_argument('--password', required=True, help="Password of those users (seed_demo_data --password).")
+        parser.add_argument('--timeout', type=float, default=30, help="Seconds before a request fails.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('-o', '--output', help="Also write the JSON report to this file.")
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.usernames = self._prepare_users(options['users'])
+        self.targets = self._targets()
+        # The server and the clients have the database to themselves
+        connections.close_all()
+
+        server, log = None, None
+        base_url = (options['url'] or f"http://{options['bind']}").rstrip('/')
+        try:
+            if not options['url']:
+                log = tempfile.TemporaryFile()
+                server = self._start_gunicorn(log)
+                self._wait_until_up(base_url, server, log)
+            report = self._run(base_url)
+        finally:
+            if server is not None:
+                server.terminate()
+                try:
+                    server.wait(timeout=15)
+                except subprocess.TimeoutExpired:
+                    server.kill()
+        if log is not None:
+            log.seek(0)
+            report['locked']['server_log'] = log.read().decode('utf-8', 'replace').count(LOCKED)
+            log.close()
+
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+            for name, result in report['operations'].items():
+                self.stdout.write(f"{name:<20}{result['count']:>7}{result['per_second']:>8.1f}/s"
+                                  f"{result['p50_ms']:>9.1f} ms{result['p95_ms']:>9.1f} ms{result['p99_ms']:>9.1f} ms"
+                                  f"{result['errors']:>5} errors{result['failed']:>5} refused")
+            locked = report['locked']
+            self.stdout.write(f"{report['requests']} requests in {report['duration_s']} s = "
+                              f"{report['throughput_rps']}/s, error rate {report['error_rate']:.2%}; "
+                              f"'{LOCKED}': {locked['retries']} retries, {locked['gave_up']} gave up, "
+                              f"{locked['server_log']} in the server log")
+        else:
+            self.stdout.write(output)
+
+    def _prepare_users(self, prefix):
+        from django.contrib.auth import get_user_model
+        from django.contrib.auth.models import Group, Permission
+
+        users = list(get_user_model().objects.filter(username__startswith=prefix, is_active=True).order_by('pk'))
+        if not users:
+            raise CommandError(f"No users named {prefix}*, run seed_demo_data --password <password> first.")
+        group, _ = Group.objects.get_or_create(name=GROUP)
+        group.permissions.add(*Permission.objects.filter(content_type__app_label='ivm', codename__in=PERMISSIONS))
+        for user in users:
+            user.groups.add(group)
+        return [user.username for user in users]
+
+    def _targets(self):
+        """Inventories with their active item ids (and those in stock), and the partner ids."""
+        from ivm.models import Inventory, Item, Partner
+
+        inventories = {inventory.pk: inventory.slug for inventory in Inventory.objects.all()}
+        items, stocked = defaultdict(list), defaultdict(list)
+        # Only active items can be picked in the transaction form
+        rows = Item.objects.filter(is_active=True).values_list('pk', 'inventory_id', 'stock_on_hand')
+        for item_id, inventory_id, stock in rows:
+            items[inventory_id].append(item_id)
+            if stock >= MIN_EXPORT_STOCK:
+                stocked[inventory_id].append(item_id)
+        inventories = {pk: slug for pk, slug in inventories.items() if items[pk]}
+        partners = list(Partner.objects.values_list('pk', flat=True)[:500])
+        if not inventories or not partners:
+            raise CommandError("No inventory with items, or no partner: run seed_demo_data first.")
+        return {
+            'inventories': inventories,
+            'items': items,
+            'stocked': stocked,
+            'partners': partners,
+            'database': connection.vendor,
+        }
+
+    def _start_gunicorn(self, log):
+        command = [
+            sys.executable, '-m', 'gunicorn', 'VaalbaraApp.wsgi:application',
+            '--bind', self.options['bind'],
+            '--workers', str(self.options['workers']),
+            '--threads', str(self.options['threads']),
+            '--timeout', str(int(self.options['timeout']) * 2),
+        ]
+        try:
+            return subprocess.Popen(command, cwd=settings.BASE_DIR, env=os.environ.copy(), stdout=log,
+                                    stderr=subprocess.STDOUT)
+        except OSError as e:
+            raise CommandError(f"Could not start gunicorn: {e}")
+
+    def _wait_until_up(self, base_url, server, log):
+        session = _Session(base_url, timeout=5)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                log.seek(0)
+                raise CommandError(f"gunicorn exited:\n{log.read().decode('utf-8', 'replace')[-2000:]}")
+            try:
+                if session.request(reverse('users:login'))[0] == 200:
+                    return
+            except (URLError, OSError):
+                pass
+            time.sleep(0.2)
+        raise CommandError("gunicorn did not answer within 30 s.")
+
+    def _run(self, base_url):
+        options = self.options
+        # Transactions created by the clients, waiting to be authorized, then completed
+        self.pending, self.authorized = deque(), deque()
+        self.lock = threading.Lock()
+        self.results = defaultdict(lambda: {'latencies': [], 'ok': 0, 'failed': 0, 'errors': 0,
+                                            'locked_retries': 0, 'locked_gave_up': 0})
+        sessions = []
+        for client in range(options['clients']):
+            session = _Session(base_url, options['timeout'])
+            session.login(self.usernames[client % len(self.usernames)], options['password'])
+            sessions.append(session)
+
+        began = time.monotonic()
+        stop = began + options['duration']
+        threads = [threading.Thread(target=self._client, args=(session, random.Random(options['seed'] + n), stop))
+                   for n, session in enumerate(sessions)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - began
+        return self._report(base_url, elapsed)
+
+    def _client(self, session, rng, stop):
+        weights = {'read': self.options['read'], **{write: self.options[write] for write in WRITES}}
+        while time.monotonic() < stop:
+            operation = rng.choices(list(weights), weights=list(weights.values()))[0]
+            # Nothing to authorize or complete yet: author a transaction instead
+            if operation == 'complete' and not self.authorized:
+                operation = 'authorize'
+            if operation == 'authorize' and not self.pending:
+                operation = 'add'
+            if operation == 'read':
+                self._read(session, rng)
+            else:
+                self._write(session, rng, operation)
+
+    def _read(self, session, rng):
+        inventory_id, slug = rng.choice(list(self.targets['inventories'].items()))
+        name, path, headers = rng.choice([
+            ('dashboard', reverse('dashboard'), {}),
+            ('list_inventories', reverse('ivm:inventory_manager'), {}),
+            ('list_transactions', reverse('ivm:transactions'), {}),
+            ('inventory_details', reverse('ivm:inv_page', args=[slug]), {}),
+            ('tasks_list', reverse('tasks:tasks_list'), {}),
+            ('item_detail_panel',
+             reverse('ivm:item_detail_panel', args=[rng.choice(self.targets['items'][inventory_id])]),
+             {'HX-Request': 'true'}),
+        ])
+        began = time.perf_counter()
+        try:
+            status = session.request(path, headers=headers)[0]
+        except (URLError, OSError):
+            status = None
+        self._record(name, time.perf_counter() - began, 'ok' if status == 200 else 'errors')
+
+    def _write(self, session, rng, operation):
+        transaction_id = None
+        if operation in ('authorize', 'complete'):
+            queue = self.pending if operation == 'authorize' else self.authorized
+            try:
+                transaction_id = queue.popleft()
+            except IndexError:
+                return
+        request = self._write_request(rng, operation, transaction_id)
+
+        began = time.perf_counter()
+        for attempt in range(self.options['retries'] + 1):
+            try:
+                outcome, created = self._send(session, operation, *request)
+            except (URLError, OSError):
+                outcome, created = 'errors', None
+            if outcome != 'locked':
+                break
+            self._count(operation, 'locked_retries')
+            time.sleep(0.05 * 2 ** attempt)
+        else:
+            self._count(operation, 'locked_gave_up')
+            outcome = 'errors'
+        self._record(operation, time.perf_counter() - began, outcome)
+
+        if outcome == 'ok':
+            if operation == 'add':
+                self.pending.append(created)
+            elif operation == 'authorize':
+                self.authorized.append(transaction_id)
+
+    def _write_request(self, rng, operation, transaction_id):
+        """(path, form data) of a write."""
+        if operation == 'authorize':
+            return reverse('ivm:authorize_transaction', args=[transaction_id]), {}
+        if operation == 'complete':
+            return reverse('ivm:complete_transaction', args=[transaction_id]), {}
+
+        inventory_id = rng.choice(list(self.targets['inventories']))
+        transaction_type = 'Export' if rng.random() < 0.5 and self.targets['stocked'][inventory_id] else 'Import'
+        candidates = self.targets['stocked' if transaction_type == 'Export' else 'items'][inventory_id]
+        items = rng.sample(candidates, min(len(candidates), rng.randint(1, 3)))
+        data = {
+            'inventory': inventory_id,
+            'transaction_type': transaction_type,
+            'partner': rng.choice(self.targets['partners']),
+            'partner_bill': f'LT{rng.randrange(10 ** 6):06d}',
+            'completion_deadline': (timezone.localtime() + timedelta(days=3)).strftime('%Y-%m-%dT%H:%M'),
+            'extra_cost': 0,
+            'notes': 'load_test',
+            'items-TOTAL_FORMS': len(items), 'items-INITIAL_FORMS': 0,
+            'items-MIN_NUM_FORMS': 0, 'items-MAX_NUM_FORMS': 1000,
+        }
+        for n, item_id in enumerate(items):
+            data.update({
+                f'items-{n}-item': item_id,
+                f'items-{n}-quantity': 1 if transaction_type == 'Export' else 10,
+                f'items-{n}-unit_cost': rng.randrange(1_000, 100_000, 100),
+                f'items-{n}-discount': 0,
+            })
+        return reverse('ivm:add_transaction'), data
+
+    @staticmethod
+    def _send(session, operation, path, data):
+        """
+        Posts a write and classifies it: ('ok', id of a created transaction), ('locked', None),
+        ('failed', None) when the application refused it (form or stock errors, a concurrent
+        change), or ('errors', None) on HTTP errors.
+        """
+        status, headers, body = session.request(path, data)
+        messages = session.pop_messages()
+        if LOCKED in body or any(LOCKED in message.message for message in messages):
+            return 'locked', None
+        if status >= 400:
+            return 'errors', None
+        if operation == 'add':
+            # Saved: redirected to the new transaction; otherwise the form is shown again with its errors
+            location = headers.get('Location', '') if status == 302 else ''
+            created = location.rstrip('/').rsplit('/', 1)[-1]
+            return ('ok', int(created)) if created.isdigit() else ('failed', None)
+        # authorize/complete always redirect; refusals are reported as error messages
+        failed = any(message.level >= constants.ERROR for message in messages)
+        return ('failed' if failed else 'ok'), None
+
+    def _record(self, operation, latency, outcome):
+        with self.lock:
+            result = self.results[operation]
+            result['latencies'].append(latency)
+            result[outcome] += 1
+
+    def _count(self, operation, key):
+        with self.lock:
+            self.results[operation][key] += 1
+
+    def _report(self, base_url, elapsed):
+        def percentile(latencies, n):
+            if len(latencies) < 2:
+                return round(latencies[0] * 1000, 1) if latencies else None
+            return round(statistics.quantiles(latencies, n=100)[n - 1] * 1000, 1)
+
+        operations = {}
+        for name, result in sorted(self.results.items()):
+            latencies = result.pop('latencies')
+            count = len(latencies)
+            operations[name] = {
+                'count': count,
+                'per_second': round(count / elapsed, 2),
+                **result,
+                'error_rate': round(result['errors'] / count, 4) if count else 0,
+                'p50_ms': percentile(latencies, 50),
+                'p95_ms': percentile(latencies, 95),
+                'p99_ms': percentile(latencies, 99),
+            }
+        total = sum(operation['count'] for operation in operations.values())
+        writes = [operations[name] for name in WRITES if name in operations]
+        return {
+            'time': timezone.now().isoformat(timespec='seconds'),
+            'target': base_url,
+            'database': self.targets['database'],
+            'server': None if self.options['url'] else {'workers': self.options['workers'],
+                                                        'threads': self.options['threads']},
+            'clients': self.options['clients'],
+            'duration_s': round(elapsed, 2),
+            'requests': total,
+            'throughput_rps': round(total / elapsed, 2),
+            'error_rate': round(sum(operation['errors'] for operation in operations.values()) / total, 4)
+            if total else 0,
+            'locked': {
+                'retries': sum(write['locked_retries'] for write in writes),
+                'gave_up': sum(write['locked_gave_up'] for write in writes),
+                'server_log': None,
+            },
+            'operations': operations,
+        }
@@ -0,0 +1,74 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction as db_transaction
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from ivm.cache import bump_inventory
+from ivm.models import Inventory, InventoryPeriodSummary, Transaction, TransactionItem
+from ivm.models.transaction_models import LINE_VALUE, MONEY_FIELD
+from ivm.my_functions import ZERO
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the InventoryPeriodSummary rollup table from completed transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help="Number of transactions fetched per round trip.")
+
+    def handle(self, *args, **options):
+        # Completions go on while this runs (build.sh runs it on every deploy). The totals are read
+        # in the transaction that replaces the rows, with completions kept out of the rollup table
+        # until it commits: SQLite's IMMEDIATE transactions take the write lock at BEGIN, and
+        # PostgreSQL's table lock waits for the completions that already wrote to the table.
+        # Later completions then add to the rebuilt rows instead of being wiped with the old ones.
+        with db_transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(f'LOCK TABLE {InventoryPeriodSummary._meta.db_table} IN EXCLUSIVE MODE')
+            summaries = self._summaries(options['chunk_size'])
+            InventoryPeriodSummary.objects.all().delete()
+            InventoryPeriodSummary.objects.bulk_create(summaries, batch_size=options['chunk_size'])
+            # The cached dashboard and inventory figures are computed from the rollups
+            for inventory_id in Inventory.objects.values_list('pk', flat=True):
+                bump_inventory(inventory_id)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(summaries)} period summaries."))
+
+    @staticmethod
+    def _summaries(chunk_size):
+        """Unsaved InventoryPeriodSummary rows of all completed transactions."""
+        lines = TransactionItem.objects.filter(transaction=OuterRef('pk')).order_by().values('transaction')
+        transactions = (
+            Transaction.objects.filter(transaction_status='Completed')
+            .annotate(
+                line_total=Coalesce(Subquery(lines.annotate(total=Sum(LINE_VALUE)).values('total'),
+                                             output_field=MONEY_FIELD), ZERO),
+                line_count=Coalesce(Subquery(lines.annotate(total=Count('pk')).values('total')), 0),
+            )
+            .order_by()
+            .only('inventory_id', 'transaction_type', 'completion_date', 'extra_cost')
+        )
+
+        # One streaming pass over the transactions, bucketed the same way as
+        # InventoryPeriodSummary.record_transaction() buckets them incrementally.
+        totals = defaultdict(lambda: {'revenue': Decimal(0), 'cost': Decimal(0),
+                                      'extra_cost': Decimal(0), 'line_count': 0})
+        for tx in transactions.iterator(chunk_size=chunk_size):
+            year, month = InventoryPeriodSummary.period_of(tx)
+            bucket = totals[(tx.inventory_id, year, month, tx.transaction_type)]
+            if tx.transaction_type == 'Export':
+                bucket['revenue'] += tx.line_total
+            else:
+                bucket['cost'] += tx.line_total
+            bucket['extra_cost'] += tx.extra_cost
+            bucket['line_count'] += tx.line_count
+
+        return [
+            InventoryPeriodSummary(inventory_id=inventory_id, year=year, month=month,
+                                   transaction_type=transaction_type, **figures)
+            for (inventory_id, year, month, transaction_type), figures in totals.items()
+        ]
@@ -0,0 +1,85 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+
+def _setup_worker():
+    import django
+
+    django.setup()
+
+def _render(transaction_id):
+    """Worker: renders and stores one PDF. Returns (transaction_id, error message or None)."""
+    from ivm.pdf import cached_pdf
+
+    try:
+        cached_pdf(transaction_id)
+    except Exception as e:
+        return transaction_id, f"{type(e).__name__}: {e}"
+    return transaction_id, None
+
+
+class Command(BaseCommand):
+    help = ("Renders and stores the PDF slips of completed transactions in a process pool, "
+            "optionally merging them into one document (e.g. for month-end printing).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('transaction_ids', nargs='*', type=int)
+        parser.add_argument('--month', help="Completion month, YYYY-MM.")
+        parser.add_argument('--inventory', help="Inventory slug.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--merge', metavar='PATH', help="Also write all the slips, in completion order, to PATH.")
+
+    def handle(self, *args, **options):
+        # Imported here: spawned workers import this module for _render before django.setup()
+        from ivm.models import Transaction
+
+        transactions = Transaction.objects.filter(transaction_status='Completed')
+        if options['transaction_ids']:
+            transactions = transactions.filter(pk__in=options['transaction_ids'])
+        if options['month']:
+            try:
+                start = timezone.make_aware(datetime.strptime(options['month'], '%Y-%m'))
+            except ValueError:
+                raise CommandError("--month must be YYYY-MM.")
+            end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+            transactions = transactions.filter(completion_date__gte=start, completion_date__lt=end)
+        if options['inventory']:
+            transactions = transactions.filter(inventory__slug=options['inventory'])
+        transaction_ids = list(transactions.order_by('completion_date', 'transaction_id').values_list('pk', flat=True))
+        if not transaction_ids:
+            self.stdout.write("No completed transactions match.")
+            return
+
+        # Workers open their own connections; none may be inherited
+        connections.close_all()
+        failed = {}
+        # spawn: same behaviour on every platform, and no forked database state
+        with ProcessPoolExecutor(max_workers=options['workers'], mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_setup_worker) as pool:
+            for transaction_id, error in pool.map(_render, transaction_ids, chunksize=8):
+                if error:
+                    failed[transaction_id] = error
+                    self.stderr.write(f"{transaction_id}: {error}")
+
+        rendered = [pk for pk in transaction_ids if pk not in failed]
+        self.stdout.write(self.style.SUCCESS(f"{len(rendered)} PDF(s) ready, {len(failed)} failed."))
+        if options['merge'] and rendered:
+            self._merge(rendered, options['merge'])
+
+    def _merge(self, transaction_ids, target):
+        from pypdf import PdfWriter
+
+        from ivm.pdf import pdf_path
+
+        writer = PdfWriter()
+        for transaction_id in transaction_ids:
+            writer.append(str(pdf_path(transaction_id)))
+        with open(target, 'wb') as output:
+            writer.write(output)
+        self.stdout.write(self.style.SUCCESS(f"Merged {len(transaction_ids)} slip(s) into {target}."))
\ No newline at end of file
@@ -0,0 +1,274 @@
+import random
+from collections import deque
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from ivm.cache import bump_inventory
+from ivm.models import Inventory, Item, ItemBatch, Partner, StockMovement, Transaction, TransactionItem
+
+CATEGORIES = ['Thực phẩm', 'Đồ uống', 'Gia dụng', 'Văn phòng phẩm', 'Dược phẩm', 'Mỹ phẩm', 'Điện tử', 'Vật tư']
+BRANDS = ['An Phát', 'Bình Minh', 'Hòa Bình', 'Kim Long', 'Minh Châu', 'Phú Thịnh', 'Sao Mai', 'Thiên Long']
+PACKAGING = ['Thùng 24', 'Hộp 10', 'Gói 500g', 'Chai 1L', 'Túi 1kg', 'Lốc 6', '']
+UNITS = [unit for unit, _ in Item.UNIT_CHOICES if unit != 'None']
+FIRST_NAMES = ['An', 'Bình', 'Chi', 'Dũng', 'Giang', 'Hà', 'Hùng', 'Lan', 'Minh', 'Nam', 'Phương', 'Quân', 'Thảo']
+LAST_NAMES = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Vũ', 'Đặng', 'Bùi', 'Đỗ']
+# Transactions created in the last days are still open, in one of these statuses
+OPEN_DAYS = 7
+OPEN_STATUSES = ['Pending', 'Authorized', 'Rejected', 'Completed']
+
+
+class Command(BaseCommand):
+    help = ("Generates demo data: inventories, items, partners, users and a history of Import/Export "
+            "transactions completed in FIFO order, so stock ends up spread over many partly consumed batches. "
+            "Rows are written with bulk_create; the same --seed gives the same data (dated relative to now).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--inventories', type=int, default=3)
+        parser.add_argument('--items', type=int, default=1000, help="Items per inventory.")
+        parser.add_argument('--partners', type=int, default=200)
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--transactions', type=int, default=5000)
+        parser.add_argument('--lines', type=int, default=8, help="Maximum lines per transaction.")
+        parser.add_argument('--days', type=int, default=365, help="Length of the generated history.")
+        parser.add_argument('--imports', type=float, default=0.35, help="Share of Import transactions.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='demo',
+                            help="Prefix of the generated names, slugs, usernames and tax codes.")
+        parser.add_argument('--password', help="Password of the generated users (default: unusable).")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows per bulk INSERT.")
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if Inventory.objects.filter(slug__startswith=f'{prefix}-').exists():
+            raise CommandError(f"Demo data with prefix '{prefix}' already exists, pass another --prefix.")
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.max_lines = options['lines']
+        # Whole minutes, so the history only depends on the seed and the current time
+        self.now = timezone.now().replace(second=0, microsecond=0)
+
+        with db_transaction.atomic():
+            self._create_references(options)
+            self._create_history(options)
+            for inventory in self.inventories:
+                bump_inventory(inventory.pk)
+        # Period rollups of the reports, rebuilt from all completed transactions
+        call_command('rebuild_rollups', stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(self.inventories)} inventories, {len(self.items)} items, {len(self.partners)} partners, "
+            f"{len(self.users)} users, {self.counts['transactions']} transactions "
+            f"({self.counts['lines']} lines), {self.counts['batches']} batches in stock, "
+            f"{self.counts['movements']} stock movements."
+        ))
+        self.stdout.write("Run take_snapshots to chart the generated history.")
+
+    def _create_references(self, options):
+        rng, prefix = self.rng, options['prefix']
+        self.inventories = Inventory.objects.bulk_create(
+            Inventory(inventory_name=f'{prefix} Kho {n + 1}', slug=f'{prefix}-kho-{n + 1}',
+                      description=f"Dữ liệu mẫu ({prefix})")
+            for n in range(options['inventories'])
+        )
+        self.items = Item.objects.bulk_create(
+            (
+                Item(
+                    inventory=inventory,
+                    sku=f'{prefix.upper()}-{n:06d}',
+                    item_name=f"{rng.choice(CATEGORIES)} {rng.choice(BRANDS)} {n}",
+                    brand=rng.choice(BRANDS),
+                    packaging=rng.choice(PACKAGING),
+                    unit=rng.choice(UNITS),
+                    category=rng.choice(CATEGORIES),
+                    is_active=False,
+                )
+                for inventory in self.inventories for n in range(options['items'])
+            ),
+            batch_size=self.batch_size,
+        )
+        self.partners = Partner.objects.bulk_create(
+            (
+                Partner(
+                    name=f"Công ty {rng.choice(BRANDS)} {n + 1}",
+                    email=f'{prefix}-partner-{n + 1}@example.com',
+                    phone=f'09{rng.randrange(10 ** 8):08d}',
+                    address=f"{rng.randrange(1, 500)} đường số {rng.randrange(1, 50)}",
+                    contact_person=f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)}",
+                    tax_code=f'{prefix}-{n + 1:010d}',
+                )
+                for n in range(options['partners'])
+            ),
+            batch_size=self.batch_size,
+        )
+        # Hashed once: hashing a password per user would dominate the run
+        password = make_password(options['password'])
+        User = get_user_model()
+        self.users = User.objects.bulk_create(
+            (
+                User(username=f'{prefix}-user-{n + 1}', password=password,
+                     first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES))
+                for n in range(options['users'])
+            ),
+            batch_size=self.batch_size,
+        )
+        if not (self.partners and self.users and self.items):
+            raise CommandError("--inventories, --items, --partners and --users must all be at least 1.")
+
+    def _create_history(self, options):
+        """
+        Replays the transactions in completion order, consuming batches FIFO in memory like
+        Transaction.process_transaction() does, then writes every row in bulk.
+        """
+        rng = self.rng
+        items_of = {inventory.pk: [] for inventory in self.inventories}
+        for item in self.items:
+            items_of[item.inventory_id].append(item)
+        # item_id -> deque of [batch, quantity left]; cost[item_id] -> last import unit cost
+        stock = {item.pk: deque() for item in self.items}
+        cost = {item.pk: Decimal(rng.randrange(5_000, 500_000, 500)) for item in self.items}
+        stocked = {inventory.pk: set() for inventory in self.inventories}
+
+        start = self.now - timedelta(days=options['days'])
+        span = (self.now - start).total_seconds()
+        created = sorted(start + timedelta(seconds=rng.uniform(0, span)) for _ in range(options['transactions']))
+        open_since = self.now - timedelta(days=OPEN_DAYS)
+
+        transactions, lines, batches, movements = [], [], [], []
+        completed = []
+        for creation_date in created:
+            inventory = rng.choice(self.inventories)
+            status = rng.choice(OPEN_STATUSES) if creation_date >= open_since else 'Completed'
+            transaction_type = 'Import' if rng.random() < options['imports'] else 'Export'
+            tx = Transaction(
+                transaction_type=transaction_type,
+                inventory=inventory,
+                partner=rng.choice(self.partners),
+                partner_bill=f'HD{rng.randrange(10 ** 6):06d}',
+                extra_cost=Decimal(rng.choice([0, 0, 0, 50_000, 200_000])),
+                creation_date=creation_date,
+                completion_deadline=creation_date + timedelta(days=rng.randint(1, 14)),
+                created_by=rng.choice(self.users),
+                transaction_status=status,
+            )
+            if status in ('Authorized', 'Completed'):
+                tx.authorized_by = rng.choice(self.users)
+                tx.authorization_date = min(creation_date + timedelta(minutes=rng.randint(5, 600)), self.now)
+            if status == 'Completed':
+                tx.performed_by = rng.choice(self.users)
+                tx.completion_date = min(tx.authorization_date + timedelta(minutes=rng.randint(5, 600)), self.now)
+                completed.append(tx)
+            else:
+                # Open transactions only get lines; stock moves when they are completed
+                lines += self._lines(tx, items_of[inventory.pk], cost)
+            transactions.append(tx)
+
+        # Stock moves in completion order, which differs from creation order
+        completed.sort(key=lambda tx: tx.completion_date)
+        for tx in completed:
+            # Nothing to sell yet: the inventory is restocked instead
+            if tx.transaction_type == 'Export' and not stocked[tx.inventory_id]:
+                tx.transaction_type = 'Import'
+            if tx.transaction_type == 'Import':
+                tx_lines = self._lines(tx, items_of[tx.inventory_id], cost)
+                for t_item in tx_lines:
+                    batch = ItemBatch(transaction=tx, item=t_item.item, unit_cost=t_item.unit_cost,
+                                      quantity=t_item.quantity, creation_date=tx.completion_date)
+                    batches.append(batch)
+                    stock[t_item.item.pk].append([batch, t_item.quantity])
+                    stocked[tx.inventory_id].add(t_item.item.pk)
+                    t_item.report_value = t_item.unit_cost * t_item.quantity
+                    movements.append(self._movement(tx, batch, t_item.quantity))
+            else:
+                tx_lines = self._export_lines(tx, stock, stocked[tx.inventory_id], cost)
+                for t_item in tx_lines:
+                    t_item.report_value = Decimal(0)
+                    left = t_item.quantity
+                    queue = stock[t_item.item.pk]
+                    while left:
+                        batch_left = queue[0]
+                        taken = min(left, batch_left[1])
+                        batch_left[1] -= taken
+                        left -= taken
+                        t_item.report_value += taken * batch_left[0].unit_cost
+                        movements.append(self._movement(tx, batch_left[0], -taken))
+                        if not batch_left[1]:
+                            queue.popleft()
+                    if not queue:
+                        stocked[tx.inventory_id].discard(t_item.item.pk)
+            lines += tx_lines
+
+        Transaction.objects.bulk_create(transactions, batch_size=self.batch_size)
+        TransactionItem.objects.bulk_create(lines, batch_size=self.batch_size)
+        # Batches are written with the quantity left; exhausted ones are deleted, as FIFO consumption does
+        remaining = {id(batch): quantity for queue in stock.values() for batch, quantity in queue}
+        for batch in batches:
+            batch.quantity = remaining.get(id(batch), Decimal(0))
+        ItemBatch.objects.bulk_create(batches, batch_size=self.batch_size)
+        StockMovement.objects.bulk_create(movements, batch_size=self.batch_size)
+        exhausted = [batch.pk for batch in batches if not batch.quantity]
+        for offset in range(0, len(exhausted), self.batch_size):
+            ItemBatch.objects.filter(pk__in=exhausted[offset:offset + self.batch_size]).delete()
+
+        for item in self.items:
+            queue = stock[item.pk]
+            item.stock_on_hand = sum((quantity for _, quantity in queue), Decimal(0))
+            item.stock_value = sum((batch.unit_cost * quantity for batch, quantity in queue), Decimal(0))
+            item.is_active = item.stock_on_hand > 0
+        Item.objects.bulk_update(self.items, ['stock_on_hand', 'stock_value', 'is_active'],
+                                 batch_size=self.batch_size)
+
+        self.counts = {
+            'transactions': len(transactions),
+            'lines': len(lines),
+            'batches': len(batches) - len(exhausted),
+            'movements': len(movements),
+        }
+
+    def _lines(self, tx, items, cost):
+        """Lines of 1 to --lines distinct items, not checked against stock."""
+        rng = self.rng
+        chosen = rng.sample(items, min(len(items), rng.randint(1, self.max_lines)))
+        result = []
+        for item in chosen:
+            if tx.transaction_type == 'Import':
+                # Purchase prices drift between imports
+                cost[item.pk] = max(Decimal(500), (cost[item.pk] * Decimal(rng.uniform(0.9, 1.12))).quantize(Decimal(100)))
+                unit_cost, quantity = cost[item.pk], rng.randint(5, 200)
+            else:
+                unit_cost, quantity = self._price(cost[item.pk]), rng.randint(1, 20)
+            result.append(TransactionItem(transaction=tx, item=item, unit_cost=unit_cost, quantity=Decimal(quantity)))
+        return result
+
+    def _export_lines(self, tx, stock, stocked, cost):
+        """Sale lines over items in stock, each taking part of what is left."""
+        rng = self.rng
+        chosen = rng.sample(sorted(stocked), min(len(stocked), rng.randint(1, self.max_lines)))
+        result = []
+        for item_id in chosen:
+            on_hand = sum(quantity for _, quantity in stock[item_id])
+            quantity = min(on_hand, Decimal(max(1, int(on_hand * Decimal(rng.uniform(0.05, 0.6))))))
+            result.append(TransactionItem(
+                transaction=tx,
+                item=stock[item_id][0][0].item,
+                unit_cost=self._price(cost[item_id]),
+                quantity=quantity,
+                discount=Decimal(rng.choice([0, 0, 0, 5, 10])),
+            ))
+        return result
+
+    def _price(self, unit_cost):
+        """Sale price: the last purchase price with a margin."""
+        return (unit_cost * Decimal(self.rng.uniform(1.1, 1.6))).quantize(Decimal(100))
+
+    @staticmethod
+    def _movement(tx, batch, quantity):
+        return StockMovement(item=batch.item, inventory=tx.inventory, transaction=tx, batch=batch,
+                             quantity=quantity, unit_cost=batch.unit_cost, timestamp=tx.completion_date)
\ No newline at end of file
@@ -0,0 +1,106 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+from django.utils import timezone
+
+from ivm.models import InventorySnapshot, Item, ItemSnapshot, StockMovement
+
+
+def _start_of(day):
+    """Aware start of a local day."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class Command(BaseCommand):
+    help = ("Writes end-of-day InventorySnapshot and ItemSnapshot rows from the StockMovement ledger, "
+            "from the day after the last snapshot up to yesterday. Safe to re-run: existing rows are kept.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat,
+                            help="First day to snapshot (YYYY-MM-DD). Default: the day after the last snapshot, "
+                                 "or the day of the first movement.")
+        parser.add_argument('--until', type=date.fromisoformat,
+                            help="Last day to snapshot (YYYY-MM-DD). Default: yesterday.")
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help="Rows per round trip when reading movements and writing snapshots.")
+
+    def handle(self, *args, **options):
+        until = options['until'] or timezone.localdate() - timedelta(days=1)
+        since = options['since'] or self._first_missing_day()
+        if since is None:
+            self.stdout.write("No stock movements yet, nothing to snapshot.")
+            return
+        if since > until:
+            self.stdout.write(f"Snapshots are up to date (last day {until:%d/%m/%Y}).")
+            return
+        if until >= timezone.localdate():
+            raise CommandError("--until must be before today: snapshots are end-of-day stock.")
+
+        self.chunk_size = options['chunk_size']
+        self.item_rows, self.inventory_rows = [], []
+        self.written = 0
+        inventory_of = dict(Item.objects.values_list('pk', 'inventory_id'))
+
+        # Opening balance: the stock at the end of the day before `since`, one grouped query
+        balances = {
+            row['item']: [row['total_quantity'], row['total_value']]
+            for row in StockMovement.objects.as_of(_start_of(since) - timedelta(microseconds=1))
+        }
+
+        # Then one ordered pass over the movements of the range, closing each day as it is passed
+        movements = (
+            StockMovement.objects
+            .filter(timestamp__gte=_start_of(since), timestamp__lt=_start_of(until + timedelta(days=1)))
+            .order_by('timestamp', 'movement_id')
+            .values_list('item_id', 'quantity', 'unit_cost', 'timestamp')
+        )
+        day = since
+        for item_id, quantity, unit_cost, timestamp in movements.iterator(chunk_size=self.chunk_size):
+            moved_on = timezone.localtime(timestamp).date()
+            while day < moved_on:
+                self._close_day(day, balances, inventory_of)
+                day += timedelta(days=1)
+            balance = balances.setdefault(item_id, [Decimal(0), Decimal(0)])
+            balance[0] += quantity
+            balance[1] += quantity * unit_cost
+        while day <= until:
+            self._close_day(day, balances, inventory_of)
+            day += timedelta(days=1)
+        self._flush()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshots {since:%d/%m/%Y} - {until:%d/%m/%Y}: {self.written} rows (days already present were kept)."
+        ))
+
+    def _first_missing_day(self):
+        last = InventorySnapshot.objects.aggregate(last=Max('date'))['last']
+        if last is not None:
+            return last + timedelta(days=1)
+        first = StockMovement.objects.order_by('timestamp').values_list('timestamp', flat=True).first()
+        return timezone.localtime(first).date() if first else None
+
+    def _close_day(self, day, balances, inventory_of):
+        totals = {}
+        for item_id, (quantity, value) in balances.items():
+            inventory_id = inventory_of[item_id]
+            self.item_rows.append(ItemSnapshot(item_id=item_id, inventory_id=inventory_id, date=day,
+                                               quantity=quantity, value=value))
+            total = totals.setdefault(inventory_id, [Decimal(0), Decimal(0), 0])
+            total[0] += quantity
+            total[1] += value
+            total[2] += quantity > 0
+        self.inventory_rows += [
+            InventorySnapshot(inventory_id=inventory_id, date=day, quantity=quantity, value=value, item_count=count)
+            for inventory_id, (quantity, value, count) in totals.items()
+        ]
+        if len(self.item_rows) >= self.chunk_size:
+            self._flush()
+
+    def _flush(self):
+        # ignore_conflicts keeps days that were already snapshotted (re-runs, overlapping --since)
+        ItemSnapshot.objects.bulk_create(self.item_rows, batch_size=self.chunk_size, ignore_conflicts=True)
+        InventorySnapshot.objects.bulk_create(self.inventory_rows, batch_size=self.chunk_size, ignore_conflicts=True)
+        self.written += len(self.item_rows) + len(self.inventory_rows)
+        self.item_rows, self.inventory_rows = [], []
\ No newline at end of file
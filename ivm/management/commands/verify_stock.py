@@ -0,0 +1,59 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction as db_transaction
+
+from ivm.cache import bump_inventory
+from ivm.models import Item, ItemBatch
+
+
+class Command(BaseCommand):
+    help = "Reconciles Item.stock_on_hand/stock_value against the item's batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help="Overwrite mismatching columns with the batch totals.")
+
+    def handle(self, *args, **options):
+        stock_field = Item._meta.get_field('stock_on_hand')
+        value_field = Item._meta.get_field('stock_value')
+        quantize_stock = Decimal(1).scaleb(-stock_field.decimal_places)
+        quantize_value = Decimal(1).scaleb(-value_field.decimal_places)
+
+        with db_transaction.atomic():
+            totals = defaultdict(lambda: [Decimal(0), Decimal(0)])
+            batches = ItemBatch.objects.values_list('item_id', 'quantity', 'unit_cost')
+            for item_id, quantity, unit_cost in batches.iterator(chunk_size=2000):
+                totals[item_id][0] += quantity
+                totals[item_id][1] += quantity * unit_cost
+
+            mismatched = []
+            items = Item.objects.only('item_id', 'inventory_id', 'item_name', 'stock_on_hand', 'stock_value', 'version')
+            if options['fix']:
+                # Primary key order, like the other stock writers (see ItemQuerySet.check_stock)
+                items = items.select_for_update().order_by('pk')
+            for item in items.iterator(chunk_size=2000):
+                quantity, value = totals.get(item.item_id, (Decimal(0), Decimal(0)))
+                quantity = quantity.quantize(quantize_stock)
+                value = value.quantize(quantize_value)
+                if item.stock_on_hand != quantity or item.stock_value != value:
+                    self.stdout.write(
+                        f"{item.item_id} {item.item_name}: "
+                        f"stock {item.stock_on_hand} != {quantity}, value {item.stock_value} != {value}"
+                    )
+                    item.stock_on_hand, item.stock_value = quantity, value
+                    item.version += 1
+                    mismatched.append(item)
+
+            if options['fix'] and mismatched:
+                Item.objects.bulk_update(mismatched, ['stock_on_hand', 'stock_value', 'version'], batch_size=500)
+                for inventory_id in {item.inventory_id for item in mismatched}:
+                    bump_inventory(inventory_id)
+
+        if not mismatched:
+            self.stdout.write(self.style.SUCCESS("All item stock columns match their batches."))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f"Fixed {len(mismatched)} item(s)."))
+        else:
+            self.stdout.write(self.style.WARNING(f"{len(mismatched)} item(s) out of sync. Re-run with --fix to repair."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from ivm import cache as ivm_cache
+from ivm.models import Inventory
+
+
+class Command(BaseCommand):
+    help = ("Fills the cache read by the dashboard, the inventory list and the inventory pages. "
+            "Run after deploys so the first visitors don't pay for the aggregates.")
+
+    def handle(self, *args, **options):
+        ivm_cache.inventories_summary()
+        ivm_cache.inventory_list()
+        inventories = list(Inventory.objects.all())
+        for inventory in inventories:
+            ivm_cache.inventory_items(inventory)
+
+        self.stdout.write(self.style.SUCCESS(f"Cache warmed for {len(inventories)} inventories."))
\ No newline at end of file
@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-18 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ivm', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryPeriodSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('transaction_type', models.CharField(choices=[('Import', 'Nhập'), ('Export', 'Xuất')], max_length=10)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('extra_cost', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('line_count', models.PositiveIntegerField(default=0)),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='period_summaries', to='ivm.inventory')),
+            ],
+            options={
+                'verbose_name_plural': 'Inventory period summaries',
+                'constraints': [models.UniqueConstraint(fields=('inventory', 'year', 'month', 'transaction_type'), name='ivm_period_summary_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-18 09:40
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def backfill_stock(apps, schema_editor):
+    Item = apps.get_model('ivm', 'Item')
+    ItemBatch = apps.get_model('ivm', 'ItemBatch')
+
+    totals = defaultdict(lambda: [Decimal(0), Decimal(0)])
+    for item_id, quantity, unit_cost in ItemBatch.objects.values_list('item_id', 'quantity', 'unit_cost').iterator():
+        totals[item_id][0] += quantity
+        totals[item_id][1] += quantity * unit_cost
+
+    items = [Item(pk=item_id, stock_on_hand=quantity, stock_value=value) for item_id, (quantity, value) in totals.items()]
+    Item.objects.bulk_update(items, ['stock_on_hand', 'stock_value'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ivm', '0003_inventoryperiodsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='stock_on_hand',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='stock_value',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=20),
+        ),
+        migrations.RunPython(backfill_stock, migrations.RunPython.noop),
+    ]
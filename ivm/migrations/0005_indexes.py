@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-18 10:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ivm', '0004_item_stock_columns'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['inventory'], name='ivm_item_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='itembatch',
+            index=models.Index(fields=['item', 'creation_date', 'batch_id'], name='ivm_batch_fifo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['inventory', 'transaction_status', 'transaction_type', 'completion_date'], name='ivm_tx_inv_status_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['transaction_status', 'completion_date'], name='ivm_tx_status_done_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('transaction_status', 'Completed'), _negated=True), fields=['completion_deadline'], name='ivm_tx_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['creation_date', 'transaction_id'], name='ivm_tx_created_idx'),
+        ),
+    ]
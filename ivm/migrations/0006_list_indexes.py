@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-18 09:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ivm', '0005_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='partner',
+            index=models.Index(fields=['name', 'id'], name='ivm_partner_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['transaction_status', 'creation_date', 'transaction_id'], name='ivm_tx_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['inventory', 'creation_date', 'transaction_id'], name='ivm_tx_inv_created_idx'),
+        ),
+    ]
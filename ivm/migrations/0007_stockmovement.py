@@ -0,0 +1,52 @@
+# Generated by Django 6.0 on 2026-10-18 09:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_movements(apps, schema_editor):
+    """
+    Opening balance of the ledger: one movement per remaining batch, dated at the batch.
+    Consumption before this migration was not recorded, so history starts here.
+    """
+    ItemBatch = apps.get_model('ivm', 'ItemBatch')
+    StockMovement = apps.get_model('ivm', 'StockMovement')
+
+    batches = ItemBatch.objects.values_list(
+        'batch_id', 'item_id', 'item__inventory_id', 'transaction_id', 'quantity', 'unit_cost', 'creation_date'
+    )
+    StockMovement.objects.bulk_create(
+        (
+            StockMovement(batch_id=batch_id, item_id=item_id, inventory_id=inventory_id, transaction_id=transaction_id,
+                          quantity=quantity, unit_cost=unit_cost, timestamp=creation_date)
+            for batch_id, item_id, inventory_id, transaction_id, quantity, unit_cost, creation_date in batches.iterator()
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ivm', '0006_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('movement_id', models.AutoField(primary_key=True, serialize=False)),
+                ('quantity', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('unit_cost', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('timestamp', models.DateTimeField()),
+                ('batch', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='movements', to='ivm.itembatch')),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='ivm.inventory')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='ivm.item')),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='ivm.transaction')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['item', 'timestamp'], name='ivm_movement_item_idx'), models.Index(fields=['inventory', 'timestamp'], name='ivm_movement_inventory_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_movements, migrations.RunPython.noop),
+    ]
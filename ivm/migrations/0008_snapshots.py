@@ -0,0 +1,42 @@
+# Generated by Django 6.0 on 2026-10-18 09:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ivm', '0007_stockmovement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.DecimalField(decimal_places=3, max_digits=16)),
+                ('value', models.DecimalField(decimal_places=5, max_digits=20)),
+                ('item_count', models.PositiveIntegerField(default=0)),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='ivm.inventory')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('inventory', 'date'), name='ivm_inventory_snapshot_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ItemSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('value', models.DecimalField(decimal_places=5, max_digits=20)),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='item_snapshots', to='ivm.inventory')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='ivm.item')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('item', 'date'), name='ivm_item_snapshot_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-18 14:10
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_unique_tax_codes(apps, schema_editor):
+    Partner = apps.get_model('ivm', 'Partner')
+    duplicates = list(
+        Partner.objects.values('tax_code').annotate(partners=Count('id')).filter(partners__gt=1)
+        .values_list('tax_code', flat=True)
+    )
+    if duplicates:
+        raise RuntimeError(
+            "Partner tax codes must be unique before migrating; merge or correct the partners with tax code "
+            + ", ".join(repr(tax_code) for tax_code in duplicates) + "."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ivm', '0009_item_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='sku',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='item',
+            constraint=models.UniqueConstraint(fields=('inventory', 'sku'), name='ivm_item_inventory_sku_uniq'),
+        ),
+        migrations.RunPython(check_unique_tax_codes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='partner',
+            constraint=models.UniqueConstraint(fields=('tax_code',), name='ivm_partner_tax_code_uniq'),
+        ),
+    ]
\ No newline at end of file
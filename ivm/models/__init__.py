@@ -1,6 +1,8 @@
 from .inventory_models import Inventory
-from .item_models import Item, ItemBatch
+from .item_models import Item, ItemBatch, StockMovement
 from .transaction_models import Transaction, TransactionItem
 from .other_models import Partner
+from .report_models import InventoryPeriodSummary, InventorySnapshot, ItemSnapshot
 
-__all__ = ['ItemBatch', 'Item', 'Inventory', 'Transaction', 'TransactionItem', 'Partner']
\ No newline at end of file
+__all__ = ['ItemBatch', 'Item', 'Inventory', 'Transaction', 'TransactionItem', 'Partner', 'InventoryPeriodSummary', 'StockMovement',
+           'InventorySnapshot', 'ItemSnapshot']
\ No newline at end of file
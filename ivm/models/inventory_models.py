@@ -1,28 +1,85 @@
 from django.db import models
+from django.db.models import Count, ExpressionWrapper, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from typing import TYPE_CHECKING
 
+from ivm.cache import bump_inventory
+from .item_models import Item
+from .transaction_models import Transaction, TransactionItem, LINE_VALUE, MONEY_FIELD
+
+
+def _subquery_sum(queryset, group_field, expression, output_field=MONEY_FIELD):
+    """Wraps a per-inventory SUM/COUNT in a Subquery, defaulting to 0 when no rows match."""
+    aggregated = queryset.order_by().values(group_field).annotate(total=expression).values('total')
+    return Coalesce(Subquery(aggregated, output_field=output_field), Value(0), output_field=output_field)
+
+
+class InventoryQuerySet(models.QuerySet):
+    def with_stock_value(self):
+        """Annotates item count and stock value, computed in the same query as the inventories."""
+        items = Item.objects.filter(inventory=OuterRef('pk'))
+        return self.annotate(
+            agg_num_items=_subquery_sum(items, 'inventory', Count('pk'), output_field=IntegerField()),
+            agg_value=_subquery_sum(items, 'inventory', Sum('stock_value')),
+        )
+
+    def with_financials(self):
+        """
+        Annotates everything the inventory list shows (item count, stock value, cost,
+        revenue, profit) so the page renders from a single query instead of walking
+        items/batches/transactions per row.
+        """
+        completed_lines = TransactionItem.objects.filter(
+            transaction__inventory=OuterRef('pk'),
+            transaction__transaction_status='Completed',
+        )
+        completed_transactions = Transaction.objects.filter(
+            inventory=OuterRef('pk'),
+            transaction_status='Completed',
+        )
+        import_value = _subquery_sum(
+            completed_lines.filter(transaction__transaction_type='Import'), 'transaction__inventory', Sum(LINE_VALUE)
+        )
+        export_value = _subquery_sum(
+            completed_lines.filter(transaction__transaction_type='Export'), 'transaction__inventory', Sum(LINE_VALUE)
+        )
+        extra_cost = _subquery_sum(completed_transactions, 'inventory', Sum('extra_cost'))
+
+        return self.with_stock_value().annotate(
+            agg_total_cost=ExpressionWrapper(extra_cost + import_value, output_field=MONEY_FIELD),
+            agg_total_revenue=export_value,
+        ).annotate(
+            agg_total_profit=ExpressionWrapper(F('agg_total_revenue') - F('agg_total_cost'), output_field=MONEY_FIELD),
+        )
+
 
 class Inventory(models.Model):
     class Meta:
         verbose_name_plural = "Inventories"
 
+    objects = InventoryQuerySet.as_manager()
+
     # Fields
     inventory_name = models.CharField(max_length=255, unique=True)
     slug = models.SlugField(max_length=255, unique=True)
     description = models.TextField(blank=True)
 
     if TYPE_CHECKING:
-        from .item_models import Item
-        from .transaction_models import Transaction
         items: models.Manager['Item']
         transactions: models.Manager['Transaction']
 
+    # The properties below prefer values annotated by InventoryQuerySet.with_financials()
+    # and only fall back to walking the relations when the instance was loaded without them.
     @property
     def num_unique_items(self):
+        if hasattr(self, 'agg_num_items'):
+            return self.agg_num_items
         return self.items.count()
-    
+
     @property
     def value(self):
+        if hasattr(self, 'agg_value'):
+            return self.agg_value
         return sum(item.value for item in self.items.all())
 
     @property
@@ -31,6 +88,8 @@ class Inventory(models.Model):
 
     @property
     def total_cost(self):
+        if hasattr(self, 'agg_total_cost'):
+            return self.agg_total_cost
         total = 0
         for transaction in self.transactions.filter(transaction_status='Completed'):
             total += transaction.extra_cost
@@ -40,10 +99,14 @@ class Inventory(models.Model):
 
     @property
     def total_revenue(self):
+        if hasattr(self, 'agg_total_revenue'):
+            return self.agg_total_revenue
         return sum(transaction.value for transaction in self.transactions.filter(transaction_status='Completed', transaction_type='Export'))
 
     @property
     def total_profit(self):
+        if hasattr(self, 'agg_total_profit'):
+            return self.agg_total_profit
         profit = self.total_revenue - self.total_cost
         return profit
 
@@ -122,5 +185,13 @@ class Inventory(models.Model):
         formatted_res = " ".join(raw_res.replace("tỷ tỷ", "tỷ").split())
         return formatted_res.capitalize()
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        bump_inventory(self.pk)
+
+    def delete(self, *args, **kwargs):
+        bump_inventory(self.pk)
+        return super().delete(*args, **kwargs)
+
     def __str__(self):
         return self.inventory_name
\ No newline at end of file
@@ -1,8 +1,53 @@
 from django.db import models
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
 from typing import TYPE_CHECKING
 
+from ivm.cache import bump_inventory
+
+
+class ItemQuerySet(models.QuerySet):
+    def check_stock(self, lines, lock=False):
+        """
+        Checks the (item or item_id, quantity) pairs of a transaction against current stock.
+        Quantities of the same item on several lines are added up before comparing, and stock
+        of all items is read in one query (locking the item rows with `lock`).
+        Returns one error message or None per line, in order.
+        """
+        lines = [(getattr(item, 'pk', item), quantity) for item, quantity in lines]
+        requested = {}
+        for item_id, quantity in lines:
+            requested[item_id] = requested.get(item_id, 0) + quantity
+
+        items = self.filter(pk__in=requested)
+        if lock:
+            # Rows are locked in primary key order, as by every other stock writer, so that two
+            # transactions over the same items queue up instead of deadlocking
+            items = items.select_for_update().order_by('pk')
+        stock = dict(items.values_list('pk', 'stock_on_hand'))
+
+        errors = []
+        for item_id, quantity in lines:
+            available = stock.get(item_id, 0)
+            if requested[item_id] <= available:
+                errors.append(None)
+            elif requested[item_id] == quantity:
+                errors.append(f"Only {available} units available.")
+            else:
+                errors.append(f"Only {available} units available, {requested[item_id]} requested over all lines.")
+        return errors
+
 
 class Item(models.Model):
+    class Meta:
+        indexes = [
+            # Inventory pages only list active items
+            models.Index(fields=['inventory'], condition=models.Q(is_active=True), name='ivm_item_active_idx'),
+        ]
+        constraints = [
+            # SKUs are optional (NULLs never conflict); bulk imports upsert on (inventory, sku)
+            models.UniqueConstraint(fields=['inventory', 'sku'], name='ivm_item_inventory_sku_uniq'),
+        ]
+
     UNIT_CHOICES = [
         ("None", ""),
         ("Piece", "Cái"),
@@ -20,6 +65,7 @@ class Item(models.Model):
 
     inventory = models.ForeignKey('Inventory', on_delete=models.CASCADE, related_name='items')
 
+    sku = models.CharField(max_length=50, null=True, blank=True)
     item_name = models.CharField(max_length=250)
     brand = models.CharField(max_length=100, blank=True)
     packaging = models.CharField(max_length=100, blank=True)
@@ -29,32 +75,82 @@ class Item(models.Model):
 
     is_active = models.BooleanField(default=True)
 
+    # Denormalized totals of this item's batches, kept exact by Transaction.process_transaction()
+    # and reconciled by the `verify_stock` management command
+    stock_on_hand = models.DecimalField(max_digits=12, decimal_places=3, default=0)
+    stock_value = models.DecimalField(max_digits=20, decimal_places=5, default=0)
+    # Incremented on every save and stock movement; keys the cached template rows of the item
+    version = models.PositiveIntegerField(default=0)
+
+    STOCK_FIELDS = ('stock_on_hand', 'stock_value')
+
+    objects = ItemQuerySet.as_manager()
+
     if TYPE_CHECKING:
         batches: models.Manager['ItemBatch']
 
     @property
     def total_stock(self):
-        return sum(batch.quantity for batch in self.batches.all())
+        return self.stock_on_hand
 
     @property
     def value(self):
-        return sum(batch.value for batch in self.batches.all())
+        return self.stock_value
 
     @property
     def full_name(self):
         return f" {self.get_unit_display()} {self.item_name} {self.packaging}"
 
+    def adjust_stock(self, quantity, value):
+        """Applies a batch movement to the stock columns. Call inside the transaction that moves the batches."""
+        Item.objects.filter(pk=self.pk).update(
+            stock_on_hand=F('stock_on_hand') + quantity,
+            stock_value=F('stock_value') + value,
+            version=F('version') + 1,
+        )
+        self.refresh_from_db(fields=['stock_on_hand', 'stock_value', 'version'])
+
     def update_active_status(self):
         """Checks total stock and reactivates item if > 0."""
         if self.total_stock > 0 and not self.is_active:
             self.is_active = True
             self.save(update_fields=['is_active'])
 
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        if not adding:
+            # Incremented in SQL: this instance may have been loaded before another save or stock movement
+            self.version = F('version') + 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                # The stock columns are only written by adjust_stock() and the stock commands, or when named:
+                # the values read with this instance would undo any movement completed since
+                deferred = self.get_deferred_fields()
+                update_fields = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.attname not in deferred and field.name not in self.STOCK_FIELDS
+                ]
+            kwargs['update_fields'] = {*update_fields, 'version'}
+        super().save(*args, **kwargs)
+        if not adding:
+            self.refresh_from_db(fields=['version'])
+        bump_inventory(self.inventory_id)
+
+    def delete(self, *args, **kwargs):
+        bump_inventory(self.inventory_id)
+        return super().delete(*args, **kwargs)
+
     def __str__(self):
         return self.full_name
 
 
 class ItemBatch(models.Model):
+    class Meta:
+        indexes = [
+            # FIFO consumption order
+            models.Index(fields=['item', 'creation_date', 'batch_id'], name='ivm_batch_fifo_idx'),
+        ]
+
     batch_id = models.AutoField(primary_key=True)
     transaction = models.ForeignKey('Transaction', on_delete=models.CASCADE, related_name='batches')
     item = models.ForeignKey('Item', on_delete=models.CASCADE, related_name='batches')
@@ -70,4 +166,55 @@ class ItemBatch(models.Model):
 
     def __str__(self):
         result = f"Số lượng: {self.quantity} | Ngày nhập: {self.creation_date.strftime('%d/%m/%Y')}"
-        return result
\ No newline at end of file
+        return result
+
+
+# SQL form of StockMovement.value
+MOVEMENT_VALUE = ExpressionWrapper(F('quantity') * F('unit_cost'), output_field=DecimalField(max_digits=20, decimal_places=5))
+
+
+class StockMovementQuerySet(models.QuerySet):
+    def as_of(self, date, group_by='item'):
+        """
+        Stock held at `date` as one aggregate query over the ledger, grouped by 'item' or 'inventory'.
+        Returns rows like {'item': 1, 'total_quantity': Decimal, 'total_value': Decimal}; filter first to narrow it,
+        e.g. StockMovement.objects.filter(inventory=inventory).as_of(date).
+        """
+        return (
+            self.filter(timestamp__lte=date).order_by().values(group_by)
+            .annotate(total_quantity=Sum('quantity'), total_value=Sum(MOVEMENT_VALUE))
+        )
+
+
+class StockMovement(models.Model):
+    """
+    Append-only ledger of batch movements: a positive row per imported batch and a negative row
+    per batch an export consumed, both at the batch's unit cost. ItemBatch holds what is left now;
+    this keeps what was there at any earlier time.
+    """
+    class Meta:
+        indexes = [
+            models.Index(fields=['item', 'timestamp'], name='ivm_movement_item_idx'),
+            models.Index(fields=['inventory', 'timestamp'], name='ivm_movement_inventory_idx'),
+        ]
+
+    movement_id = models.AutoField(primary_key=True)
+    item = models.ForeignKey('Item', on_delete=models.CASCADE, related_name='movements')
+    inventory = models.ForeignKey('Inventory', on_delete=models.CASCADE, related_name='stock_movements')
+    transaction = models.ForeignKey('Transaction', on_delete=models.CASCADE, related_name='stock_movements')
+    # Exhausted batches are deleted; the ledger keeps their id without a constraint
+    batch = models.ForeignKey('ItemBatch', on_delete=models.DO_NOTHING, db_constraint=False, null=True,
+                              related_name='movements')
+
+    quantity = models.DecimalField(max_digits=12, decimal_places=3)  # Positive in, negative out
+    unit_cost = models.DecimalField(max_digits=12, decimal_places=2)
+    timestamp = models.DateTimeField()
+
+    objects = StockMovementQuerySet.as_manager()
+
+    @property
+    def value(self):
+        return self.quantity * self.unit_cost
+
+    def __str__(self):
+        return f"{self.item_id}: {self.quantity} @ {self.unit_cost} ({self.timestamp.strftime('%d/%m/%Y')})"
@@ -1,6 +1,16 @@
 from django.db import models
 
 class Partner(models.Model):
+    class Meta:
+        indexes = [
+            # List ordering and keyset pagination
+            models.Index(fields=['name', 'id'], name='ivm_partner_name_idx'),
+        ]
+        constraints = [
+            # Natural key of a partner; bulk imports upsert on it
+            models.UniqueConstraint(fields=['tax_code'], name='ivm_partner_tax_code_uniq'),
+        ]
+
     #partner_id = models.AutoField(primary_key=True)
 
     name = models.CharField(max_length=200)
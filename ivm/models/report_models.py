@@ -0,0 +1,97 @@
+from django.db import models
+from django.db.models import F
+from django.utils import timezone
+
+from .transaction_models import Transaction
+
+
+class InventoryPeriodSummary(models.Model):
+    """
+    Monthly rollup of completed transactions per inventory and transaction type.
+    Maintained incrementally by Transaction.process_transaction() and rebuilt
+    from scratch by the `rebuild_rollups` management command.
+    """
+    class Meta:
+        verbose_name_plural = "Inventory period summaries"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['inventory', 'year', 'month', 'transaction_type'],
+                name='ivm_period_summary_unique',
+            ),
+        ]
+
+    inventory = models.ForeignKey('Inventory', on_delete=models.CASCADE, related_name='period_summaries')
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    transaction_type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPES)
+
+    # Line value of Export transactions
+    revenue = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    # Line value of Import transactions
+    cost = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    extra_cost = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    line_count = models.PositiveIntegerField(default=0)
+
+    @staticmethod
+    def period_of(transaction):
+        """(year, month) a completed transaction belongs to, in local time."""
+        completed_on = timezone.localtime(transaction.completion_date)
+        return completed_on.year, completed_on.month
+
+    @classmethod
+    def record_transaction(cls, transaction, lines):
+        """Adds a newly completed transaction to its period's rollup row."""
+        year, month = cls.period_of(transaction)
+        value = sum(t_item.value for t_item in lines)
+        summary, _ = cls.objects.get_or_create(
+            inventory_id=transaction.inventory_id,
+            year=year,
+            month=month,
+            transaction_type=transaction.transaction_type,
+        )
+        cls.objects.filter(pk=summary.pk).update(
+            revenue=F('revenue') + (value if transaction.transaction_type == 'Export' else 0),
+            cost=F('cost') + (value if transaction.transaction_type == 'Import' else 0),
+            extra_cost=F('extra_cost') + transaction.extra_cost,
+            line_count=F('line_count') + len(lines),
+        )
+
+    def __str__(self):
+        return f"{self.inventory_id} | {self.month:02d}/{self.year} | {self.transaction_type}"
+
+
+class InventorySnapshot(models.Model):
+    """
+    Stock of an inventory at the end of a (local) day, written by the `take_snapshots`
+    management command from the StockMovement ledger. Serves the stock trend charts.
+    """
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['inventory', 'date'], name='ivm_inventory_snapshot_unique'),
+        ]
+
+    inventory = models.ForeignKey('Inventory', on_delete=models.CASCADE, related_name='snapshots')
+    date = models.DateField()
+    quantity = models.DecimalField(max_digits=16, decimal_places=3)
+    value = models.DecimalField(max_digits=20, decimal_places=5)
+    item_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.inventory_id} | {self.date:%d/%m/%Y}"
+
+
+class ItemSnapshot(models.Model):
+    """Stock of an item at the end of a (local) day; see InventorySnapshot."""
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'date'], name='ivm_item_snapshot_unique'),
+        ]
+
+    item = models.ForeignKey('Item', on_delete=models.CASCADE, related_name='snapshots')
+    inventory = models.ForeignKey('Inventory', on_delete=models.CASCADE, related_name='item_snapshots')
+    date = models.DateField()
+    quantity = models.DecimalField(max_digits=12, decimal_places=3)
+    value = models.DecimalField(max_digits=20, decimal_places=5)
+
+    def __str__(self):
+        return f"{self.item_id} | {self.date:%d/%m/%Y}"
\ No newline at end of file
@@ -1,21 +1,91 @@
 from __future__ import annotations
-from django.db import models, transaction as db_transaction
+from django.db import DatabaseError, models, transaction as db_transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Prefetch, Sum, Value, Window
+from decimal import Decimal
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from typing import TYPE_CHECKING
 from django.conf import settings
 
-from .item_models import ItemBatch
+from ivm.cache import bump_inventory
+from .item_models import Item, ItemBatch, StockMovement
 
 User = get_user_model()
 
+# Output type for money sums computed in SQL, and the SQL form of TransactionItem.value.
+# The discount is scaled by 0.01 rather than divided by 100 so SQLite doesn't fall back
+# to integer division for whole-number discounts.
+MONEY_FIELD = DecimalField(max_digits=20, decimal_places=2)
+LINE_VALUE = ExpressionWrapper(
+    F('quantity') * F('unit_cost') * (Value(1) - F('discount') * Value(Decimal('0.01'))),
+    output_field=MONEY_FIELD,
+)
+
+class TransactionQuerySet(models.QuerySet):
+    def with_lines(self):
+        """
+        Prefetches the lines with their items joined in. A separate prefetch of the items would
+        filter on every item id, which SQLite rejects past about a thousand lines.
+        """
+        return self.prefetch_related(
+            Prefetch('transaction_items', queryset=TransactionItem.objects.select_related('item'))
+        )
+
+    def complete(self, performed_by=None):
+        """
+        Completes the authorized transactions of this queryset in chronological order inside one
+        atomic block. Each transaction gets its own savepoint, so one failing (e.g. on insufficient
+        stock) is rolled back alone while the others are kept.
+        Returns {transaction_id: None on success, or the error message}.
+        """
+        results = {}
+        with db_transaction.atomic():
+            transactions = self.order_by('creation_date', 'transaction_id')
+            # Transactions being completed by another request are reported instead of waited for
+            available = {tx.transaction_id: tx for tx in transactions.select_for_update(skip_locked=True)}
+            for transaction_id, transaction_type in transactions.values_list('transaction_id', 'transaction_type'):
+                tx = available.get(transaction_id)
+                if tx is None:
+                    code = Transaction(transaction_id=transaction_id, transaction_type=transaction_type).code
+                    results[transaction_id] = f"Giao dịch {code} đang được xử lý bởi người khác."
+                    continue
+                if tx.transaction_status != 'Authorized':
+                    results[tx.transaction_id] = f"Giao dịch {tx.code} {tx.get_transaction_status_display()}."
+                    continue
+                try:
+                    with db_transaction.atomic():
+                        tx.transaction_status = 'Completed'
+                        tx.performed_by = performed_by
+                        tx.save()
+                except (ValidationError, DatabaseError) as e:
+                    results[tx.transaction_id] = "; ".join(e.messages) if isinstance(e, ValidationError) else str(e)
+                else:
+                    results[tx.transaction_id] = None
+        return results
+
+
 class Transaction(models.Model):
     class Meta:
         permissions = [
             ("authorize_transaction", "Can authorize or reject a transaction"),
             ("complete_transaction", "Can complete transaction"),
         ]
+        indexes = [
+            # Per-inventory reports (my_functions, Inventory.total_cost/total_revenue)
+            models.Index(fields=['inventory', 'transaction_status', 'transaction_type', 'completion_date'],
+                         name='ivm_tx_inv_status_type_idx'),
+            # Reports across all inventories for a completion date range
+            models.Index(fields=['transaction_status', 'completion_date'], name='ivm_tx_status_done_idx'),
+            # Pending work on the dashboard; completed transactions are the bulk of the table
+            models.Index(fields=['completion_deadline'], condition=~models.Q(transaction_status='Completed'),
+                         name='ivm_tx_open_idx'),
+            # List ordering and keyset pagination, unfiltered and filtered by status or inventory
+            models.Index(fields=['creation_date', 'transaction_id'], name='ivm_tx_created_idx'),
+            models.Index(fields=['transaction_status', 'creation_date', 'transaction_id'],
+                         name='ivm_tx_status_created_idx'),
+            models.Index(fields=['inventory', 'creation_date', 'transaction_id'], name='ivm_tx_inv_created_idx'),
+        ]
     TRANSACTION_TYPES = [
         ('Import', 'Nhập'),
         ('Export', 'Xuất'),
@@ -48,6 +118,8 @@ class Transaction(models.Model):
 
     transaction_status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='Pending')
 
+    objects = TransactionQuerySet.as_manager()
+
     if TYPE_CHECKING:
         transaction_items: models.Manager['TransactionItem']
 
@@ -91,68 +163,160 @@ class Transaction(models.Model):
 
     @property
     def date_for_pdf(self):
+        if not self.completion_date:
+            return "Ngày .... tháng .... năm ......"
         return f"{self.completion_date.strftime('Ngày %d tháng %m năm %Y')}"
 
     def process_transaction(self):
-        """Processes inventory impact and updates Item active status."""
+        """Processes inventory impact, updates Item active status and the period rollup, and invalidates the cache."""
+        from .report_models import InventoryPeriodSummary
+
         with db_transaction.atomic():
-            # Refresh items from DB to ensure we have the latest formset saves
-            for t_item in self.transaction_items.all():
-                if self.transaction_type == 'Import':
-                    self._create_import_batch(t_item)
-                elif self.transaction_type == 'Export':
-                    # Add a check here for safety
-                    if t_item.quantity > t_item.item.total_stock:
-                        raise ValidationError(f"Insufficient stock for {t_item.item.item_name}")
-                    self._consume_batches_fifo(t_item)
-
-                # Automatically reactivates item if stock is now > 0
-                t_item.item.update_active_status()
-
-    def _create_import_batch(self, t_item: TransactionItem):
+            # Refresh items from DB to ensure we have the latest formset saves. In entry order, so
+            # lines of the same item consume the batches (and get their report_value) in that order
+            lines = list(self.transaction_items.select_related('item').order_by('pk'))
+            items = {}
+            for t_item in lines:
+                # Lines of the same item share one instance so stock checks see earlier lines
+                t_item.item = items.setdefault(t_item.item_id, t_item.item)
+
+            # (batch, signed quantity) pairs for the StockMovement ledger
+            moved = []
+            if self.transaction_type == 'Import':
+                moved = [(batch, batch.quantity) for batch in self._create_import_batches(lines)]
+            elif self.transaction_type == 'Export':
+                # Item rows stay locked until the batches are consumed
+                errors = Item.objects.check_stock(((t_item.item, t_item.quantity) for t_item in lines), lock=True)
+                # dict.fromkeys: lines of the same item report the same error once
+                insufficient = list(dict.fromkeys(f"Insufficient stock for {t_item.item.item_name}: {error}"
+                                                  for t_item, error in zip(lines, errors) if error))
+                if insufficient:
+                    # One message: the views report ValidationError.message
+                    raise ValidationError(' '.join(insufficient))
+                for t_item in lines:
+                    moved += [(batch, -quantity) for batch, quantity in self._consume_batches_fifo(t_item)]
+            TransactionItem.objects.bulk_update(lines, ['report_value'])
+            StockMovement.objects.bulk_create([
+                StockMovement(
+                    item_id=batch.item_id,
+                    inventory_id=self.inventory_id,
+                    transaction=self,
+                    batch_id=batch.batch_id,
+                    quantity=quantity,
+                    unit_cost=batch.unit_cost,
+                    timestamp=self.completion_date,
+                )
+                for batch, quantity in moved
+            ])
+
+            # Automatically reactivates items whose stock is now > 0
+            reactivated = [item for item in items.values() if item.total_stock > 0 and not item.is_active]
+            for item in reactivated:
+                item.is_active = True
+            Item.objects.bulk_update(reactivated, ['is_active'])
+
+            InventoryPeriodSummary.record_transaction(self, lines)
+            bump_inventory(self.inventory_id)
+
+    def _create_import_batches(self, lines):
+        """Creates one batch per line and returns the batches."""
         if not self.completion_date:
-            return
-        ItemBatch.objects.create(
-            transaction=self,
-            item=t_item.item,
-            unit_cost=t_item.unit_cost,
-            quantity=t_item.quantity,  # Positive
-            creation_date=self.completion_date,
-        )
-        t_item.report_value = t_item.unit_cost * t_item.quantity
-        t_item.save()
+            return []
+        batches = ItemBatch.objects.bulk_create([
+            ItemBatch(
+                transaction=self,
+                item=t_item.item,
+                unit_cost=t_item.unit_cost,
+                quantity=t_item.quantity,  # Positive
+                creation_date=self.completion_date,
+            )
+            for t_item in lines
+        ])
+        # In primary key order of the items, like check_stock(lock=True), so concurrent imports and
+        # exports of the same items never wait on each other's rows in opposite orders
+        for t_item in sorted(lines, key=lambda t_item: t_item.item_id):
+            t_item.report_value = t_item.unit_cost * t_item.quantity
+            t_item.item.adjust_stock(t_item.quantity, t_item.report_value)
+        return batches
 
     @staticmethod
     def _consume_batches_fifo(t_item):
+        """
+        Consumes the line's quantity from the item's oldest batches and sets its (unsaved)
+        report_value. Returns the consumed (batch, quantity) pairs.
+        A running-sum window selects only the batches the export reaches, which are locked
+        in the same statement; exhausted batches are then deleted at once and the cut-off
+        batch is updated once.
+        """
         qty_to_reduce = t_item.quantity
+        fifo_order = (F('creation_date').asc(), F('batch_id').asc())
+
+        # Stock held by the batches before each one; a batch is reached while that is below the quantity
+        reached = ItemBatch.objects.filter(item_id=t_item.item_id).annotate(
+            stock_before=Window(Sum('quantity'), order_by=fifo_order) - F('quantity'),
+        ).filter(stock_before__lt=qty_to_reduce)
+        # The item row locked by check_stock(lock=True) already serialises the consumers of these
+        # batches, so they are never locked here; nowait makes a breach of that an error, not a wait
+        batches = list(
+            ItemBatch.objects.select_for_update(nowait=True)
+            .filter(pk__in=reached.values('pk'))
+            .order_by(*fifo_order)
+        )
 
-        # Gets available batches, oldest first
-        available_batches = ItemBatch.objects.filter(
-            item=t_item.item
-        ).order_by('creation_date')
-
-        for batch in available_batches:
-            if qty_to_reduce <= 0:
-                break
-
+        consumed_value = 0
+        consumed = []
+        exhausted_ids = []
+        for batch in batches:
             if batch.quantity <= qty_to_reduce:
-                t_item.report_value += batch.value
+                consumed_value += batch.value
+                consumed.append((batch, batch.quantity))
                 qty_to_reduce -= batch.quantity
-                batch.delete()
+                exhausted_ids.append(batch.batch_id)
             else:
-                t_item.report_value += batch.unit_cost * qty_to_reduce
-                batch.quantity -= qty_to_reduce
+                consumed_value += batch.unit_cost * qty_to_reduce
+                consumed.append((batch, qty_to_reduce))
+                ItemBatch.objects.filter(pk=batch.batch_id).update(quantity=F('quantity') - qty_to_reduce)
                 qty_to_reduce = 0
-                batch.save()
-        t_item.save()
+
+        if qty_to_reduce > 0:
+            raise ValidationError(f"Insufficient stock for {t_item.item.item_name}")
+        if exhausted_ids:
+            ItemBatch.objects.filter(pk__in=exhausted_ids).delete()
+
+        t_item.report_value = consumed_value
+        t_item.item.adjust_stock(-t_item.quantity, -consumed_value)
+        return consumed
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so save() can detect transitions without re-reading the row
+        instance._loaded_status = instance.__dict__.get('transaction_status')
+        return instance
+
+    def _compare_and_swap_status(self, expected_status, update_fields=None):
+        """
+        Writes the row with UPDATE ... WHERE transaction_status = <expected_status>.
+        Returns False when another request changed the status first.
+        """
+        fields = [
+            field for field in self._meta.concrete_fields
+            if not field.primary_key and (update_fields is None or field.name in update_fields
+                                          or field.name == 'transaction_status')
+        ]
+        values = {field.attname: getattr(self, field.attname) for field in fields}
+        updated = Transaction.objects.filter(pk=self.pk, transaction_status=expected_status).update(**values)
+        return updated == 1
 
     def save(self, *args, **kwargs):
         is_new = self._state.adding
         old_status = None
 
         if not is_new:
-            # Fetch the previous status from the database to detect transitions
-            old_status = Transaction.objects.get(pk=self.pk).transaction_status
+            # The status this instance was loaded with; only re-read it if it was deferred
+            old_status = getattr(self, '_loaded_status', None)
+            if old_status is None:
+                old_status = Transaction.objects.values_list('transaction_status', flat=True).get(pk=self.pk)
 
         # 2. Safety Check: Prevent editing Completed transactions
         if old_status == 'Completed' and self.transaction_status == 'Completed':
@@ -167,12 +331,19 @@ class Transaction(models.Model):
         if self.transaction_status == 'Completed' and not self.completion_date:
             self.completion_date = timezone.now()
 
-        # Save the record
-        super().save(*args, **kwargs)
-
-        # 4. Inventory Trigger: Only when moving TO Completed
-        if old_status != 'Completed' and self.transaction_status == 'Completed':
-            self.process_transaction()
+        with db_transaction.atomic():
+            if is_new or old_status == self.transaction_status:
+                # Save the record
+                super().save(*args, **kwargs)
+            elif not self._compare_and_swap_status(old_status, kwargs.get('update_fields')):
+                # Another request moved this transaction out of old_status first
+                raise ValidationError(f"Transaction {self.code} was changed by someone else, please reload it.")
+
+            # 4. Inventory Trigger: Only the save that moves the status TO Completed processes it
+            if old_status != 'Completed' and self.transaction_status == 'Completed':
+                self.process_transaction()
+
+        self._loaded_status = self.transaction_status
 
     def __str__(self):
         result = f"ID: {self.transaction_id}, "
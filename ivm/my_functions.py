@@ -1,27 +1,90 @@
+from datetime import datetime
+
+from django.db.models import Case, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
 from django.utils import timezone
-from ivm.models import Inventory, Transaction
+from ivm.models import Inventory, InventoryPeriodSummary, Transaction, TransactionItem
+from ivm.models.transaction_models import LINE_VALUE, MONEY_FIELD
 
+ZERO = Value(0, output_field=MONEY_FIELD)
 
-def inventory_monthly_revenue(inventory, month, year):
-    transactions = Transaction.objects.filter(
-        inventory=inventory,
-        transaction_status='Completed',
-        transaction_type='Export',
-        completion_date__year=year,
-        completion_date__month=month
+def _completed_transactions():
+    """
+    Completed transactions annotated with the value of their lines.
+    The line total is a correlated subquery so transaction-level fields (extra_cost)
+    are not multiplied by the number of lines when aggregated.
+    """
+    line_total = (
+        TransactionItem.objects.filter(transaction=OuterRef('pk'))
+        .order_by().values('transaction')
+        .annotate(total=Sum(LINE_VALUE)).values('total')
     )
-    return sum(t.value for t in transactions)
+    return Transaction.objects.filter(transaction_status='Completed').annotate(
+        line_total=Coalesce(Subquery(line_total, output_field=MONEY_FIELD), ZERO)
+    )
+
+def _period_aggregates(prefix, period=Q()):
+    """Conditional revenue/cost sums for the transactions matching `period`."""
+    return {
+        f'{prefix}_revenue': Coalesce(Sum('line_total', filter=period & Q(transaction_type='Export')), ZERO),
+        f'{prefix}_cost': Coalesce(Sum(
+            F('extra_cost') + Case(When(transaction_type='Import', then=F('line_total')), default=ZERO),
+            filter=period,
+        ), ZERO),
+    }
+
+# Closed months are read from InventoryPeriodSummary; only the current (live)
+# month is aggregated from raw transactions.
+
+def _live_period():
+    now = timezone.localtime()
+    return now.year, now.month
+
+def _live_transactions():
+    """Completed transactions of the current month, as an index-friendly date range."""
+    year, month = _live_period()
+    start = timezone.make_aware(datetime(year, month, 1))
+    end = timezone.make_aware(datetime(year + month // 12, month % 12 + 1, 1))
+    return _completed_transactions().filter(completion_date__gte=start, completion_date__lt=end)
+
+def _closed_rollups():
+    year, month = _live_period()
+    return InventoryPeriodSummary.objects.exclude(year=year, month=month)
+
+def _rollup_aggregates(prefix, period=Q()):
+    """Same figures as _period_aggregates(), read from InventoryPeriodSummary rows."""
+    return {
+        f'{prefix}_revenue': Coalesce(Sum('revenue', filter=period), ZERO),
+        f'{prefix}_cost': Coalesce(Sum(F('cost') + F('extra_cost'), filter=period), ZERO),
+    }
+
+def _period_figures(inventory=None, year=None, month=None):
+    """Revenue and cost for one month, one year (month=None) or all time (year=None)."""
+    period = Q()
+    if year is not None:
+        period &= Q(year=year)
+    if month is not None:
+        period &= Q(month=month)
+
+    rollups = _closed_rollups()
+    if inventory is not None:
+        rollups = rollups.filter(inventory=inventory)
+    figures = rollups.aggregate(**_rollup_aggregates('period', period))
+
+    live_year, live_month = _live_period()
+    if year in (None, live_year) and month in (None, live_month):
+        live = _live_transactions()
+        if inventory is not None:
+            live = live.filter(inventory=inventory)
+        live_figures = live.aggregate(**_period_aggregates('period'))
+        figures = {key: figures[key] + live_figures[key] for key in figures}
+    return figures
+
+def inventory_monthly_revenue(inventory, month, year):
+    return _period_figures(inventory, year, month)['period_revenue']
 
 def inventory_monthly_cost(inventory, month, year):
-    transactions = Transaction.objects.filter(
-        inventory=inventory,
-        transaction_status='Completed',
-        completion_date__year=year,
-        completion_date__month=month
-    )
-    total = sum(t.extra_cost for t in transactions)
-    total += sum(t.value for t in transactions if t.transaction_type == 'Import')
-    return total
+    return _period_figures(inventory, year, month)['period_cost']
 
 def inventory_monthly_profit(inventory, month, year):
     revenue = inventory_monthly_revenue(inventory, month, year)
@@ -29,32 +92,19 @@ def inventory_monthly_profit(inventory, month, year):
     return revenue - cost
 
 def all_inventory_monthly_revenue(month, year):
-    return sum(inventory_monthly_revenue(inventory, month, year) for inventory in Inventory.objects.all())
+    return _period_figures(year=year, month=month)['period_revenue']
 
 def all_inventory_monthly_cost(month, year):
-    return sum(inventory_monthly_cost(inventory, month, year) for inventory in Inventory.objects.all())
+    return _period_figures(year=year, month=month)['period_cost']
 
 def all_inventory_monthly_profit(month, year):
-    return sum(inventory_monthly_profit(inventory, month, year) for inventory in Inventory.objects.all())
+    return all_inventory_monthly_revenue(month, year) - all_inventory_monthly_cost(month, year)
 
 def inventory_yearly_revenue(inventory, year):
-    transactions = Transaction.objects.filter(
-        inventory=inventory,
-        transaction_status='Completed',
-        transaction_type='Export',
-        completion_date__year=year
-    )
-    return sum(t.value for t in transactions)
+    return _period_figures(inventory, year)['period_revenue']
 
 def inventory_yearly_cost(inventory, year):
-    transactions = Transaction.objects.filter(
-        inventory=inventory,
-        transaction_status='Completed',
-        completion_date__year=year
-    )
-    total = sum(t.extra_cost for t in transactions)
-    total += sum(t.value for t in transactions if t.transaction_type == 'Import')
-    return total
+    return _period_figures(inventory, year)['period_cost']
 
 def inventory_yearly_profit(inventory, year):
     revenue = inventory_yearly_revenue(inventory, year)
@@ -62,28 +112,65 @@ def inventory_yearly_profit(inventory, year):
     return revenue - cost
 
 def all_inventory_yearly_revenue(year):
-    return sum(inventory_yearly_revenue(inventory, year) for inventory in Inventory.objects.all())
+    return _period_figures(year=year)['period_revenue']
 
 def all_inventory_yearly_cost(year):
-    return sum(inventory_yearly_cost(inventory, year) for inventory in Inventory.objects.all())
+    return _period_figures(year=year)['period_cost']
 
 def all_inventory_yearly_profit(year):
-    return sum(inventory_yearly_profit(inventory, year) for inventory in Inventory.objects.all())
+    return all_inventory_yearly_revenue(year) - all_inventory_yearly_cost(year)
+
+def inventories_financials(date=None):
+    """
+    Revenue, cost and profit per inventory for the month and year of `date` and for all time.
+    Closed months come from one grouped query over the rollup table, the live month from one
+    grouped query over transactions. Returns {inventory_id: {'monthly_revenue': ..., ...}}.
+    """
+    date = timezone.localtime(date) if date else timezone.localtime()
+    live_year, live_month = _live_period()
+    periods = {
+        'monthly': (Q(year=date.year, month=date.month), (date.year, date.month) == (live_year, live_month)),
+        'yearly': (Q(year=date.year), date.year == live_year),
+        'total': (Q(), True),
+    }
+
+    rollup_rows = (
+        _closed_rollups().order_by().values('inventory')
+        .annotate(**{key: value for prefix, (period, _) in periods.items()
+                     for key, value in _rollup_aggregates(prefix, period).items()})
+    )
+    live_rows = _live_transactions().order_by().values('inventory').annotate(**_period_aggregates('live'))
+
+    financials = {}
+    for row in rollup_rows:
+        financials[row.pop('inventory')] = row
+    for row in live_rows:
+        figures = financials.setdefault(row['inventory'], {
+            f'{prefix}_{figure}': 0 for prefix in periods for figure in ('revenue', 'cost')
+        })
+        for prefix, (_, includes_live) in periods.items():
+            if includes_live:
+                figures[f'{prefix}_revenue'] += row['live_revenue']
+                figures[f'{prefix}_cost'] += row['live_cost']
+
+    for figures in financials.values():
+        for prefix in periods:
+            figures[f'{prefix}_profit'] = figures[f'{prefix}_revenue'] - figures[f'{prefix}_cost']
+    return financials
+
+def get_all_inventories_summary(date=None):
+    # `date` defaults at call time: a timezone.now() default would be frozen at import
+    date = timezone.localtime(date) if date else timezone.localtime()
+    all_inventory = list(Inventory.objects.with_stock_value())
+    financials = inventories_financials(date)
 
-def get_all_inventories_summary(date=timezone.now()):
-    all_inventory = Inventory.objects.all()
     inventories_summary = {
         'inventories': all_inventory,
-        'count': all_inventory.count(),
+        'count': len(all_inventory),
         'value': sum(inventory.value for inventory in all_inventory),
-        'total_cost': sum(inventory.total_cost for inventory in all_inventory),
-        'total_revenue': sum(inventory.total_revenue for inventory in all_inventory),
-        'total_profit': sum(inventory.total_profit for inventory in all_inventory),
-        'monthly_revenue': all_inventory_monthly_revenue(date.month, date.year),
-        'monthly_cost': all_inventory_monthly_cost(date.month, date.year),
-        'monthly_profit': all_inventory_monthly_profit(date.month, date.year),
-        'yearly_revenue': all_inventory_yearly_revenue(date.year),
-        'yearly_cost': all_inventory_yearly_cost(date.year),
-        'yearly_profit': all_inventory_yearly_profit(date.year),
     }
-    return inventories_summary
\ No newline at end of file
+    for prefix in ('monthly', 'yearly', 'total'):
+        for figure in ('revenue', 'cost', 'profit'):
+            key = f'{prefix}_{figure}'
+            inventories_summary[key] = sum(figures[key] for figures in financials.values())
+    return inventories_summary
@@ -0,0 +1,53 @@
+"""
+PDF rendering of transaction slips (file_pdf_transaction.html) with WeasyPrint.
+
+A completed transaction never changes, so its PDF is rendered once and kept under
+MEDIA_ROOT/transaction_pdfs/. MEDIA_ROOT is publicly served, so file names carry an HMAC of
+the transaction id and cannot be enumerated.
+WeasyPrint is imported lazily: it needs the Pango system libraries, and the HTML slip keeps
+working without them.
+"""
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.template.loader import render_to_string
+from django.utils.crypto import salted_hmac
+
+from ivm.models import Transaction
+
+PDF_DIR = 'transaction_pdfs'
+STYLESHEET = 'css/report_pdf.css'
+
+
+def pdf_transactions():
+    """Transactions with everything the slip shows loaded in two queries."""
+    return Transaction.objects.select_related('inventory', 'partner').with_lines()
+
+def pdf_path(transaction_id):
+    signature = salted_hmac('ivm.pdf', str(transaction_id)).hexdigest()[:20]
+    return Path(settings.MEDIA_ROOT) / PDF_DIR / f'{transaction_id}-{signature}.pdf'
+
+def render_pdf(transaction):
+    """PDF bytes of the transaction slip. Raises ImportError/OSError when WeasyPrint is unusable."""
+    from weasyprint import CSS, HTML
+
+    html = render_to_string('ivm/file_pdf_transaction.html', {'transaction': transaction, 'pdf': True})
+    # The stylesheet is read from disk; no URL is fetched while rendering
+    stylesheet = CSS(filename=finders.find(STYLESHEET))
+    return HTML(string=html).write_pdf(stylesheets=[stylesheet])
+
+def cached_pdf(transaction_id):
+    """Path of the stored PDF of a completed transaction, rendering it on first use."""
+    path = pdf_path(transaction_id)
+    if not path.exists():
+        content = render_pdf(pdf_transactions().get(pk=transaction_id, transaction_status='Completed'))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Written next to the target then renamed, so readers never see a partial file
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(content)
+        os.replace(tmp_name, path)
+    return path
\ No newline at end of file
@@ -1,3 +1,1112 @@
-from django.test import TestCase
+import base64
+import csv
+import json
+import re
+import tempfile
+import threading
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.messages import get_messages
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection, connections, transaction as db_transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from VaalbaraApp.pagination import _after
+from ivm import cache as ivm_cache, my_functions
+from ivm.exports import EXPORTS
+from ivm.forms import ItemForm, TransactionFilterForm, TransactionItemFormSet
+from ivm.imports import OPENING_BALANCE_NOTE, import_items, import_opening_stock, import_partners
+from ivm.models import (
+    Inventory, InventoryPeriodSummary, InventorySnapshot, Item, ItemBatch, ItemSnapshot, Partner, StockMovement,
+    Transaction, TransactionItem,
+)
+
+# A plain "SCAN <table>" line in SQLite's EXPLAIN QUERY PLAN is a full table scan;
+# "SEARCH ... USING INDEX" and "SCAN ... USING [COVERING] INDEX" are not.
+FULL_SCAN = re.compile(r'\bSCAN (?P<table>\w+)(?: AS \w+)?\s*$')
+# Sorting the result instead of reading it in index order
+TEMP_SORT = re.compile(r'USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY')
+
+
+@skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN output is SQLite specific")
+class QueryPlanTestCase(TestCase):
+    def assertUsesIndex(self, queryset, ordered=False):
+        """With `ordered`, the ORDER BY must also be served by the index (no temporary sort)."""
+        plan = queryset.explain()
+        full_scans = [line for line in plan.splitlines() if FULL_SCAN.search(line)]
+        self.assertFalse(full_scans, f"Full table scan in query plan:\n{plan}\nfor query:\n{queryset.query}")
+        if ordered:
+            self.assertFalse(TEMP_SORT.search(plan), f"Sort in query plan:\n{plan}\nfor query:\n{queryset.query}")
+
+
+# Rows added by QueryCountTestCase.grow() before each request; the two counts must match
+DATA_SIZES = (10, 1000)
+
+
+# Cached aggregates and template fragments are recomputed on every request
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class QueryCountTestCase(TestCase):
+    """
+    Requests a view with little and then with much more data, and fails when the number of queries
+    differs, e.g. when a template follows a relation per row.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def grow(self, size):
+        """
+        Adds `size` rows of the data the views show; returns what the URLs need. Subclasses
+        override it; by default nothing is added.
+        """
+
+    def request(self, url, post=None):
+        """SQL of a GET of `url`, or of a POST of `post`."""
+        # assertLogs keeps the request log lines of QueryTimingMiddleware out of the test output
+        with self.assertLogs('vaalbara.requests'), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url) if post is None else self.client.post(url, post)
+        self.assertLess(response.status_code, 400, f"{url} returned {response.status_code}")
+        return [query['sql'] for query in queries.captured_queries]
+
+    def assertConstantQueries(self, url, post=None):
+        """
+        Requests url(data) after each grow(), POSTing post(data) when given, where data is what
+        grow() returned.
+        """
+        captured = []
+        for size in DATA_SIZES:
+            data = self.grow(size)
+            captured.append(self.request(url(data), post(data) if post else None))
+        small, large = captured
+        self.assertEqual(len(small), len(large), "{} queries after {} rows, {} after {}:\n{}".format(
+            len(small), DATA_SIZES[0], len(large), DATA_SIZES[0] + DATA_SIZES[1], '\n'.join(large)))
+
+
+def keyset_page(queryset, ordering, after):
+    """The query VaalbaraApp.pagination.paginate_keyset() reads for the page after the row `after`."""
+    return queryset.order_by(*ordering).filter(_after(ordering, after))[:51]
+
+
+class TransactionQueryPlanTests(QueryPlanTestCase):
+    def test_inventory_report_filter(self):
+        now = timezone.localtime()
+        self.assertUsesIndex(Transaction.objects.filter(
+            inventory_id=1,
+            transaction_status='Completed',
+            transaction_type='Export',
+            completion_date__year=now.year,
+            completion_date__month=now.month,
+        ))
+
+    def test_completed_in_date_range(self):
+        self.assertUsesIndex(Transaction.objects.filter(
+            transaction_status='Completed',
+            completion_date__gte=timezone.now(),
+        ))
+
+    def test_pending_transactions(self):
+        self.assertUsesIndex(Transaction.objects.exclude(transaction_status='Completed'))
+
+    def test_list_ordering(self):
+        self.assertUsesIndex(Transaction.objects.order_by('-creation_date'))
+
+    def test_list_keyset_page(self):
+        ordering, after = ('-creation_date', '-pk'), (timezone.now(), 1)
+        transactions = Transaction.objects.select_related('inventory')
+        self.assertUsesIndex(keyset_page(transactions, ordering, after), ordered=True)
+        self.assertUsesIndex(keyset_page(transactions.filter(transaction_status='Pending'), ordering, after),
+                             ordered=True)
+        self.assertUsesIndex(keyset_page(transactions.filter(inventory_id=1), ordering, after), ordered=True)
+        self.assertUsesIndex(keyset_page(transactions.filter(creation_date__lt=timezone.now()), ordering, after),
+                             ordered=True)
+
+
+class PartnerQueryPlanTests(QueryPlanTestCase):
+    def test_list_keyset_page(self):
+        self.assertUsesIndex(keyset_page(Partner.objects.all(), ('name', 'pk'), ('A', 1)), ordered=True)
+
+    def test_import_lookup_by_tax_code(self):
+        self.assertUsesIndex(Partner.objects.filter(tax_code__in=['A', 'B']))
+
+
+class ItemQueryPlanTests(QueryPlanTestCase):
+    def test_fifo_batches(self):
+        self.assertUsesIndex(ItemBatch.objects.filter(item_id=1).order_by('creation_date', 'batch_id'))
+
+    def test_active_items_of_inventory(self):
+        self.assertUsesIndex(Item.objects.filter(inventory_id=1, is_active=True))
+
+    def test_import_lookup_by_sku(self):
+        self.assertUsesIndex(Item.objects.filter(inventory_id=1, sku__in=['A', 'B']))
+
+    def test_stock_as_of(self):
+        self.assertUsesIndex(StockMovement.objects.filter(item_id=1).as_of(timezone.now()))
+        self.assertUsesIndex(StockMovement.objects.filter(inventory_id=1).as_of(timezone.now()))
+
+
+class SnapshotQueryPlanTests(QueryPlanTestCase):
+    def test_stock_series(self):
+        today = timezone.localdate()
+        self.assertUsesIndex(InventorySnapshot.objects.filter(inventory_id=1, date__range=(today, today))
+                             .order_by('date'), ordered=True)
+        self.assertUsesIndex(ItemSnapshot.objects.filter(item_id=1, inventory_id=1, date__range=(today, today))
+                             .order_by('date'), ordered=True)
+
+
+class ExportQueryPlanTests(QueryPlanTestCase):
+    def test_exports_read_in_index_order(self):
+        for name, export in EXPORTS.items():
+            with self.subTest(name):
+                self.assertUsesIndex(export.queryset(TransactionFilterForm({})), ordered=True)
+
+    def test_filtered_transaction_lines(self):
+        today = timezone.localdate().isoformat()
+        filter_form = TransactionFilterForm({'status': 'Completed', 'date_from': today, 'date_to': today})
+        self.assertUsesIndex(EXPORTS['transaction-lines'].queryset(filter_form))
+
+
+class ViewQueryCountTests(QueryCountTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.partner = Partner.objects.create(name='Partner', phone='-', address='-', tax_code='0100000000')
+        cls.inventory = Inventory.objects.create(inventory_name='Main', slug='main')
+
+    def transaction(self, transaction_type, items, **fields):
+        tx = Transaction.objects.create(transaction_type=transaction_type, inventory=self.inventory,
+                                        partner=self.partner, created_by=self.user, **fields)
+        TransactionItem.objects.bulk_create(TransactionItem(transaction=tx, item=item, quantity=Decimal(100),
+                                                            unit_cost=Decimal(5)) for item in items)
+        return tx
+
+    def grow(self, size):
+        """
+        `size` items in stock, a sale, `size` transactions of every status, and two authorized
+        transactions: an import with a line per item and an export of three items.
+        `completed` is the completed import of the items.
+        """
+        items = Item.objects.bulk_create(
+            Item(inventory=self.inventory, item_name=f'Item {i}', unit='Box', category=f'Category {i % 10}')
+            for i in range(size)
+        )
+        completed = []
+        for transaction_type, lines in (('Import', items), ('Export', items[-1:])):
+            tx = self.transaction(transaction_type, lines, transaction_status='Authorized')
+            tx.transaction_status = 'Completed'
+            tx.save()
+            completed.append(tx)
+
+        statuses = [status for status, _ in Transaction.STATUS_CHOICES]
+        Transaction.objects.bulk_create(
+            Transaction(transaction_type='Export', inventory=self.inventory, partner=self.partner,
+                        created_by=self.user, transaction_status=statuses[i % len(statuses)],
+                        completion_deadline=timezone.now() + timedelta(days=i % 7))
+            for i in range(size)
+        )
+        return SimpleNamespace(
+            items=items,
+            completed=completed[0],
+            imported=self.transaction('Import', items, transaction_status='Authorized'),
+            exported=self.transaction('Export', items[:3], transaction_status='Authorized'),
+        )
+
+    def test_dashboard(self):
+        self.assertConstantQueries(lambda data: reverse('dashboard'))
+
+    def test_list_inventories(self):
+        self.assertConstantQueries(lambda data: reverse('ivm:inventory_manager'))
+
+    def test_inventory_details(self):
+        self.assertConstantQueries(lambda data: reverse('ivm:inv_page', args=[self.inventory.slug]))
+
+    def test_list_transactions(self):
+        self.assertConstantQueries(lambda data: reverse('ivm:transactions'))
+
+    def test_transaction_details(self):
+        self.assertConstantQueries(lambda data: reverse('ivm:transaction_detail', args=[data.imported.pk]))
+
+    def test_file_pdf_transaction(self):
+        # The HTML slip; completed transactions serve a stored PDF file
+        self.assertConstantQueries(lambda data: reverse('ivm:transaction_pdf', args=[data.imported.pk]))
+
+    def test_file_pdf_completed_transaction(self):
+        # Rendered on the first request (WeasyPrint stubbed: it needs the Pango system libraries), then stored
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root), \
+                mock.patch('ivm.pdf.render_pdf', return_value=b'%PDF-1.7') as render_pdf:
+            urls = []
+
+            def url(data):
+                urls.append(reverse('ivm:transaction_pdf', args=[data.completed.pk]))
+                return urls[-1]
+
+            self.assertConstantQueries(url)
+            self.assertEqual(render_pdf.call_count, len(DATA_SIZES))
+            # Later requests serve the stored files
+            small, large = [self.request(url) for url in urls]
+            self.assertEqual(len(small), len(large))
+            self.assertEqual(render_pdf.call_count, len(DATA_SIZES))
+
+    def test_add_transaction_get(self):
+        self.assertConstantQueries(lambda data: reverse('ivm:add_transaction'))
+
+    def test_add_transaction_post(self):
+        def post(data):
+            lines = {
+                'items-TOTAL_FORMS': 3, 'items-INITIAL_FORMS': 0,
+                'items-MIN_NUM_FORMS': 0, 'items-MAX_NUM_FORMS': 1000,
+            }
+            for i, item in enumerate(data.items[:3]):
+                lines.update({f'items-{i}-item': item.pk, f'items-{i}-quantity': 1, f'items-{i}-unit_cost': 8,
+                              f'items-{i}-discount': 0})
+            return {
+                'inventory': self.inventory.pk, 'transaction_type': 'Export', 'partner': self.partner.pk,
+                'partner_bill': 'HD-1', 'completion_deadline': '2030-01-01T00:00', 'extra_cost': 0, **lines,
+            }
+
+        self.assertConstantQueries(lambda data: reverse('ivm:add_transaction'), post)
+        # Both requests created their transaction instead of showing form errors
+        self.assertEqual(Transaction.objects.filter(partner_bill='HD-1').count(), len(DATA_SIZES))
+
+    def test_complete_transaction(self):
+        exports = []
+
+        def url(data):
+            exports.append(data.exported)
+            return reverse('ivm:complete_transaction', args=[data.exported.pk])
+
+        self.assertConstantQueries(url, lambda data: {})
+        for tx in exports:
+            tx.refresh_from_db()
+            self.assertTrue(tx.is_completed)
+
+
+class StockTestCase(TestCase):
+    """An inventory with two items, and helpers to move their stock through Transaction.save()."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username='stock-keeper')
+        cls.partner = Partner.objects.create(name='Partner', phone='-', address='-', tax_code='0100000000')
+        cls.inventory = Inventory.objects.create(inventory_name='Main', slug='main')
+        cls.item, cls.other_item = [Item.objects.create(inventory=cls.inventory, item_name=name, unit='Box',
+                                                        category='-') for name in ('A', 'B')]
+
+    def transaction(self, transaction_type, lines, status='Authorized', **fields):
+        """A transaction of (item, quantity, unit_cost) lines."""
+        fields.setdefault('inventory', self.inventory)
+        tx = Transaction.objects.create(transaction_type=transaction_type, partner=self.partner,
+                                        created_by=self.user, transaction_status=status, **fields)
+        TransactionItem.objects.bulk_create(
+            TransactionItem(transaction=tx, item=item, quantity=Decimal(quantity), unit_cost=Decimal(unit_cost))
+            for item, quantity, unit_cost in lines
+        )
+        return tx
+
+    def complete(self, transaction_type, lines, completion_date=None, **fields):
+        """A completed transaction of (item, quantity, unit_cost) lines, completed at `completion_date`."""
+        tx = self.transaction(transaction_type, lines, **fields)
+        tx.transaction_status = 'Completed'
+        tx.completion_date = completion_date
+        tx.save()
+        return tx
+
+    def assertStock(self, item, quantity, value):
+        item.refresh_from_db()
+        self.assertEqual((item.stock_on_hand, item.stock_value), (Decimal(quantity), Decimal(value)))
+
+    def assertBatches(self, item, batches):
+        """The item's batches are these (quantity, unit_cost) pairs, in FIFO order."""
+        self.assertEqual(
+            list(item.batches.order_by('creation_date', 'batch_id').values_list('quantity', 'unit_cost')),
+            [(Decimal(quantity), Decimal(unit_cost)) for quantity, unit_cost in batches],
+        )
+
+
+class FifoCompletionTests(StockTestCase):
+    def setUp(self):
+        self.complete('Import', [(self.item, 10, 5)])
+        self.complete('Import', [(self.item, 10, 7), (self.other_item, 4, 3)])
+
+    def test_export_across_batches(self):
+        tx = self.complete('Export', [(self.item, 15, 9)])
+        # 10 from the first batch at 5, 5 from the second at 7
+        self.assertEqual(tx.transaction_items.get().report_value, Decimal(85))
+        self.assertBatches(self.item, [(5, 7)])
+        self.assertStock(self.item, 5, 35)
+        self.assertStock(self.other_item, 4, 12)
+
+    def test_export_of_a_whole_batch(self):
+        tx = self.complete('Export', [(self.item, 10, 9)])
+        self.assertEqual(tx.transaction_items.get().report_value, Decimal(50))
+        self.assertBatches(self.item, [(10, 7)])
+        self.assertStock(self.item, 10, 70)
+
+    def test_two_lines_of_the_same_item(self):
+        tx = self.complete('Export', [(self.item, 4, 9), (self.item, 8, 9)])
+        # The second line starts where the first stopped: 6 at 5, then 2 at 7
+        self.assertEqual(sorted(tx.transaction_items.values_list('report_value', flat=True)),
+                         [Decimal(20), Decimal(44)])
+        self.assertEqual(tx.report_value, Decimal(64))
+        self.assertBatches(self.item, [(8, 7)])
+        self.assertStock(self.item, 8, 56)
+
+    def test_insufficient_stock_changes_nothing(self):
+        tx = self.transaction('Export', [(self.other_item, 1, 9), (self.item, 21, 9)])
+        tx.transaction_status = 'Completed'
+        with self.assertRaisesMessage(ValidationError, 'Insufficient stock for A'):
+            tx.save()
+
+        tx.refresh_from_db()
+        self.assertEqual(tx.transaction_status, 'Authorized')
+        self.assertEqual(list(tx.transaction_items.values_list('report_value', flat=True)), [0, 0])
+        self.assertFalse(tx.stock_movements.exists())
+        self.assertBatches(self.item, [(10, 5), (10, 7)])
+        self.assertBatches(self.other_item, [(4, 3)])
+        self.assertStock(self.item, 20, 120)
+        self.assertStock(self.other_item, 4, 12)
+
+
+class StatusTransitionTests(StockTestCase):
+    def setUp(self):
+        self.complete('Import', [(self.item, 10, 5)])
+
+    def test_stale_instance_cannot_complete_again(self):
+        tx = self.transaction('Export', [(self.item, 3, 9)])
+        first, stale = Transaction.objects.get(pk=tx.pk), Transaction.objects.get(pk=tx.pk)
+        first.transaction_status = 'Completed'
+        first.save()
+
+        stale.transaction_status = 'Completed'
+        with self.assertRaisesMessage(ValidationError, 'was changed by someone else'):
+            stale.save()
+        self.assertStock(self.item, 7, 35)
+        self.assertBatches(self.item, [(7, 5)])
+        self.assertEqual(tx.stock_movements.count(), 1)
+
+    def test_stale_instance_cannot_undo_a_completion(self):
+        tx = self.transaction('Export', [(self.item, 3, 9)])
+        first, stale = Transaction.objects.get(pk=tx.pk), Transaction.objects.get(pk=tx.pk)
+        first.transaction_status = 'Completed'
+        first.save()
+
+        stale.transaction_status = 'Rejected'
+        with self.assertRaises(ValidationError):
+            stale.save()
+        tx.refresh_from_db()
+        self.assertEqual(tx.transaction_status, 'Completed')
+
+    def test_reject_view_reports_a_lost_race(self):
+        tx = self.transaction('Export', [(self.item, 3, 9)])
+        # The view loads the transaction, then another request completes it before the rejection is saved
+        stale = Transaction.objects.get(pk=tx.pk)
+        Transaction.objects.filter(pk=tx.pk).update(transaction_status='Completed')
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin'))
+        with mock.patch('ivm.views.view_transaction_forms.get_object_or_404', return_value=stale), \
+                self.assertLogs('vaalbara.requests'):
+            response = self.client.post(reverse('ivm:reject_transaction', args=[tx.pk]))
+
+        self.assertRedirects(response, reverse('ivm:transaction_detail', args=[tx.pk]), fetch_redirect_response=False)
+        self.assertEqual([str(message) for message in get_messages(response.wsgi_request)],
+                         [f"Rejection failed: Transaction {tx.code} was changed by someone else, please reload it."])
+        tx.refresh_from_db()
+        self.assertEqual(tx.transaction_status, 'Completed')
+
+
+class ItemSaveTests(StockTestCase):
+    def test_save_keeps_stock_moved_since_loading(self):
+        item = Item.objects.get(pk=self.item.pk)
+        self.complete('Import', [(self.item, 10, 5)])
+
+        item.is_active = False
+        item.save()
+        self.assertStock(item, 10, 50)
+        self.assertFalse(item.is_active)
+
+    def test_edit_form_keeps_stock_moved_since_loading(self):
+        form = ItemForm({'inventory': self.inventory.pk, 'sku': 'A-1', 'item_name': 'A', 'unit': 'Box',
+                         'category': 'New'}, instance=Item.objects.get(pk=self.item.pk))
+        self.complete('Import', [(self.item, 10, 5)])
+
+        self.assertTrue(form.is_valid(), form.errors)
+        item = form.save()
+        self.assertStock(item, 10, 50)
+        self.assertEqual((item.sku, item.category), ('A-1', 'New'))
+
+    def test_named_stock_fields_are_saved(self):
+        item = Item.objects.get(pk=self.item.pk)
+        item.stock_on_hand, item.stock_value = Decimal(3), Decimal(15)
+        item.save(update_fields=['stock_on_hand', 'stock_value'])
+        self.assertStock(item, 3, 15)
+
+
+class BulkCompletionViewTests(StockTestCase):
+    def setUp(self):
+        self.complete('Import', [(self.item, 10, 5)])
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin'))
+
+    def test_results_are_shown_on_the_list(self):
+        done = self.transaction('Export', [(self.item, 4, 9)])
+        short = self.transaction('Export', [(self.item, 7, 9)])
+        with self.assertLogs('vaalbara.requests'):
+            response = self.client.post(reverse('ivm:complete_transactions'),
+                                        {'transaction_ids': [done.pk, short.pk]}, follow=True)
+
+        self.assertRedirects(response, reverse('ivm:transactions'))
+        self.assertContains(response, '1 transaction(s) completed, inventory updated.')
+        self.assertContains(response, f'Completion of {short.code} failed: Insufficient stock for A')
+        self.assertStock(self.item, 6, 30)
+
+    def test_checkboxes_are_outside_of_the_row_links(self):
+        tx = self.transaction('Export', [(self.item, 4, 9)])
+        with self.assertLogs('vaalbara.requests'):
+            html = self.client.get(reverse('ivm:transactions')).content.decode()
+        self.assertIn(f'name="transaction_ids" value="{tx.pk}"', html)
+        links = re.findall(r'<a\b.*?</a>', html, re.S)
+        self.assertFalse([link for link in links if '<input' in link])
+
+
+class StockAsOfTests(StockTestCase):
+    def setUp(self):
+        self.start = timezone.now() - timedelta(days=10)
+        self.complete('Import', [(self.item, 10, 5), (self.other_item, 2, 3)], self.start)
+        self.complete('Import', [(self.item, 10, 7)], self.start + timedelta(days=2))
+        self.complete('Export', [(self.item, 12, 9)], self.start + timedelta(days=4))
+
+    def stock(self, days, group_by='item'):
+        """{item or inventory id: (quantity, value)} held `days` after the first import."""
+        rows = StockMovement.objects.as_of(self.start + timedelta(days=days), group_by=group_by)
+        return {row[group_by]: (row['total_quantity'], row['total_value']) for row in rows}
+
+    def test_between_movements(self):
+        self.assertEqual(self.stock(-1), {})
+        self.assertEqual(self.stock(1), {self.item.pk: (10, 50), self.other_item.pk: (2, 6)})
+        self.assertEqual(self.stock(3), {self.item.pk: (20, 120), self.other_item.pk: (2, 6)})
+        # The export took the first batch and 2 of the second: 50 + 14
+        self.assertEqual(self.stock(5), {self.item.pk: (8, 56), self.other_item.pk: (2, 6)})
+
+    def test_matches_current_stock(self):
+        for item in (self.item, self.other_item):
+            item.refresh_from_db()
+            self.assertEqual(self.stock(20)[item.pk], (item.stock_on_hand, item.stock_value))
+
+    def test_by_inventory(self):
+        self.assertEqual(self.stock(3, group_by='inventory'), {self.inventory.pk: (22, 126)})
+        self.assertEqual(self.stock(5, group_by='inventory'), {self.inventory.pk: (10, 62)})
+
+
+class InventoryFinancialsTests(StockTestCase):
+    def setUp(self):
+        self.complete('Import', [(self.item, 10, 5), (self.other_item, 4, 3)], extra_cost=Decimal(2))
+        export = self.transaction('Export', [(self.item, 4, 9), (self.other_item, 1, 10)], extra_cost=Decimal('0.5'))
+        export.transaction_items.filter(item=self.item).update(discount=25)
+        export.transaction_items.filter(item=self.other_item).update(discount=Decimal('12.5'))
+        export.transaction_status = 'Completed'
+        export.save()
+        # Neither counts: only completed transactions do
+        self.transaction('Export', [(self.item, 1, 100)])
+        self.transaction('Import', [(self.item, 1, 100)], status='Rejected')
+        self.empty = Inventory.objects.create(inventory_name='Empty', slug='empty')
+
+    def financials(self, inventory):
+        cent = Decimal('0.01')
+        return {
+            'num_unique_items': inventory.num_unique_items,
+            'value': Decimal(inventory.value).quantize(cent),
+            'total_cost': Decimal(inventory.total_cost).quantize(cent),
+            'total_revenue': Decimal(inventory.total_revenue).quantize(cent),
+            'total_profit': Decimal(inventory.total_profit).quantize(cent),
+        }
+
+    def test_annotations_match_the_properties(self):
+        annotated = {inventory.pk: inventory for inventory in Inventory.objects.with_financials()}
+        for inventory in Inventory.objects.all():
+            with self.subTest(inventory.inventory_name):
+                self.assertTrue(hasattr(annotated[inventory.pk], 'agg_total_revenue'))
+                self.assertFalse(hasattr(inventory, 'agg_total_revenue'))
+                self.assertEqual(self.financials(annotated[inventory.pk]), self.financials(inventory))
+
+    def test_figures(self):
+        inventories = {inventory.pk: self.financials(inventory) for inventory in Inventory.objects.with_financials()}
+        self.assertEqual(inventories[self.inventory.pk], {
+            'num_unique_items': 2,
+            # 6 left at 5 and 3 at 3
+            'value': Decimal('39.00'),
+            # 50 + 12 imported, plus the extra cost of both transactions
+            'total_cost': Decimal('64.50'),
+            # 4 × 9 less 25%, and 10 less 12.5%
+            'total_revenue': Decimal('35.75'),
+            'total_profit': Decimal('-28.75'),
+        })
+        # Coalesce() defaults of an inventory without items or transactions
+        self.assertEqual(inventories[self.empty.pk], {
+            'num_unique_items': 0, 'value': 0, 'total_cost': 0, 'total_revenue': 0, 'total_profit': 0,
+        })
+
+
+class TransactionItemFormSetTests(StockTestCase):
+    def setUp(self):
+        other = Inventory.objects.create(inventory_name='Other', slug='other')
+        self.foreign_item = Item.objects.create(inventory=other, item_name='C', unit='Box', category='-')
+
+    def formset(self, *items):
+        data = {'items-TOTAL_FORMS': len(items), 'items-INITIAL_FORMS': 0}
+        for i, item in enumerate(items):
+            data.update({f'items-{i}-item': item.pk, f'items-{i}-quantity': 1, f'items-{i}-unit_cost': 5,
+                         f'items-{i}-discount': 0})
+        return TransactionItemFormSet(data, prefix='items', inventory=self.inventory,
+                                      instance=Transaction(transaction_type='Import'))
+
+    def test_item_of_another_inventory_is_rejected(self):
+        formset = self.formset(self.item, self.foreign_item)
+        self.assertFalse(formset.is_valid())
+        self.assertEqual(formset.errors[0], {})
+        self.assertEqual(formset.errors[1]['item'],
+                         ['Select a valid choice. That choice is not one of the available choices.'])
+
+    def test_add_transaction_view(self):
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin'))
+        data = {
+            'inventory': self.inventory.pk, 'transaction_type': 'Import', 'partner': self.partner.pk,
+            'partner_bill': 'HD-1', 'completion_deadline': '2030-01-01T00:00', 'extra_cost': 0,
+            'items-TOTAL_FORMS': 1, 'items-INITIAL_FORMS': 0, 'items-0-item': self.foreign_item.pk,
+            'items-0-quantity': 1, 'items-0-unit_cost': 5, 'items-0-discount': 0,
+        }
+        with self.assertLogs('vaalbara.requests'):
+            response = self.client.post(reverse('ivm:add_transaction'), data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('item', response.context['formset'].errors[0])
+        self.assertFalse(Transaction.objects.exists())
+
+
+class ItemStockViewTests(StockTestCase):
+    def setUp(self):
+        self.complete('Import', [(self.item, 10, 5), (self.other_item, 2.5, 3)])
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin'))
+
+    def get(self, ids, **headers):
+        with self.assertLogs('vaalbara.requests'):
+            return self.client.get(reverse('ivm:item_stock'), {'ids': ids}, headers=headers)
+
+    def test_stock_of_the_requested_items(self):
+        response = self.get(f'{self.item.pk},{self.other_item.pk}')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(response.content), {str(self.item.pk): '10.000', str(self.other_item.pk): '2.500'})
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_ids_parsing(self):
+        # Blanks, non-numbers and unknown ids are skipped
+        self.assertEqual(json.loads(self.get(f' {self.item.pk}, x,,-3,99999').content), {str(self.item.pk): '10.000'})
+        for ids in ('', ',', 'abc'):
+            with self.subTest(ids=ids):
+                self.assertEqual(json.loads(self.get(ids).content), {})
+
+    def test_items_of_another_inventory(self):
+        # Item ids are global: the form shows the stock of a selected item of another inventory,
+        # SharedItemChoiceField then rejects it
+        other = Inventory.objects.create(inventory_name='Other', slug='other')
+        item = Item.objects.create(inventory=other, item_name='C', unit='Box', category='-')
+        self.complete('Import', [(item, 4, 1)], inventory=other)
+        self.assertEqual(json.loads(self.get(f'{self.item.pk},{item.pk}').content),
+                         {str(self.item.pk): '10.000', str(item.pk): '4.000'})
+
+    def test_revalidation(self):
+        ids = f'{self.item.pk},{self.other_item.pk}'
+        etag = self.get(ids)['ETag']
+        response = self.get(ids, if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        self.complete('Export', [(self.item, 1, 9)])
+        response = self.get(ids, if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(json.loads(response.content)[str(self.item.pk)], '9.000')
+
+    def test_requires_a_transaction_permission(self):
+        self.client.force_login(get_user_model().objects.create_user('viewer'))
+        with self.assertLogs('django.request', 'WARNING'):
+            self.assertEqual(self.get(str(self.item.pk)).status_code, 403)
+
+        self.client.logout()
+        response = self.get(str(self.item.pk))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith('/users/login/'))
+
+
+class ExportViewTests(StockTestCase):
+    def setUp(self):
+        self.imported = self.complete('Import', [(self.item, 10, 5), (self.other_item, 4, 3)])
+        self.exported = self.transaction('Export', [(self.item, 3, 9.99)], extra_cost=Decimal('1.5'))
+        self.exported.transaction_items.update(discount=Decimal('12.5'))
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin'))
+
+    def get(self, dataset, **params):
+        with self.assertLogs('vaalbara.requests'):
+            response = self.client.get(reverse('ivm:export_data', args=[dataset]), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def csv_rows(self, dataset, **params):
+        content = self.get(dataset, **params).decode('utf-8')
+        self.assertTrue(content.startswith('\ufeff'))
+        header, *rows = csv.reader(StringIO(content[1:]))
+        self.assertEqual(header, EXPORTS[dataset].headers)
+        return rows
+
+    def test_transaction_lines_csv(self):
+        imported, exported = self.imported.code, self.exported.code
+        # Code, item, quantity, unit cost, discount, value, report value
+        self.assertEqual([[row[0], row[6]] + row[9:14] for row in self.csv_rows('transaction-lines')], [
+            [imported, str(self.item.pk), '10.000', '5.00', '0.00', '50.00', '50.00'],
+            [imported, str(self.other_item.pk), '4.000', '3.00', '0.00', '12.00', '12.00'],
+            # 3 × 9.99 less 12.5%, rounded to the cent; not completed yet, so no report value
+            [exported, str(self.item.pk), '3.000', '9.99', '12.50', '26.22', '0.00'],
+        ])
+
+    def test_filters_apply(self):
+        rows = self.csv_rows('transaction-lines', type='Export')
+        self.assertEqual([(row[0], row[1], row[2]) for row in rows],
+                         [(self.exported.code, self.exported.get_transaction_type_display(),
+                           self.exported.get_transaction_status_display())])
+        self.assertEqual([row[0] for row in self.csv_rows('transactions', status='Completed')], [self.imported.code])
+        self.assertEqual([row[0] for row in self.csv_rows('transactions', type='Export')], [self.exported.code])
+        self.assertEqual(self.csv_rows('transactions', inventory=Inventory.objects.create(slug='empty').pk), [])
+
+    def test_transactions_xlsx(self):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(BytesIO(self.get('transactions', format='xlsx')), read_only=True)
+        header, *rows = workbook[EXPORTS['transactions'].title].values
+        self.assertEqual(list(header), EXPORTS['transactions'].headers)
+        self.assertEqual([(row[0], row[4], row[6]) for row in rows], [
+            (self.imported.code, 'Partner', 0),
+            (self.exported.code, 'Partner', 1.5),
+        ])
+        completed = rows[0][9]
+        self.assertEqual(completed, timezone.localtime(Transaction.objects.get(pk=self.imported.pk).completion_date)
+                         .replace(tzinfo=None, microsecond=0))
+        self.assertIsNone(rows[1][9])
+        workbook.close()
+
+
+class LedgerAdminTests(StockTestCase):
+    def setUp(self):
+        self.complete('Import', [(self.item, 10, 5)])
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin'))
+
+    def get(self, url):
+        with self.assertLogs('vaalbara.requests'):
+            return self.client.get(url)
+
+    def assertForbidden(self, url):
+        with self.assertLogs('django.request', 'WARNING'):
+            self.assertEqual(self.get(url).status_code, 403)
+
+    def test_stock_movements_are_read_only(self):
+        movement = StockMovement.objects.get()
+        self.assertEqual(self.get(reverse('admin:ivm_stockmovement_changelist')).status_code, 200)
+        self.assertForbidden(reverse('admin:ivm_stockmovement_add'))
+        self.assertForbidden(reverse('admin:ivm_stockmovement_delete', args=[movement.pk]))
+        response = self.get(reverse('admin:ivm_stockmovement_change', args=[movement.pk]))
+        self.assertFalse(response.context['has_change_permission'])
+        self.assertNotContains(response, 'name="quantity"')
+
+    def test_derived_columns_are_read_only(self):
+        response = self.get(reverse('admin:ivm_item_change', args=[self.item.pk]))
+        self.assertNotContains(response, 'name="stock_on_hand"')
+        self.assertNotContains(response, 'name="stock_value"')
+        self.assertContains(response, 'name="item_name"')
+
+        summary = InventoryPeriodSummary.objects.get()
+        self.assertForbidden(reverse('admin:ivm_inventoryperiodsummary_add'))
+        response = self.get(reverse('admin:ivm_inventoryperiodsummary_change', args=[summary.pk]))
+        self.assertNotContains(response, 'name="revenue"')
+        self.assertNotContains(response, 'name="cost"')
+
+
+class TakeSnapshotsTests(StockTestCase):
+    def setUp(self):
+        self.start = timezone.localtime() - timedelta(days=6)
+        self.complete('Import', [(self.item, 10, 5), (self.other_item, 2, 3)], self.start)
+        self.complete('Export', [(self.item, 4, 9)], self.start + timedelta(days=2))
+
+    def snapshots(self):
+        return (
+            list(ItemSnapshot.objects.order_by('date', 'item').values_list('date', 'item', 'quantity', 'value')),
+            list(InventorySnapshot.objects.order_by('date', 'inventory')
+                 .values_list('date', 'inventory', 'quantity', 'value', 'item_count')),
+        )
+
+    def test_end_of_day_stock(self):
+        call_command('take_snapshots', stdout=StringIO())
+        yesterday = timezone.localdate() - timedelta(days=1)
+        self.assertEqual(ItemSnapshot.objects.filter(item=self.item).count(), (yesterday - self.start.date()).days + 1)
+        for day in (self.start.date(), self.start.date() + timedelta(days=2), yesterday):
+            end_of_day = timezone.make_aware(datetime.combine(day, time.max))
+            with self.subTest(day=day):
+                for row in StockMovement.objects.as_of(end_of_day):
+                    snapshot = ItemSnapshot.objects.get(item=row['item'], date=day)
+                    self.assertEqual((snapshot.quantity, snapshot.value), (row['total_quantity'], row['total_value']))
+        self.assertEqual(InventorySnapshot.objects.get(date=yesterday).quantity, 8)
+
+    def test_rerun_is_idempotent(self):
+        call_command('take_snapshots', stdout=StringIO())
+        first = self.snapshots()
+        call_command('take_snapshots', stdout=StringIO())
+        self.assertEqual(self.snapshots(), first)
+        # Days that were already snapshotted are kept as they are
+        call_command('take_snapshots', since=self.start.date(), stdout=StringIO())
+        self.assertEqual(self.snapshots(), first)
+        # Resuming after the last snapshot starts from the ledger balance of the day before
+        cutoff = self.start.date() + timedelta(days=3)
+        ItemSnapshot.objects.filter(date__gte=cutoff).delete()
+        InventorySnapshot.objects.filter(date__gte=cutoff).delete()
+        call_command('take_snapshots', stdout=StringIO())
+        self.assertEqual(self.snapshots(), first)
+
+
+def csv_file(*lines):
+    return StringIO('\n'.join(lines) + '\n')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                        'LOCATION': 'fragment-tests'}})
+class FragmentCacheTests(StockTestCase):
+    """Cached inventory and item rows are rendered again once a change is committed."""
+    def setUp(self):
+        ivm_cache.cache.clear()
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin'))
+
+    def get(self, url):
+        with self.assertLogs('vaalbara.requests'):
+            return self.client.get(url).content.decode()
+
+    def test_item_rows(self):
+        url = reverse('ivm:inv_page', args=[self.inventory.slug])
+        self.assertIn(f'A (ID: {self.item.pk})', self.get(url))
+        # Changes that bypass Item.save() keep the cached row
+        Item.objects.filter(pk=self.item.pk).update(packaging='Stale')
+        self.assertNotIn('Stale', self.get(url))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            item = Item.objects.get(pk=self.item.pk)
+            item.packaging = '10ml'
+            item.save()
+        self.assertIn('<div>10ml</div>', self.get(url))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.complete('Import', [(self.item, 12, 5)])
+        html = self.get(url)
+        self.assertIn('<div>12</div>', html)
+        self.assertIn('<div>60</div>', html)
+
+    def test_inventory_rows(self):
+        url = reverse('ivm:inventory_manager')
+        self.assertIn('=&gt Main &lt=', self.get(url))
+        Inventory.objects.filter(pk=self.inventory.pk).update(inventory_name='Stale')
+        self.assertNotIn('Stale', self.get(url))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.complete('Import', [(self.item, 12, 5)])
+        html = self.get(url)
+        self.assertIn('=&gt Stale &lt=', html)
+        self.assertIn('<span>60</span>', html)
+
+
+class ImportTests(StockTestCase):
+    def test_items_are_created_then_updated(self):
+        result = import_items(csv_file('sku,item_name,unit,category', 'A-1,Gloves,Box,Care', 'A-2,Masks,Hộp,Care'),
+                              self.inventory)
+        self.assertEqual((result.created, result.updated, result.errors), (2, 0, []))
+        gloves = Item.objects.get(inventory=self.inventory, sku='A-1')
+        self.assertEqual(Item.objects.get(inventory=self.inventory, sku='A-2').unit, 'Box')
+
+        result = import_items(csv_file('SKU,Item_Name,Unit,Category,Brand', 'A-1,Nitrile gloves,Box,Care,Acme',
+                                       'A-3,Soap,Bottle,Care,'), self.inventory, chunk_size=1)
+        self.assertEqual((result.created, result.updated, result.errors), (1, 1, []))
+        version = gloves.version
+        gloves.refresh_from_db()
+        self.assertEqual((gloves.item_name, gloves.brand), ('Nitrile gloves', 'Acme'))
+        self.assertEqual(gloves.version, version + 1)
+        self.assertEqual(Item.objects.filter(inventory=self.inventory, sku__isnull=False).count(), 3)
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        result = import_items(csv_file(
+            'sku,item_name,unit,category',
+            'B-1,Gloves,Box,Care',
+            'B-2,Masks,Crate,Care',
+            'B-1,Gloves again,Box,Care',
+            'B-3,,Box,Care',
+            'B-4,Soap,Bottle,Care',
+        ), self.inventory, chunk_size=2)
+        self.assertEqual(result.created, 2)
+        self.assertEqual([line for line, _ in result.errors], [3, 4, 5])
+        self.assertIn('unit:', result.errors[0][1])
+        self.assertEqual(result.errors[1][1], 'Same sku as line 2, skipped.')
+        self.assertIn('item_name:', result.errors[2][1])
+        self.assertEqual(sorted(Item.objects.filter(sku__isnull=False).values_list('sku', flat=True)), ['B-1', 'B-4'])
+
+    def test_missing_columns(self):
+        result = import_items(csv_file('sku,item_name', 'C-1,Gloves'), self.inventory)
+        self.assertEqual(result.errors, [(1, 'Missing column(s): unit, category.')])
+        self.assertEqual(result.created, 0)
+
+    def test_partners_are_upserted_on_tax_code(self):
+        result = import_partners(csv_file(
+            'tax_code,name,phone,address,email',
+            '0100000000,Renamed partner,0901,Hanoi,',
+            '0200000000,New partner,0902,Hue,new@example.com',
+            '0300000000,Bad email,0903,Hue,not-an-email',
+        ))
+        self.assertEqual((result.created, result.updated), (1, 1))
+        self.assertEqual([line for line, _ in result.errors], [4])
+        self.partner.refresh_from_db()
+        self.assertEqual(self.partner.name, 'Renamed partner')
+        self.assertEqual(Partner.objects.count(), 2)
+
+    def test_opening_stock(self):
+        Item.objects.filter(pk=self.item.pk).update(sku='A')
+        Item.objects.filter(pk=self.other_item.pk).update(sku='B')
+        result = import_opening_stock(csv_file(
+            'sku,quantity,unit_cost,notes',
+            'A,10,5,',
+            'Z,1,1,',
+            'B,0,1,',
+            'B,4,2.5,Shelf 2',
+        ), self.inventory, self.partner, self.user)
+
+        self.assertEqual(result.created, 2)
+        self.assertEqual([line for line, _ in result.errors], [3, 4])
+        self.assertIn("No item with sku 'Z'", result.errors[0][1])
+        tx = result.transaction
+        self.assertEqual((tx.transaction_type, tx.transaction_status, tx.notes),
+                         ('Import', 'Completed', OPENING_BALANCE_NOTE))
+        self.assertEqual(tx.report_value, Decimal(60))
+        self.assertBatches(self.item, [(10, 5)])
+        self.assertBatches(self.other_item, [(4, '2.5')])
+        self.assertStock(self.item, 10, 50)
+        self.assertStock(self.other_item, 4, 10)
+        self.assertEqual(tx.stock_movements.count(), 2)
+
+    def test_opening_stock_without_valid_rows(self):
+        result = import_opening_stock(csv_file('sku,quantity,unit_cost', 'Z,1,1'), self.inventory, self.partner,
+                                      self.user)
+        self.assertIsNone(result.transaction)
+        self.assertFalse(Transaction.objects.exists())
+
+
+class ImportKeysMigrationTests(TransactionTestCase):
+    """Migration 0010 stops on partners sharing a tax code instead of failing on the unique constraint."""
+    before, after = [('ivm', '0009_item_version')], [('ivm', '0010_import_keys')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_duplicate_tax_codes(self):
+        Partner = self.migrate(self.before).get_model('ivm', 'Partner')
+        for name in ('A', 'B'):
+            Partner.objects.create(name=name, phone='-', address='-', tax_code='0100000000')
+
+        with self.assertRaisesMessage(RuntimeError, "Partner tax codes must be unique before migrating"):
+            self.migrate(self.after)
+        # Rolled back: the migration can run once the partners are corrected
+        Partner.objects.filter(name='B').update(tax_code='0200000000')
+        self.migrate(self.after)
+
+
+class RollupTests(StockTestCase):
+    """The dashboard figures read from InventoryPeriodSummary match the completed transactions."""
+    def setUp(self):
+        now = timezone.localtime()
+        last_month = (now.replace(day=1) - timedelta(days=1)).replace(hour=12)
+        self.complete('Import', [(self.item, 10, 5), (self.other_item, 10, 8)], last_month, extra_cost=Decimal(3))
+        self.complete('Export', [(self.item, 4, 9)], last_month + timedelta(minutes=1))
+        self.complete('Import', [(self.item, 2, 6)], extra_cost=Decimal(1))
+        self.complete('Export', [(self.item, 3, 10), (self.other_item, 1, 20)], extra_cost=Decimal(2))
+
+    def raw_figures(self, **period):
+        """Revenue and cost of the completed transactions, added up line by line in Python."""
+        transactions = Transaction.objects.filter(transaction_status='Completed', **period)
+        revenue = sum(tx.value for tx in transactions if tx.transaction_type == 'Export')
+        cost = sum(tx.value for tx in transactions if tx.transaction_type == 'Import')
+        cost += sum(tx.extra_cost for tx in transactions)
+        return revenue, cost
+
+    def assertFiguresMatch(self, summary):
+        now = timezone.localtime()
+        live_month = {'completion_date__year': now.year, 'completion_date__month': now.month}
+        self.assertEqual((summary['total_revenue'], summary['total_cost']), self.raw_figures())
+        self.assertEqual((summary['monthly_revenue'], summary['monthly_cost']), self.raw_figures(**live_month))
+        self.assertEqual((summary['yearly_revenue'], summary['yearly_cost']),
+                         self.raw_figures(completion_date__year=now.year))
+
+    def test_incremental_rollups(self):
+        self.assertEqual(InventoryPeriodSummary.objects.count(), 4)
+        self.assertFiguresMatch(my_functions.get_all_inventories_summary())
+
+    def test_rebuild(self):
+        incremental = list(InventoryPeriodSummary.objects.order_by('year', 'month', 'transaction_type')
+                           .values('year', 'month', 'transaction_type', 'revenue', 'cost', 'extra_cost',
+                                   'line_count'))
+        call_command('rebuild_rollups', stdout=StringIO())
+        rebuilt = list(InventoryPeriodSummary.objects.order_by('year', 'month', 'transaction_type')
+                       .values('year', 'month', 'transaction_type', 'revenue', 'cost', 'extra_cost', 'line_count'))
+        self.assertEqual(rebuilt, incremental)
+        self.assertFiguresMatch(my_functions.get_all_inventories_summary())
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_rebuild_invalidates_cached_figures(self):
+        # Rollups that drifted from the transactions, and figures cached from them
+        InventoryPeriodSummary.objects.update(revenue=0, cost=0, extra_cost=0)
+        self.assertNotEqual(ivm_cache.inventories_summary()['total_revenue'], self.raw_figures()[0])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_rollups', stdout=StringIO())
+        self.assertFiguresMatch(ivm_cache.inventories_summary())
+
+
+def cursor(*values):
+    """A ?cursor= value as VaalbaraApp.pagination.encode_cursor() writes it, here with any values."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+# Cursors a client can forge: values of the wrong type or that are not valid field values
+TAMPERED_CURSORS = [
+    cursor('bad-date', 1),
+    cursor('2025-01-01T00:00:00+00:00', 'x'),
+    cursor(None, 1),
+    cursor(1, 1),
+    cursor('2025-01-01T00:00:00+00:00', 10 ** 30),
+]
+
+
+class KeysetPaginationTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def assertBadRequest(self, url, cursors):
+        for value in cursors:
+            with self.subTest(url=url, cursor=value), self.assertLogs('django.request', 'WARNING'), \
+                    self.assertLogs('vaalbara.requests'):
+                self.assertEqual(self.client.get(url, {'cursor': value}).status_code, 400)
+
+
+class KeysetPaginationTests(KeysetPaginationTestCase):
+
+    def test_tampered_transactions_cursor(self):
+        self.assertBadRequest(reverse('ivm:transactions'), TAMPERED_CURSORS)
+
+    def test_tampered_partners_cursor(self):
+        self.assertBadRequest(reverse('ivm:page_partners'), [cursor(None, 1), cursor('A', 'x'), cursor('A')])
+
+    def test_cursor_of_the_next_page(self):
+        partner = Partner.objects.create(name='A', phone='-', address='-', tax_code='0100000000')
+        with self.assertLogs('vaalbara.requests'):
+            response = self.client.get(reverse('ivm:page_partners'), {'cursor': cursor('0', partner.pk - 1)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['page']), [partner])
+
+
+@skipUnless(connection.features.has_select_for_update_skip_locked, "Needs row locks (PostgreSQL)")
+class ConcurrentCompletionTests(TransactionTestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='stock-keeper')
+        self.partner = Partner.objects.create(name='Partner', phone='-', address='-', tax_code='0100000000')
+        self.inventory = Inventory.objects.create(inventory_name='Main', slug='main')
+        self.items = [Item.objects.create(inventory=self.inventory, item_name=name, unit='Box', category='-')
+                      for name in ('A', 'B')]
+        stock = self.transaction('Import', [(item, Decimal(10)) for item in self.items])
+        stock.transaction_status = 'Completed'
+        stock.save()
+
+    def transaction(self, transaction_type, lines):
+        tx = Transaction.objects.create(transaction_type=transaction_type, inventory=self.inventory,
+                                        partner=self.partner, created_by=self.user, transaction_status='Authorized')
+        TransactionItem.objects.bulk_create(TransactionItem(transaction=tx, item=item, quantity=quantity,
+                                                            unit_cost=Decimal(5)) for item, quantity in lines)
+        return tx
+
+    def in_threads(self, *targets):
+        errors = []
+
+        def run(target):
+            try:
+                target()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=run, args=(target,)) for target in targets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=30)
+        return errors
+
+    def test_exports_of_the_same_items_in_opposite_order(self):
+        first = self.transaction('Export', [(self.items[0], Decimal(3)), (self.items[1], Decimal(3))])
+        second = self.transaction('Export', [(self.items[1], Decimal(4)), (self.items[0], Decimal(4))])
+        barrier = threading.Barrier(2)
+
+        def complete(pk):
+            def target():
+                tx = Transaction.objects.get(pk=pk)
+                tx.transaction_status = 'Completed'
+                barrier.wait()
+                tx.save()
+            return target
+
+        self.assertEqual(self.in_threads(complete(first.pk), complete(second.pk)), [])
+        for item in self.items:
+            item.refresh_from_db()
+            self.assertEqual(item.stock_on_hand, 3)
+            self.assertEqual(sum(batch.quantity for batch in item.batches.all()), 3)
+
+    def test_bulk_complete_skips_locked_transactions(self):
+        busy = self.transaction('Export', [(self.items[0], Decimal(1))])
+        free = self.transaction('Export', [(self.items[1], Decimal(1))])
+        locked, release = threading.Event(), threading.Event()
+
+        def hold_lock():
+            with db_transaction.atomic():
+                Transaction.objects.select_for_update().get(pk=busy.pk)
+                locked.set()
+                release.wait(timeout=30)
+
+        holder = threading.Thread(target=lambda: self.in_threads(hold_lock))
+        holder.start()
+        locked.wait(timeout=30)
+        try:
+            results = Transaction.objects.filter(pk__in=[busy.pk, free.pk]).complete(performed_by=self.user)
+        finally:
+            release.set()
+            holder.join(timeout=30)
+
+        self.assertIsNone(results[free.pk])
+        self.assertIsNotNone(results[busy.pk])
+        busy.refresh_from_db()
+        self.assertEqual(busy.transaction_status, 'Authorized')
\ No newline at end of file
@@ -20,9 +20,14 @@ urlpatterns = [
     path('transactions/authorize/<int:transaction_id>/', views.authorize_transaction, name='authorize_transaction'),
     path('transactions/reject/<int:transaction_id>/', views.reject_transaction, name='reject_transaction'),
     path('transactions/complete/<int:transaction_id>/', views.complete_transaction, name='complete_transaction'),
+    path('transactions/complete/', views.complete_transactions, name='complete_transactions'),
     path('transactions/pdf/<int:transaction_id>/', views.file_pdf_transaction, name='transaction_pdf'),
     path('transactions/<int:transaction_id>/', views.transaction_details, name='transaction_detail'),
 
+    path('export/<slug:dataset>/', views.export_data, name='export_data'),
+    path('import/', views.import_data, name='import_data'),
+
+    path('items/stock/', views.item_stock, name='item_stock'),
     path('items/add/', views.add_item, name='add_item'),
     path('items/add/<slug:inventory_slug>/', views.add_item, name='add_item_with_slug'),
     path('items/edit/<int:item_id>/', views.edit_item, name='edit_item'),
@@ -30,5 +35,6 @@ urlpatterns = [
 
     path('item-detail-panel/<int:item_id>/', views.item_detail_panel, name='item_detail_panel'),
     path('<slug:inventory_slug>/', views.inventory_details, name='inv_page'),
+    path('<slug:inventory_slug>/stock-series/', views.stock_series, name='stock_series'),
     path('<slug:inventory_slug>/<int:item_id>/', views.item_details, name='item_page'),
 ]
\ No newline at end of file
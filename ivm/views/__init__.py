@@ -17,6 +17,7 @@ __all__ = [
     'authorize_transaction',
     'reject_transaction',
     'complete_transaction',
+    'complete_transactions',
     'inventory_details',
     'item_details',
     'transaction_details',
@@ -26,6 +27,10 @@ __all__ = [
     'list_transactions',
     'list_partners',
     'file_pdf_transaction',
+    'item_stock',
+    'stock_series',
+    'export_data',
+    'import_data',
     'add_partner',
     'edit_partner',
     'delete_partner',
@@ -55,7 +55,7 @@ def delete_item(request, item_id):
 
     if item.total_stock <= 0:
         item.is_active = False  # The "Soft Delete"
-        item.save()
+        item.save(update_fields=['is_active', 'version'])
 
     return redirect('ivm:inv_page', inventory_slug=inventory_slug)
 
@@ -1,24 +1,40 @@
 from django.contrib.auth.decorators import login_required, permission_required
 from django.shortcuts import render
-from ivm.models import Inventory, Transaction, Partner
+from ivm import cache as ivm_cache
+from ivm.forms import TransactionFilterForm
+from ivm.models import Transaction, Partner
+from VaalbaraApp.pagination import paginate_keyset
 
 
 @login_required(login_url='/users/login/')
 def list_inventories(request):
-    invs = Inventory.objects.all()
+    invs = ivm_cache.inventory_list()
+    # Keys the cached row of each inventory (see list_inventories.html)
+    versions = ivm_cache.versions(inv.pk for inv in invs)
+    for inv in invs:
+        inv.cache_version = versions[inv.pk]
     return render(request, 'ivm/list_inventories.html', {'inventories': invs})
 
 @login_required(login_url='/users/login/')
 @permission_required('ivm.view_transaction', raise_exception=True)
 def list_transactions(request):
-    txs = Transaction.objects.all().order_by('-creation_date')
-    return render(request, 'ivm/list_transactions.html', {'transactions': txs})
+    filter_form = TransactionFilterForm(request.GET)
+    txs = filter_form.filter(Transaction.objects.select_related('inventory'))
+    page = paginate_keyset(request, txs, ('-creation_date', '-pk'))
+
+    # htmx "load more" requests only need the next rows
+    if request.headers.get('HX-Request'):
+        return render(request, 'ivm/partials/transaction_rows.html', {'page': page})
+    return render(request, 'ivm/list_transactions.html', {'page': page, 'filter_form': filter_form})
 
 @login_required(login_url='users:login')
 @permission_required('ivm.view_partner', raise_exception=True)
 def list_partners(request):
-    partners_list = Partner.objects.all().order_by('name')
-    return render(request, 'ivm/list_partners.html', {'partners': partners_list})
+    page = paginate_keyset(request, Partner.objects.all(), ('name', 'pk'))
+
+    if request.headers.get('HX-Request'):
+        return render(request, 'ivm/partials/partner_rows.html', {'page': page})
+    return render(request, 'ivm/list_partners.html', {'page': page})
 
 __all__ =[
     'list_inventories',
@@ -1,6 +1,7 @@
 from django.contrib.auth.decorators import login_required, permission_required
 from django.shortcuts import render, get_object_or_404
 
+from ivm import cache as ivm_cache
 from ivm.models import Item, Inventory, Partner, Transaction
 
 @login_required(login_url='/users/login/')
@@ -8,7 +9,7 @@ from ivm.models import Item, Inventory, Partner, Transaction
 def inventory_details(request, inventory_slug):
     # Matches <slug:inventory_slug>
     inventory = get_object_or_404(Inventory, slug=inventory_slug)
-    active_items = inventory.items.filter(is_active=True)
+    active_items = ivm_cache.inventory_items(inventory)
     return render(request, 'ivm/details_inventory.html', {
         'inventory': inventory,
         'items': active_items
@@ -23,7 +24,11 @@ def item_details(request, inventory_slug, item_id):
 @login_required(login_url='/users/login/')
 @permission_required('ivm.view_transaction', raise_exception=True)
 def transaction_details(request, transaction_id):
-    tx = get_object_or_404(Transaction, transaction_id=transaction_id)
+    # Lines, their items and the users are loaded up front instead of once per row in the template
+    transactions = Transaction.objects.select_related(
+        'inventory', 'partner', 'created_by', 'authorized_by', 'performed_by',
+    ).with_lines()
+    tx = get_object_or_404(transactions, transaction_id=transaction_id)
     return render(request, 'ivm/details_transaction.html', {'transaction': tx})
 
 
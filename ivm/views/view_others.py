@@ -1,13 +1,163 @@
+import hashlib
+import io
+import json
+import logging
+import tempfile
+from datetime import date, timedelta
+
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required, permission_required
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404
-from ivm.models import Transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_GET
+from django.utils import timezone
+from ivm.exports import EXPORTS, XLSX_CONTENT_TYPE, csv_blocks, write_xlsx
+from ivm.forms import ImportForm, TransactionFilterForm
+from ivm.imports import import_items, import_opening_stock, import_partners
+from ivm.models import Inventory, InventorySnapshot, Item, ItemSnapshot, Transaction
+from ivm.pdf import cached_pdf, pdf_transactions
+
+logger = logging.getLogger(__name__)
 
 @login_required(login_url='/users/login/')
 @permission_required('ivm.view_transaction', raise_exception=True)
 def file_pdf_transaction(request, transaction_id):
+    """
+    Completed transactions: the stored PDF (rendered once), revalidated with a strong ETag.
+    Others, or without WeasyPrint: the printable HTML slip.
+    """
     tx = get_object_or_404(Transaction, transaction_id=transaction_id)
+    if tx.is_completed:
+        try:
+            path = cached_pdf(tx.transaction_id)
+        except (ImportError, OSError):
+            logger.exception("PDF rendering of %s failed, serving the HTML slip", tx.code)
+        else:
+            stat = path.stat()
+            # The file is written once and never modified, so its identity is a strong validator
+            etag = quote_etag(f'{tx.transaction_id}-{stat.st_mtime_ns:x}-{stat.st_size:x}')
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = FileResponse(path.open('rb'), content_type='application/pdf', filename=f'{tx.code}.pdf')
+                response['ETag'] = etag
+            patch_cache_control(response, private=True, max_age=3600)
+            return response
+
+    tx = get_object_or_404(pdf_transactions(), transaction_id=transaction_id)
     return render(request, 'ivm/file_pdf_transaction.html', {'transaction': tx})
 
+@login_required(login_url='/users/login/')
+@require_GET
+def item_stock(request):
+    """
+    Stock on hand of the items in `?ids=1,2,3` as {"<item_id>": "<quantity>"}, for transaction_form.js.
+    One query on Item.stock_on_hand; the ETag lets the browser revalidate without a body.
+    """
+    if not (request.user.has_perm('ivm.add_transaction') or request.user.has_perm('ivm.change_transaction')):
+        raise PermissionDenied
+
+    item_ids = {int(pk) for pk in request.GET.get('ids', '').split(',') if pk.strip().isdigit()}
+    stock = dict(Item.objects.filter(pk__in=item_ids).values_list('item_id', 'stock_on_hand')) if item_ids else {}
+    body = json.dumps({str(item_id): str(quantity) for item_id, quantity in sorted(stock.items())})
+
+    etag = quote_etag(hashlib.md5(body.encode()).hexdigest())
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+    # Stock changes with every completed transaction: always revalidate, never share between users
+    patch_cache_control(response, private=True, no_cache=True, must_revalidate=True)
+    return response
+
+@login_required(login_url='/users/login/')
+@permission_required('ivm.view_inventory', raise_exception=True)
+@require_GET
+def stock_series(request, inventory_slug):
+    """
+    Daily stock chart data of an inventory, or of one of its items with `?item=<id>`, from the
+    snapshot tables: {"dates": [...], "quantity": [...], "value": [...]}.
+    `?from=` and `?to=` (YYYY-MM-DD) default to the last 365 days; each series is one range scan
+    on the (inventory|item, date) unique index.
+    """
+    inventory = get_object_or_404(Inventory, slug=inventory_slug)
+    try:
+        date_to = date.fromisoformat(request.GET['to']) if request.GET.get('to') else timezone.localdate()
+        date_from = date.fromisoformat(request.GET['from']) if request.GET.get('from') else date_to - timedelta(days=365)
+    except ValueError:
+        return JsonResponse({'error': "Dates must be YYYY-MM-DD."}, status=400)
+
+    item_id = request.GET.get('item')
+    if item_id:
+        if not item_id.isdigit():
+            return JsonResponse({'error': "Invalid item."}, status=400)
+        snapshots = ItemSnapshot.objects.filter(item_id=int(item_id), inventory=inventory)
+    else:
+        snapshots = InventorySnapshot.objects.filter(inventory=inventory)
+    rows = snapshots.filter(date__range=(date_from, date_to)).order_by('date').values_list('date', 'quantity', 'value')
+
+    series = {'dates': [], 'quantity': [], 'value': []}
+    for day, quantity, value in rows:
+        series['dates'].append(day.isoformat())
+        series['quantity'].append(str(quantity))
+        series['value'].append(str(value))
+    return JsonResponse(series)
+
+@login_required(login_url='/users/login/')
+@require_GET
+def export_data(request, dataset):
+    """
+    `dataset` (see ivm.exports.EXPORTS) as CSV, or as XLSX with `?format=xlsx`, filtered by the
+    GET parameters of the transactions list. Rows are streamed, never held in memory together.
+    """
+    export = EXPORTS.get(dataset)
+    if export is None:
+        raise Http404
+    if not request.user.has_perm(export.permission):
+        raise PermissionDenied
+
+    filter_form = TransactionFilterForm(request.GET)
+    filename = f'{dataset}-{timezone.localdate():%Y%m%d}'
+    if request.GET.get('format') == 'xlsx':
+        file = tempfile.TemporaryFile()
+        try:
+            write_xlsx(export, filter_form, file)
+        except ValueError as e:
+            file.close()
+            return HttpResponse(str(e), status=400, content_type='text/plain')
+        file.seek(0)
+        return FileResponse(file, as_attachment=True, filename=f'{filename}.xlsx', content_type=XLSX_CONTENT_TYPE)
+
+    response = StreamingHttpResponse(csv_blocks(export, filter_form), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+@login_required(login_url='/users/login/')
+@staff_member_required
+def import_data(request):
+    """Staff upload of a CSV of items, partners or opening stock (see ivm.imports)."""
+    form = ImportForm(request.POST or None, request.FILES or None)
+    result = None
+    if request.method == 'POST' and form.is_valid():
+        data = form.cleaned_data
+        file = io.TextIOWrapper(data['file'].file, encoding='utf-8-sig', newline='')
+        try:
+            if data['kind'] == 'items':
+                result = import_items(file, data['inventory'])
+            elif data['kind'] == 'partners':
+                result = import_partners(file)
+            else:
+                result = import_opening_stock(file, data['inventory'], data['partner'], request.user)
+        except UnicodeDecodeError:
+            form.add_error('file', "Tệp phải là CSV mã hóa UTF-8.")
+    return render(request, 'ivm/form_import.html', {'form': form, 'result': result})
+
 __all__ = [
     'file_pdf_transaction',
+    'item_stock',
+    'stock_series',
+    'export_data',
+    'import_data',
 ]
\ No newline at end of file
@@ -4,9 +4,8 @@ from django.db import transaction as db_transaction
 from django.views.decorators.http import require_POST
 from django.contrib import messages
 from django.core.exceptions import ValidationError
-from ivm.models import Item, Partner, Transaction
+from ivm.models import Partner, Transaction
 from ivm.forms import TransactionForm, TransactionItemFormSet
-import json
 
 def _handle_partner_creation(form):
     """Helper to create a partner if one isn't selected."""
@@ -22,20 +21,21 @@ def _handle_partner_creation(form):
         contact_person=form.cleaned_data.get('new_partner_contact_person')
     )
 
+def _selected_inventory(form):
+    """Inventory chosen in a bound TransactionForm, used to narrow the item choices of the formset."""
+    return form.cleaned_data['inventory'] if form.is_valid() else None
+
 @login_required(login_url='/users/login/')
 @permission_required('ivm.add_transaction', raise_exception=True)
 def add_transaction(request):
-    stock_map = {item.item_id: str(item.total_stock) for item in Item.objects.all()}
-
     if request.method != 'POST':
         return render(request, 'ivm/form_add_transaction.html', {
             'form': TransactionForm(),
             'formset': TransactionItemFormSet(prefix='items'),
-            'stock_json': json.dumps(stock_map),
         })
 
     form = TransactionForm(request.POST)
-    formset = TransactionItemFormSet(request.POST, prefix='items')
+    formset = TransactionItemFormSet(request.POST, prefix='items', inventory=_selected_inventory(form))
 
     if form.is_valid() and formset.is_valid():
         try:
@@ -59,7 +59,6 @@ def add_transaction(request):
     return render(request, 'ivm/form_add_transaction.html', {
         'form': form,
         'formset': formset,
-        'stock_json': json.dumps(stock_map),
     })
 
 @login_required(login_url='/users/login/')
@@ -73,24 +72,21 @@ def edit_transaction(request, transaction_id):
         messages.error(request, f"Transaction {transaction_obj.code} is completed and locked.")
         return redirect('ivm:transaction_detail', transaction_id=transaction_id)
 
-    # 3. Preparation for JavaScript
-    stock_map = {item.item_id: str(item.total_stock) for item in Item.objects.all()}
-    stock_json = json.dumps(stock_map)
-
-    # 4. Handle GET request early
+    # 3. Handle GET request early (stock is fetched by transaction_form.js from ivm:item_stock)
     if request.method != 'POST':
         return render(request, 'ivm/form_edit_transaction.html', {
             'transaction': transaction_obj,
             'form': TransactionForm(instance=transaction_obj),
-            'formset': TransactionItemFormSet(instance=transaction_obj, prefix='items'),
-            'stock_json': stock_json,
+            'formset': TransactionItemFormSet(instance=transaction_obj, prefix='items',
+                                              inventory=transaction_obj.inventory),
         })
 
-    # 5. Initialize POST data
+    # 4. Initialize POST data
     form = TransactionForm(request.POST, instance=transaction_obj)
-    formset = TransactionItemFormSet(request.POST, instance=transaction_obj, prefix='items')
+    formset = TransactionItemFormSet(request.POST, instance=transaction_obj, prefix='items',
+                                     inventory=_selected_inventory(form))
 
-    # 6. Process Validation and Saving
+    # 5. Process Validation and Saving
     if form.is_valid() and formset.is_valid():
         try:
             with db_transaction.atomic():
@@ -113,12 +109,11 @@ def edit_transaction(request, transaction_id):
         except Exception as e:
             form.add_error(None, f"Error saving transaction: {e}")
 
-    # 7. Fallback for invalid forms or exceptions
+    # 6. Fallback for invalid forms or exceptions
     return render(request, 'ivm/form_edit_transaction.html', {
         'transaction': transaction_obj,
         'form': form,
         'formset': formset,
-        'stock_json': stock_json,
     })
 
 @login_required(login_url='/users/login/')
@@ -177,9 +172,12 @@ def reject_transaction(request, transaction_id):
     if tx.transaction_status == 'Completed':
         messages.error(request, "Cannot reject a transaction that has already been completed.")
     else:
-        tx.transaction_status = 'Rejected'
-        tx.save()
-        messages.warning(request, f"Transaction {tx.code} has been rejected.")
+        try:
+            tx.transaction_status = 'Rejected'
+            tx.save()
+            messages.warning(request, f"Transaction {tx.code} has been rejected.")
+        except ValidationError as e:
+            messages.error(request, f"Rejection failed: {e.message}")
 
     return redirect('ivm:transaction_detail', transaction_id=tx.transaction_id)
 
@@ -211,11 +209,33 @@ def complete_transaction(request, transaction_id):
 
     return redirect('ivm:transaction_detail', transaction_id=tx.transaction_id)
 
+@login_required(login_url='/users/login/')
+@permission_required('ivm.complete_transaction', raise_exception=True)
+@require_POST
+def complete_transactions(request):
+    transaction_ids = [int(pk) for pk in request.POST.getlist('transaction_ids') if pk.isdigit()]
+    if not transaction_ids:
+        messages.error(request, "No transactions selected.")
+        return redirect('ivm:transactions')
+
+    results = Transaction.objects.filter(pk__in=transaction_ids).complete(performed_by=request.user)
+
+    completed = sum(error is None for error in results.values())
+    if completed:
+        messages.success(request, f"{completed} transaction(s) completed, inventory updated.")
+    failed = {transaction_id: error for transaction_id, error in results.items() if error}
+    codes = {tx.pk: tx.code for tx in Transaction.objects.filter(pk__in=failed).only('transaction_type')}
+    for transaction_id, error in failed.items():
+        messages.error(request, f"Completion of {codes.get(transaction_id, transaction_id)} failed: {error}")
+
+    return redirect('ivm:transactions')
+
 __all__ = [
     'add_transaction',
     'edit_transaction',
     'delete_transaction',
     'authorize_transaction',
     'reject_transaction',
-    'complete_transaction'
+    'complete_transaction',
+    'complete_transactions',
 ]
\ No newline at end of file
@@ -1,5 +1,30 @@
 const PREFIX = "items";
 
+// Stock on hand by item id, filled lazily from the item_stock endpoint
+const stockData = {};
+
+function fetchStock(itemIds) {
+	const ids = [...new Set(itemIds.filter((id) => id))];
+	if (!ids.length || !window.stockUrl) return;
+
+	fetch(`${window.stockUrl}?ids=${ids.join(",")}`, {
+		headers: { Accept: "application/json" },
+	})
+		.then((response) => (response.ok ? response.json() : {}))
+		.then((stock) => {
+			Object.assign(stockData, stock);
+			updateExportLimits();
+		})
+		.catch((error) => console.error("Stock lookup failed:", error));
+}
+
+function fetchSelectedStock() {
+	const ids = Array.from(
+		document.querySelectorAll(".item-row select")
+	).map((select) => select.value);
+	fetchStock(ids);
+}
+
 function updateExportLimits() {
 	const typeField = document.querySelector('[name="transaction_type"]');
 	if (!typeField) return;
@@ -13,7 +38,7 @@ function updateExportLimits() {
 
 		if (itemSelect && qtyInput) {
 			if (type === "Export") {
-				const available = parseFloat(window.stockData[itemSelect.value] || 0);
+				const available = parseFloat(stockData[itemSelect.value] || 0);
 				qtyInput.max = available;
 				qtyInput.step = "0.001"; // Allow decimals
 				qtyInput.placeholder = "Max: " + available;
@@ -25,6 +50,20 @@ function updateExportLimits() {
 	});
 }
 
+function filterItemOptions() {
+	const inventoryField = document.querySelector('[name="inventory"]');
+	if (!inventoryField) return;
+
+	const inventory = inventoryField.value;
+	document.querySelectorAll("option[data-inventory]").forEach((option) => {
+		// Keep the current selection visible even if it belongs to another inventory
+		option.hidden =
+			Boolean(inventory) &&
+			option.dataset.inventory !== inventory &&
+			!option.selected;
+	});
+}
+
 function updateDiscountFields() {
 	const typeField = document.querySelector('[name="transaction_type"]');
 	if (!typeField) return;
@@ -100,6 +139,7 @@ document.getElementById("add-item-btn").addEventListener("click", function (e) {
 	itemList.appendChild(wrapper.firstElementChild);
 
 	totalForms.value = formIdx + 1;
+	filterItemOptions();
 });
 
 function debounce(func, delay) {
@@ -192,6 +232,14 @@ document.addEventListener("change", function (e) {
 		updateGrandTotal();
 	}
 
+	if (target.name === "inventory") {
+		filterItemOptions();
+	}
+
+	if (target.tagName === "SELECT" && target.closest(".item-row")) {
+		fetchStock([target.value]);
+	}
+
 	if (target.tagName === "SELECT" || target.name === "transaction_type") {
 		updateExportLimits();
 		updateDiscountFields();
@@ -201,6 +249,8 @@ document.addEventListener("change", function (e) {
 document.addEventListener("DOMContentLoaded", () => {
 	updatePartnerFields();
 	updateDiscountFields();
+	filterItemOptions();
+	fetchSelectedStock();
 	document.querySelectorAll(".item-row").forEach((row) => {
 		calculateRowTotal(row);
 	});
@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-18 10:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ivm', '0005_indexes'),
+        ('tasks', '0004_task_transaction'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['creation_date', 'id'], name='tasks_task_created_idx'),
+        ),
+    ]
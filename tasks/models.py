@@ -7,6 +7,11 @@ from ivm.models import Transaction
 User = get_user_model()
 
 class Task(models.Model):
+    class Meta:
+        indexes = [
+            models.Index(fields=['creation_date', 'id'], name='tasks_task_created_idx'),
+        ]
+
     title = models.CharField(max_length=100)
     body = models.TextField()
     creation_date = models.DateTimeField(default=timezone.now)
@@ -1,3 +1,33 @@
-from django.test import TestCase
+from unittest import skipUnless
 
-# Create your tests here.
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+
+from ivm.tests import TAMPERED_CURSORS, KeysetPaginationTestCase, QueryCountTestCase, QueryPlanTestCase, keyset_page
+from .models import Task
+
+
+@skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN output is SQLite specific")
+class TaskQueryPlanTests(QueryPlanTestCase):
+    def test_list_ordering(self):
+        self.assertUsesIndex(Task.objects.order_by('-creation_date'))
+
+    def test_list_keyset_page(self):
+        tasks = Task.objects.select_related('created_by')
+        self.assertUsesIndex(keyset_page(tasks, ('-creation_date', '-pk'), (timezone.now(), 1)), ordered=True)
+
+
+class TaskQueryCountTests(QueryCountTestCase):
+    def grow(self, size):
+        Task.objects.bulk_create(
+            Task(title=f'Task {i}', body='-', created_by=self.user, task_for=self.user) for i in range(size)
+        )
+
+    def test_tasks_list(self):
+        self.assertConstantQueries(lambda data: reverse('tasks:tasks_list'))
+
+
+class TaskPaginationTests(KeysetPaginationTestCase):
+    def test_tampered_tasks_cursor(self):
+        self.assertBadRequest(reverse('tasks:tasks_list'), TAMPERED_CURSORS)
\ No newline at end of file
@@ -3,12 +3,16 @@ from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 from .models import Task
 from .forms import CreateTask
+from VaalbaraApp.pagination import paginate_keyset
 
 # Create your views here.
 @login_required(login_url='/users/login/')
 def tasks_list(request):
-    tasks = Task.objects.all().order_by('-creation_date')
-    return render(request, 'tasks/tasks_list.html', {'tasks': tasks})
+    page = paginate_keyset(request, Task.objects.select_related('created_by'), ('-creation_date', '-pk'))
+
+    if request.headers.get('HX-Request'):
+        return render(request, 'tasks/partials/task_rows.html', {'page': page})
+    return render(request, 'tasks/tasks_list.html', {'page': page})
 
 @login_required(login_url='/users/login/')
 def details_task(request, task_id):
@@ -1,3 +1,85 @@
-from django.test import TestCase
+import json
+import logging
+import re
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ivm.tests import QueryCountTestCase
+
+SERVER_TIMING = re.compile(
+    r'^db;dur=\d+(\.\d+)?;desc="(?P<queries>\d+) queries", tpl;dur=(?P<template>\d+(\.\d+)?), total;dur=\d+(\.\d+)?$'
+)
+
+
+class UserQueryCountTests(QueryCountTestCase):
+    def grow(self, size):
+        User = get_user_model()
+        User.objects.bulk_create(User(username=f'user-{User.objects.count()}-{i}') for i in range(size))
+
+    def test_register(self):
+        self.assertConstantQueries(lambda data: reverse('users:register'))
+
+    def test_adminhub(self):
+        self.assertConstantQueries(lambda data: reverse('users:adminhub'))
+
+    def test_login(self):
+        self.client.logout()
+        self.assertConstantQueries(lambda data: reverse('users:login'))
+
+
+class QueryTimingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.staff = User.objects.create_user('staff', is_staff=True)
+        cls.clerk = User.objects.create_user('clerk')
+
+    def get(self, url):
+        """The response, the request log record and the number of queries of a GET of `url`."""
+        with self.assertLogs('vaalbara.requests') as logs, CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(len(logs.records), 1)
+        return response, logs.records[0], len(queries)
+
+    def test_server_timing_for_staff(self):
+        self.client.force_login(self.staff)
+        response, record, queries = self.get(reverse('users:adminhub'))
+
+        timing = SERVER_TIMING.match(response['Server-Timing'])
+        self.assertIsNotNone(timing, response['Server-Timing'])
+        self.assertEqual(int(timing['queries']), queries)
+        self.assertGreater(float(timing['template']), 0)
+
+        self.assertEqual(record.levelno, logging.INFO)
+        logged = json.loads(record.getMessage())
+        self.assertEqual((logged['path'], logged['status'], logged['user'], logged['queries']),
+                         (reverse('users:adminhub'), 200, self.staff.pk, queries))
+        self.assertNotIn('sql', logged)
+
+    def test_no_server_timing_for_other_clients(self):
+        response, _, _ = self.get(reverse('users:login'))
+        self.assertNotIn('Server-Timing', response)
+        self.client.force_login(self.clerk)
+        response, _, _ = self.get(reverse('users:adminhub'))
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(DEBUG=True)
+    def test_server_timing_in_debug(self):
+        response, _, _ = self.get(reverse('users:login'))
+        self.assertRegex(response['Server-Timing'], SERVER_TIMING)
+
+    @override_settings(SLOW_REQUEST_QUERIES=2)
+    def test_slow_request_log(self):
+        self.client.force_login(self.staff)
+        _, record, queries = self.get(reverse('users:adminhub'))
+
+        self.assertEqual(record.levelno, logging.WARNING)
+        logged = json.loads(record.getMessage())
+        self.assertTrue(logged['slow'])
+        self.assertGreaterEqual(logged['queries'], 2)
+        self.assertEqual(len(logged['sql']), queries)
+        self.assertTrue(all(statement['sql'].startswith('SELECT') for statement in logged['sql']))
\ No newline at end of file